@@ -0,0 +1,123 @@
+"""
+离线指标分析
+读取METRICS_EXPORT_DIR下导出的请求指标，按产线 / 是否压缩 / 文件大小分组
+计算 p50/p95/p99 延迟，用于压缩与计算分区实验
+
+用法:
+    python analyze_metrics.py [--dir ./metrics] [--field total_time] [--exclude-cache-hits] [--json]
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+# 文件大小分桶(KB)：(上界, 标签)
+SIZE_BUCKETS = (
+    (100, "<100KB"),
+    (500, "100-500KB"),
+    (1024, "500KB-1MB"),
+    (5 * 1024, "1-5MB"),
+    (float("inf"), ">5MB"),
+)
+
+
+def size_bucket(size_kb: float) -> str:
+    for bound, label in SIZE_BUCKETS:
+        if size_kb < bound:
+            return label
+    return SIZE_BUCKETS[-1][1]
+
+
+def load_rows(export_dir: str) -> list[dict]:
+    """读取导出目录下全部CSV分段"""
+    rows = []
+    for path in sorted(glob.glob(os.path.join(export_dir, "metrics-*.csv"))):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows.extend(csv.DictReader(f))
+    return rows
+
+
+def summarize(rows: list[dict], field: str) -> list[dict]:
+    """
+    按 (产线, 是否压缩, 大小分桶) 分组计算分位数
+
+    Args:
+        rows: 指标行
+        field: 统计的耗时字段 (total_time/inference_time/...)
+
+    Returns:
+        每组一条统计结果
+    """
+    groups = defaultdict(list)
+    for row in rows:
+        value = row.get(field)
+        if value in (None, ""):
+            continue
+        key = (
+            row["pipeline"],
+            row["compressed"] == "True",
+            size_bucket(float(row["image_size_kb"])),
+        )
+        groups[key].append(float(value))
+
+    bucket_order = {label: i for i, (_, label) in enumerate(SIZE_BUCKETS)}
+    summary = []
+    for (pipeline, compressed, bucket), values in sorted(
+        groups.items(), key=lambda kv: (kv[0][0], kv[0][1], bucket_order[kv[0][2]])
+    ):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        summary.append({
+            "pipeline": pipeline,
+            "compressed": compressed,
+            "size_bucket": bucket,
+            "count": len(values),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="请求指标分位数分析")
+    parser.add_argument("--dir", default=None, help="指标导出目录，默认读取配置METRICS_EXPORT_DIR")
+    parser.add_argument("--field", default="total_time", help="统计字段，如total_time/inference_time")
+    parser.add_argument("--exclude-cache-hits", action="store_true", help="排除缓存命中的请求")
+    parser.add_argument("--json", action="store_true", help="以JSON输出")
+    args = parser.parse_args()
+
+    export_dir = args.dir
+    if export_dir is None:
+        from core.config import settings
+        export_dir = settings.METRICS_EXPORT_DIR
+
+    rows = load_rows(export_dir)
+    if not rows:
+        print(f"未找到指标文件: {export_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.exclude_cache_hits:
+        rows = [row for row in rows if row.get("cache_hit") != "True"]
+
+    summary = summarize(rows, args.field)
+
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return
+
+    print(f"字段: {args.field}  样本数: {len(rows)}")
+    print(f"{'产线':<10}{'压缩':<6}{'大小':<12}{'样本':>6}{'p50(s)':>10}{'p95(s)':>10}{'p99(s)':>10}")
+    for item in summary:
+        print(
+            f"{item['pipeline']:<10}{str(item['compressed']):<6}{item['size_bucket']:<12}"
+            f"{item['count']:>6}{item['p50']:>10.3f}{item['p95']:>10.3f}{item['p99']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+管理路由
+缓存查看与清理、按需性能剖析等运维操作
+"""
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+import hmac
+from typing import Optional
+
+from core.config import settings
+from core.cache import get_cache, get_page_cache
+from core.profiling import start_profile, stop_profile, profile_status, get_last_profile
+
+router = APIRouter()
+
+
+def verify_admin_token(x_admin_token: Optional[str] = Header(None, description="管理令牌")):
+    """校验管理令牌（未配置ADMIN_TOKEN时管理接口禁用，一律返回403）"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="管理接口未启用：未配置ADMIN_TOKEN")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="管理令牌无效")
+
+
+@router.get("/admin/cache", summary="结果缓存统计", dependencies=[Depends(verify_admin_token)])
+async def cache_stats():
+    """返回结果缓存与逐页结果存储的条目数、占用字节、命中与淘汰统计"""
+    cache = get_cache()
+    if cache is None:
+        return {"enabled": False}
+    page_cache = get_page_cache()
+    pages = {"enabled": True, **page_cache.stats()} if page_cache else {"enabled": False}
+    return {"enabled": True, **cache.stats(), "pages": pages}
+
+
+@router.delete("/admin/cache", summary="清理结果缓存", dependencies=[Depends(verify_admin_token)])
+async def purge_cache(
+    pipeline: Optional[str] = Query(None, description="仅清理指定产线(ocrv5/vl/structure)")
+):
+    """清理内存与磁盘两级缓存（含逐页结果存储）"""
+    cache = get_cache()
+    if cache is None:
+        raise HTTPException(status_code=404, detail="结果缓存未启用")
+    removed = cache.purge(pipeline)
+    page_cache = get_page_cache()
+    if page_cache is not None:
+        removed += page_cache.purge(pipeline)
+    return {"success": True, "removed": removed}
+
+
+@router.post("/admin/profile", summary="开启按需剖析", dependencies=[Depends(verify_admin_token)])
+async def begin_profile(
+    mode: str = Query("sampling", description="剖析模式(sampling/deterministic)"),
+    requests: Optional[int] = Query(None, ge=1, description="剖析接下来的N个产线请求，达到后自动结束"),
+    seconds: Optional[float] = Query(None, gt=0, description="剖析时长(秒)，不超过PROFILE_MAX_SECONDS"),
+    allocations: bool = Query(False, description="同时用tracemalloc追踪内存分配"),
+    interval_ms: Optional[float] = Query(None, ge=1, description="采样间隔(毫秒)，仅sampling模式"),
+):
+    """
+    对接下来的N个请求或T秒开启剖析，结束后在METRICS_EXPORT_DIR/profiles写出折叠栈文件
+
+    - sampling：后台线程定时抓取全部线程调用栈，开销低，可用于线上
+    - deterministic：记录每次函数调用的耗时，开销大，建议只剖析少量请求；
+      requests只决定会话何时结束，会话期间并发的其他请求同样会被追踪
+    """
+    try:
+        start_profile(mode, requests, seconds, allocations, interval_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return profile_status()
+
+
+@router.get("/admin/profile", summary="剖析状态", dependencies=[Depends(verify_admin_token)])
+async def get_profile():
+    """返回进行中的剖析状态与最近一次完成的剖析摘要"""
+    return {**profile_status(), "last": get_last_profile()}
+
+
+@router.delete("/admin/profile", summary="结束剖析", dependencies=[Depends(verify_admin_token)])
+async def end_profile():
+    """立即结束进行中的剖析并写出结果"""
+    result = await stop_profile("manual")
+    if result is None:
+        raise HTTPException(status_code=404, detail="没有进行中的剖析")
+    return result
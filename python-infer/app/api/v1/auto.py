@@ -0,0 +1,86 @@
+"""
+自动路由
+先在CPU上对上传内容分诊，再分发到OCRv5/StructureV3/VL产线
+"""
+from fastapi import APIRouter, File, UploadFile, Form, Header, HTTPException
+import asyncio
+import time
+import logging
+from typing import Optional
+
+from core.models import OCRResponse
+from core.triage import triage
+from api.v1.ocr import (
+    predict_upload, predict_structure_fallback, process_upload_file, parse_priority,
+    negotiate_response_type, finalize_response
+)
+from services.vl_routing import PipelineUnavailable
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/auto", response_model=OCRResponse, summary="自动路由识别")
+async def ocr_auto(
+    file: UploadFile = File(..., description="图片或PDF文件"),
+    compress: bool = Form(False, description="是否前端已压缩"),
+    format: str = Form("json", description="输出格式(json/markdown)，路由到OCRv5时忽略"),
+    accept: Optional[str] = Header(None, description="响应编码(application/json/msgpack/cbor)"),
+    x_priority: Optional[str] = Header(None, description="请求优先级(interactive/batch)，interactive优先获得处理名额")
+):
+    """
+    按内容自动选择产线
+
+    - 分诊：灰度缩略图上测量文本密度、表格线与网格交点、图形区域占比与页数（CPU，约数十毫秒）
+    - 表格/表单 → StructureV3；图文混排或密集版面 → VL（页数过多时改用StructureV3）；其余 → OCRv5
+    - VL产线不可用时改由StructureV3处理（fallback_from为"vl"）
+    - 分诊结论与耗时记录在 metrics.route / route_reason / triage_time
+    """
+    media_type = negotiate_response_type(accept)
+    priority = parse_priority(x_priority)
+
+    if format not in ("json", "markdown"):
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {format}。仅支持: json/markdown")
+
+    total_start = time.time()
+    upload = await process_upload_file(file)
+
+    try:
+        decision = await asyncio.to_thread(triage, upload)
+
+        name = decision.pipeline
+        fallback_from = None
+        fmt = "rows" if name == "ocrv5" else format
+        try:
+            # VL不可用（缓存未命中时）改由StructureV3处理
+            prediction, metrics = await predict_upload(name, upload, fmt, compress, total_start, priority)
+        except PipelineUnavailable as e:
+            if name != "vl":
+                raise
+            name = "structure"
+            fallback_from = "vl"
+            prediction, metrics = await predict_structure_fallback(
+                upload, format, compress, total_start, priority, reason=e.detail
+            )
+
+        response = OCRResponse(
+            success=True,
+            pipeline=name,
+            fallback_from=fallback_from,
+            result=prediction["result"],
+            metrics=metrics.model_copy(update={
+                "route": decision.pipeline,
+                "route_reason": decision.reason,
+                "triage_time": decision.triage_time,
+            })
+        )
+        return finalize_response(response, media_type)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"自动路由推理失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"推理失败: {str(e)}")
+    finally:
+        upload.close()
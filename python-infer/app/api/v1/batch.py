@@ -0,0 +1,353 @@
+"""
+批量识别路由
+一次请求上传多个文件或zip/tar归档，按有界并发逐项推理，每完成一项即返回一行NDJSON
+"""
+from fastapi import APIRouter, File, UploadFile, Form, Header, HTTPException
+from fastapi.responses import StreamingResponse
+import asyncio
+import tarfile
+import time
+import zipfile
+import logging
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from core.config import settings
+from core.metrics_export import export_request_metrics
+from core.admission import PRIORITY_BATCH
+from core.ingest import UploadedFile
+from services.ocr_v5 import LAYOUTS, pack_columnar
+from api.v1.ocr import (
+    UploadSpooler, get_pipeline, predict_upload, build_request_timer, encode_stream_event,
+    process_upload_file, parse_priority, STREAM_MEDIA_TYPES
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 归档文件头魔数
+ZIP_MAGIC = b"PK\x03\x04"
+COMPRESSED_TAR_MAGIC = (b"\x1f\x8b", b"BZh", b"\xfd7zXZ\x00")
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def archive_kind(filename: str, head: bytes) -> Optional[str]:
+    """
+    判断上传文件是否为归档
+
+    Returns:
+        zip/tar，不是归档返回None
+    """
+    if head.startswith(ZIP_MAGIC):
+        return "zip"
+    if head[257:262] == b"ustar" or head.startswith(COMPRESSED_TAR_MAGIC):
+        return "tar"
+    if filename.lower().endswith(ARCHIVE_SUFFIXES):
+        # 扩展名是归档但内容无法识别，交给tarfile报错
+        return "zip" if filename.lower().endswith(".zip") else "tar"
+    return None
+
+
+def spool_member(name: str, reader, size: Optional[int]) -> UploadedFile:
+    """把归档成员分块写入spool缓冲区（与单文件上传相同的大小与类型校验）"""
+    start_time = time.time()
+    spooler = UploadSpooler(name)
+    try:
+        spooler.check_declared_size(size)
+        while True:
+            chunk = reader.read(settings.UPLOAD_CHUNK_SIZE_KB * 1024)
+            if not chunk:
+                break
+            spooler.write(chunk)
+        return spooler.finish(time.time() - start_time)
+    except BaseException:
+        spooler.close()
+        raise
+
+
+def _skip_member(name: str) -> bool:
+    """跳过目录元数据与系统生成的隐藏文件"""
+    base = name.rsplit("/", 1)[-1]
+    return not base or base.startswith(".") or name.startswith("__MACOSX/")
+
+
+def iter_archive(fileobj, kind: str) -> Iterator[tuple[str, object]]:
+    """
+    逐个解出归档成员（阻塞生成器，需在线程中推进）
+
+    tar以流模式顺序读取，zip按中央目录逐个读取成员，任一时刻只有一个成员在内存/spool中。
+
+    Yields:
+        (成员名, UploadedFile或单项错误)
+    """
+    fileobj.seek(0)
+    if kind == "zip":
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _skip_member(info.filename):
+                    continue
+                try:
+                    with archive.open(info) as reader:
+                        yield info.filename, spool_member(info.filename, reader, info.file_size)
+                except (HTTPException, zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                    yield info.filename, e
+        return
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or _skip_member(member.name):
+                continue
+            try:
+                reader = archive.extractfile(member)
+                yield member.name, spool_member(member.name, reader, member.size)
+            except HTTPException as e:
+                yield member.name, e
+
+
+def item_error(index: int, filename: str, error: Exception) -> dict:
+    """单项失败事件数据"""
+    if isinstance(error, HTTPException):
+        return {"index": index, "filename": filename, "success": False,
+                "status_code": error.status_code, "error": error.detail}
+    return {"index": index, "filename": filename, "success": False,
+            "status_code": 500, "error": f"推理失败: {str(error)}"}
+
+
+async def iter_items(files: list[UploadFile]) -> AsyncIterator[tuple[str, object]]:
+    """
+    按上传顺序产出待处理项，归档在线程中流式解包
+
+    Yields:
+        (文件名, UploadedFile或单项错误)
+    """
+    for file in files:
+        head = await file.read(512)
+        await file.seek(0)
+        kind = archive_kind(file.filename or "", head)
+        if kind is None:
+            try:
+                yield file.filename, await process_upload_file(file)
+            except HTTPException as e:
+                yield file.filename, e
+            continue
+
+        members = iter_archive(file.file, kind)
+        pending = None
+        try:
+            while True:
+                # 解包在线程中推进；本协程被取消时线程不会中断，由close_archive等其结束后再关闭生成器
+                pending = asyncio.ensure_future(asyncio.to_thread(next, members, None))
+                item = await asyncio.shield(pending)
+                pending = None
+                if item is None:
+                    break
+                yield item
+        except (tarfile.TarError, zipfile.BadZipFile, OSError, EOFError) as e:
+            yield file.filename, HTTPException(status_code=400, detail=f"归档无法读取: {str(e)}")
+        finally:
+            close_archive(members, pending)
+
+
+def close_archive(members: Iterator, pending: Optional[asyncio.Future]):
+    """
+    关闭归档生成器
+
+    Args:
+        members: iter_archive生成器
+        pending: 尚未被取走结果的解包调用；消费方被取消时线程可能仍在解出下一个成员，
+            等该线程结束后再关闭生成器，并释放这个未交给消费方的成员
+    """
+    if pending is not None and not pending.done():
+        pending.add_done_callback(lambda _: close_archive(members, pending))
+        return
+    if pending is not None and not pending.cancelled() and pending.exception() is None:
+        item = pending.result()
+        if item is not None and isinstance(item[1], UploadedFile):
+            item[1].close()
+    members.close()
+
+
+async def predict_item(name: str, upload: UploadedFile, fmt: str, compress: bool, priority: str) -> dict:
+    """
+    对单个文件执行与同步端点相同的推理流程（见predict_upload，每项单独获取准入名额）并记录指标
+
+    Args:
+        name: 产线 (ocrv5/vl/structure)
+        upload: 上传文件
+        fmt: ocrv5为结果布局(rows/columnar)，其余为输出格式(json/markdown)
+        compress: 是否前端已压缩
+        priority: 准入优先级
+
+    Returns:
+        单项成功事件数据（不含index/filename）
+    """
+    prediction, metrics = await predict_upload(name, upload, fmt, compress, time.time(), priority)
+    if settings.ENABLE_METRICS:
+        build_request_timer(name, metrics).observe()
+        export_request_metrics(name, metrics)
+    return {"success": True, "pipeline": name, "result": prediction["result"], "metrics": metrics.model_dump()}
+
+
+def stream_batch(
+    name: str,
+    files: list[UploadFile],
+    fmt: str,
+    compress: bool,
+    priority: str,
+    transform: Optional[Callable[[object], object]] = None,
+) -> StreamingResponse:
+    """
+    逐项推理并以NDJSON返回：每项完成即输出一行item/error事件（按完成顺序，index为上传顺序），最后输出done事件
+
+    Args:
+        name: 产线
+        files: 上传的文件/归档
+        fmt: 结果布局或输出格式
+        compress: 是否前端已压缩
+        priority: 各项的准入优先级
+        transform: 对单项结果的后处理（如columnar打包）
+    """
+    async def events():
+        batch_start = time.time()
+        results: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(max(1, settings.BATCH_CONCURRENCY))
+        tasks: set[asyncio.Task] = set()
+        counts = {"total": 0, "succeeded": 0, "failed": 0}
+
+        async def run_item(index: int, filename: str, upload: UploadedFile):
+            try:
+                payload = await predict_item(name, upload, fmt, compress, priority)
+                if transform:
+                    payload["result"] = transform(payload["result"])
+                await results.put(("item", {"index": index, "filename": filename, **payload}))
+            except Exception as e:
+                if not isinstance(e, HTTPException):
+                    logger.error(f"批量项推理失败 {filename}: {str(e)}", exc_info=True)
+                await results.put(("error", item_error(index, filename, e)))
+            finally:
+                upload.close()
+                slots.release()
+
+        async def produce():
+            index = 0
+            items = iter_items(files)
+            try:
+                async for filename, item in items:
+                    if index >= settings.BATCH_MAX_ITEMS:
+                        if isinstance(item, UploadedFile):
+                            item.close()
+                        await results.put(("error", item_error(index, filename, HTTPException(
+                            status_code=413, detail=f"批量项数超过上限: {settings.BATCH_MAX_ITEMS}"
+                        ))))
+                        break
+                    if isinstance(item, Exception):
+                        await results.put(("error", item_error(index, filename, item)))
+                    else:
+                        # 在途项达到并发上限时暂停解包，避免一次性展开整个归档
+                        await slots.acquire()
+                        task = asyncio.create_task(run_item(index, filename, item))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    index += 1
+                if tasks:
+                    await asyncio.gather(*list(tasks))
+            finally:
+                # 超过项数上限提前退出时立即关闭归档，不等垃圾回收
+                await items.aclose()
+                await results.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                event = await results.get()
+                if event is None:
+                    break
+                kind, payload = event
+                counts["total"] += 1
+                counts["succeeded" if kind == "item" else "failed"] += 1
+                yield encode_stream_event(kind, payload, "ndjson")
+            # 生产者自身异常（非单项错误）
+            producer.result()
+            yield encode_stream_event(
+                "done",
+                {"success": True, "pipeline": name, **counts, "total_time": time.time() - batch_start},
+                "ndjson"
+            )
+        except Exception as e:
+            logger.error(f"批量推理失败: {str(e)}", exc_info=True)
+            yield encode_stream_event("error", {"success": False, "error": f"批量推理失败: {str(e)}"}, "ndjson")
+        finally:
+            producer.cancel()
+            for task in list(tasks):
+                task.cancel()
+
+    return StreamingResponse(events(), media_type=STREAM_MEDIA_TYPES["ndjson"])
+
+
+async def start_batch(
+    name: str,
+    files: list[UploadFile],
+    fmt: str,
+    compress: bool,
+    x_priority: Optional[str],
+    transform: Optional[Callable[[object], object]] = None,
+) -> StreamingResponse:
+    """校验并启动批量流；各项推理时分别获取准入名额（缓存命中不占用），默认以batch优先级排队"""
+    get_pipeline(name)
+    if not files:
+        raise HTTPException(status_code=400, detail="未上传文件")
+    priority = parse_priority(x_priority) if x_priority else PRIORITY_BATCH
+    return stream_batch(name, files, fmt, compress, priority, transform)
+
+
+@router.post("/text/batch", summary="批量文本识别（OCRv5，NDJSON流式返回）")
+async def ocr_text_batch(
+    files: list[UploadFile] = File(..., description="多个图片文件，或zip/tar归档"),
+    compress: bool = Form(False, description="是否前端已压缩"),
+    layout: str = Form("rows", description="结果布局(rows/columnar)"),
+    packed: bool = Form(False, description="columnar布局下打包为base64缓冲区"),
+    x_priority: Optional[str] = Header(None, description="请求优先级(interactive/batch)，默认batch")
+):
+    """
+    一次请求识别多个文件
+
+    - 输入：多个文件，或zip/tar(.gz/.bz2/.xz)归档（流式解包）
+    - 按BATCH_CONCURRENCY有界并发推理，单张图片仍参与OCRv5动态微批
+    - 每项完成即返回一行 {"event":"item","data":{index,filename,success,pipeline,result,metrics}}
+    - 单项失败返回 {"event":"error","data":{index,filename,status_code,error}}，不影响其余项
+    - 最后返回 {"event":"done","data":{total,succeeded,failed,total_time}}
+    """
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"不支持的结果布局: {layout}。仅支持: rows/columnar")
+    transform = pack_columnar if layout == "columnar" and packed else None
+    return await start_batch("ocrv5", files, layout, compress, x_priority, transform)
+
+
+@router.post("/document/vl_model/batch", summary="批量复杂文档解析（PaddleOCR-VL，NDJSON流式返回）")
+async def ocr_document_batch(
+    files: list[UploadFile] = File(..., description="多个图片/PDF文件，或zip/tar归档"),
+    compress: bool = Form(False, description="是否前端已压缩"),
+    format: str = Form("json", description="输出格式(json/markdown)"),
+    x_priority: Optional[str] = Header(None, description="请求优先级(interactive/batch)，默认batch")
+):
+    """
+    一次请求解析多个文档，事件格式同 /text/batch
+
+    - VL产线不可用（熔断或vLLM不可用）时各项以503错误行返回
+    """
+    if format not in ("json", "markdown"):
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {format}。仅支持: json/markdown")
+    return await start_batch("vl", files, format, compress, x_priority)
+
+
+@router.post("/document/structure_model/batch", summary="批量文档结构识别（StructureV3，NDJSON流式返回）")
+async def ocr_table_batch(
+    files: list[UploadFile] = File(..., description="多个图片/PDF文件，或zip/tar归档"),
+    compress: bool = Form(False, description="是否前端已压缩"),
+    output_format: str = Form("json", description="输出格式(json/markdown)"),
+    x_priority: Optional[str] = Header(None, description="请求优先级(interactive/batch)，默认batch")
+):
+    """一次请求识别多个文档，事件格式同 /text/batch"""
+    if output_format not in ("json", "markdown"):
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {output_format}。仅支持: json/markdown")
+    return await start_batch("structure", files, output_format, compress, x_priority)
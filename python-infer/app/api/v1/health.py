@@ -4,21 +4,24 @@
 from fastapi import APIRouter
 from datetime import datetime
 from core.models import HealthResponse
+from core.executor import get_executor
+from core.circuit_breaker import get_breaker
+from core.admission import get_admission
+from services.vllm_prober import get_vllm_prober
 
 router = APIRouter()
 
-# 全局服务实例（在main.py中初始化）
-ocr_v5_service = None
-vl_service = None
-structure_v3_service = None
+# 全局产线管理器（在main.py中初始化）
+pipeline_manager = None
 
+# 未加载但可按需加载的产线视为可用
+AVAILABLE_STATES = ("ready", "unloaded", "loading")
 
-def set_services(ocr_v5, vl, structure_v3):
-    """设置服务实例"""
-    global ocr_v5_service, vl_service, structure_v3_service
-    ocr_v5_service = ocr_v5
-    vl_service = vl
-    structure_v3_service = structure_v3
+
+def set_pipelines(manager):
+    """设置产线管理器"""
+    global pipeline_manager
+    pipeline_manager = manager
 
 
 @router.get("/health", response_model=HealthResponse, summary="健康检查")
@@ -26,34 +29,55 @@ async def health_check():
     """
     检查所有产线服务状态
 
-    返回各产线的运行状态、模型加载情况、GPU可用性等信息
+    返回各产线的运行状态、模型加载情况、加载/卸载事件与常驻内存等信息
     """
     pipelines = {}
 
-    # 检查OCRv5
-    if ocr_v5_service:
-        pipelines["ocrv5"] = ocr_v5_service.health_check()
-    else:
-        pipelines["ocrv5"] = {"status": "unavailable", "error": "Service not initialized"}
+    managed = pipeline_manager.pipelines if pipeline_manager else {}
+    for name, pipeline in managed.items():
+        service = pipeline.service
+        if service is not None:
+            status = service.health_check()
+            if pipeline.batcher:
+                status["batching"] = pipeline.batcher.stats()
+        else:
+            # 未加载的产线不触发加载
+            status = {"status": pipeline.state, "model_loaded": False}
+            if pipeline.last_error:
+                status["error"] = pipeline.last_error
+        status["lifecycle"] = pipeline.status()
+        pipelines[name] = status
 
-    # 检查VL
-    if vl_service:
-        pipelines["vl"] = vl_service.health_check()
-    else:
-        pipelines["vl"] = {"status": "unavailable", "error": "Service not initialized"}
+    # 附加vLLM探测状态（读取后台探测缓存，vLLM不可用时VL产线无论是否加载都不可用）
+    prober = get_vllm_prober()
+    if prober and "vl" in pipelines:
+        pipelines["vl"]["vllm"] = prober.status()
+        if not prober.available:
+            pipelines["vl"]["status"] = "unavailable"
 
-    # 检查StructureV3
-    if structure_v3_service:
-        pipelines["structure"] = structure_v3_service.health_check()
-    else:
-        pipelines["structure"] = {"status": "unavailable", "error": "Service not initialized"}
+    # 附加熔断器状态（熔断期间产线不可用）
+    for name, status in pipelines.items():
+        breaker = get_breaker(name)
+        if breaker:
+            status["circuit_breaker"] = breaker.stats()
+            if not breaker.available:
+                status["status"] = "unavailable"
+
+    # 附加执行器队列与准入统计
+    for name, status in pipelines.items():
+        executor = get_executor(name)
+        if executor:
+            status["executor"] = executor.stats()
+        admission = get_admission(name)
+        if admission:
+            status["admission"] = admission.stats()
 
     # 判断整体状态
-    all_ready = all(
-        p.get("status") == "ready" for p in pipelines.values()
+    all_ready = bool(pipelines) and all(
+        p.get("status") in AVAILABLE_STATES for p in pipelines.values()
     )
     any_ready = any(
-        p.get("status") == "ready" for p in pipelines.values()
+        p.get("status") in AVAILABLE_STATES for p in pipelines.values()
     )
 
     if all_ready:
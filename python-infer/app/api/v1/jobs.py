@@ -0,0 +1,169 @@
+"""
+异步任务路由
+大文档提交后立即返回任务ID，客户端轮询状态与结果，避免长时间占用HTTP连接
+"""
+from fastapi import APIRouter, File, UploadFile, Form, Header, HTTPException
+from datetime import datetime
+import asyncio
+import os
+import shutil
+import uuid
+import logging
+from typing import Optional
+
+from core.models import OCRResponse, MetricsModel, JobResponse
+from core.config import settings
+from core.jobs import get_job_store, JOB_SUCCEEDED, JOB_FAILED
+from api.v1.ocr import process_upload_file, create_response, negotiate_response_type
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# 全局任务执行器（在main.py中初始化）
+job_runner = None
+
+JOB_PIPELINES = ("ocrv5", "vl", "structure")
+
+
+def set_job_runner(runner):
+    """设置任务执行器"""
+    global job_runner
+    job_runner = runner
+
+
+def _to_datetime(timestamp: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(timestamp) if timestamp is not None else None
+
+
+def build_job_response(job: dict) -> JobResponse:
+    """将任务记录转换为响应模型"""
+    base = f"{settings.API_V1_PREFIX}/jobs/{job['id']}"
+    return JobResponse(
+        job_id=job["id"],
+        pipeline=job["pipeline"],
+        status=job["status"],
+        filename=job["filename"],
+        pages_total=job["pages_total"],
+        pages_done=job["pages_done"],
+        error=job["error"],
+        created_at=_to_datetime(job["created_at"]),
+        started_at=_to_datetime(job["started_at"]),
+        finished_at=_to_datetime(job["finished_at"]),
+        expires_at=_to_datetime(job["expires_at"]),
+        status_url=base,
+        result_url=f"{base}/result",
+    )
+
+
+def _require_store():
+    store = get_job_store()
+    if store is None or job_runner is None:
+        raise HTTPException(status_code=503, detail="异步任务未启用")
+    return store
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202, summary="提交异步识别任务")
+async def submit_job(
+    file: UploadFile = File(..., description="图片或PDF文件"),
+    pipeline: str = Form("structure", description="产线(ocrv5/vl/structure)"),
+    format: str = Form("json", description="输出格式(json/markdown)，ocrv5忽略"),
+    compress: bool = Form(False, description="是否前端已压缩"),
+    fallback: bool = Form(False, description="vl产线不可用（熔断或vLLM不可用）时降级到StructureV3")
+):
+    """
+    提交异步识别任务，立即返回任务ID
+
+    - 适用场景：多页PDF等耗时较长的文档
+    - 任务持久化在SQLite中，网关重启后继续执行
+    - 通过 GET /jobs/{id} 查询逐页进度，GET /jobs/{id}/result 获取结果
+    - 执行时以batch优先级占用产线准入名额，VL任务经熔断器推理
+    """
+    store = _require_store()
+    if pipeline not in JOB_PIPELINES:
+        raise HTTPException(status_code=400, detail=f"不支持的产线: {pipeline}。仅支持: {list(JOB_PIPELINES)}")
+    if format not in ("json", "markdown"):
+        raise HTTPException(status_code=400, detail=f"不支持的输出格式: {format}。仅支持: json/markdown")
+
+    upload = await process_upload_file(file)
+    try:
+        # 输入落盘到任务目录，保证重启后仍可执行
+        job_id = uuid.uuid4().hex
+        input_path = store.input_path(job_id, upload.ext)
+
+        def persist_input():
+            upload.buffer.seek(0)
+            with open(input_path, "wb") as f:
+                shutil.copyfileobj(upload.buffer, f)
+
+        try:
+            await asyncio.to_thread(persist_input)
+            await asyncio.to_thread(
+                store.create,
+                pipeline,
+                {"format": format, "compress": compress, "fallback": fallback, "upload_time": upload.upload_time},
+                upload.filename,
+                input_path,
+                upload.size,
+                upload.content_hash,
+                job_id,
+            )
+        except BaseException:
+            # 输入写入或任务记录创建失败：没有任务引用这份输入，立即删除
+            if os.path.exists(input_path):
+                os.remove(input_path)
+            raise
+    finally:
+        upload.close()
+
+    job_runner.notify()
+    logger.info(f"任务已提交 {job_id} ({pipeline}, {upload.filename}, {upload.size_kb:.1f}KB)")
+    return build_job_response(await asyncio.to_thread(store.get, job_id))
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse, summary="查询任务状态")
+async def get_job(job_id: str):
+    """返回任务状态与逐页进度"""
+    store = _require_store()
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在或已过期: {job_id}")
+    return build_job_response(job)
+
+
+@router.get("/jobs/{job_id}/result", response_model=OCRResponse, summary="获取任务结果")
+async def get_job_result(
+    job_id: str,
+    accept: Optional[str] = Header(None, description="响应编码(application/json/msgpack/cbor)")
+):
+    """
+    获取已完成任务的识别结果（与同步端点响应格式及编码协商一致）
+
+    - 任务未完成：409
+    - 任务失败：500，detail为失败原因
+    """
+    media_type = negotiate_response_type(accept)
+    store = _require_store()
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务不存在或已过期: {job_id}")
+    if job["status"] == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["status"] != JOB_SUCCEEDED:
+        raise HTTPException(
+            status_code=409,
+            detail=f"任务尚未完成: {job['status']} ({job['pages_done']}/{job['pages_total'] or '?'}页)"
+        )
+
+    stored = await asyncio.to_thread(store.get_result, job_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail=f"任务结果不存在: {job_id}")
+
+    response = OCRResponse(
+        success=True,
+        pipeline=stored.get("pipeline", job["pipeline"]),
+        fallback_from=stored.get("fallback_from"),
+        result=stored["result"],
+        metrics=MetricsModel(**stored["metrics"])
+    )
+    return create_response(response, media_type)
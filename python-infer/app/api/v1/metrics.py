@@ -0,0 +1,25 @@
+"""
+指标导出路由
+"""
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+from core.config import settings
+from core.metrics import PROMETHEUS_CONTENT_TYPE, render
+
+router = APIRouter()
+
+
+@router.get("/metrics", summary="Prometheus指标")
+async def prometheus_metrics():
+    """
+    以Prometheus文本格式导出网关指标
+
+    - 各产线分阶段耗时直方图（upload/preprocess/queue/inference/formatting/serialization）
+    - 请求数、错误数、请求/响应字节数
+    - 在途请求数、执行器排队深度
+    """
+    if not settings.ENABLE_METRICS:
+        raise HTTPException(status_code=404, detail="指标采集未启用")
+    # 直接设置Content-Type头，避免Response为text/*再追加一次charset
+    return Response(content=render(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
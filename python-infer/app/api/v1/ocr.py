@@ -2,133 +2,688 @@
 OCR API路由层
 处理OCRv5/VL/StructureV3三个端点
 """
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, UploadFile, Form, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
 import time
-import tempfile
-import os
 import logging
+import asyncio
+import hashlib
 import json
 import math
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from typing import Callable, Optional
 
 from core.models import OCRResponse, MetricsModel, ErrorResponse
 from core.config import settings
+from core.executor import get_executor
+from core.cache import get_cache
+from core.metrics import RequestTimer, FALLBACK_TOTAL
+from core.admission import (
+    get_admission, AdmissionRejected, PRIORITIES, PRIORITY_INTERACTIVE
+)
+from core.metrics_export import export_request_metrics
+from core.serialization import (
+    dumps, encode, to_payload, negotiate_media_type, ENCODERS, JSON_MEDIA_TYPE
+)
+from core.preprocess import PreprocessOptions, get_preprocess_options
+from core.imaging import rescale_result
+from core.ingest import (
+    UploadedFile, PreparedInput, prepare_input,
+    sniff_file_type, normalize_ext, MAGIC_SNIFF_BYTES
+)
+from services.pipeline_manager import ManagedPipeline, PipelineLoadError
+from services.ocr_v5 import LAYOUTS, ROI_MODES, normalize_region, pack_columnar
+from services.vl_routing import PipelineUnavailable, predict_vl, vl_unavailable_error, vl_unavailable_reason
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 全局服务实例（在main.py中初始化）
-ocr_v5_service = None
-vl_service = None
-structure_v3_service = None
+# 全局产线管理器（在main.py中初始化）
+pipeline_manager = None
+
 
+def set_pipelines(manager):
+    """设置产线管理器"""
+    global pipeline_manager
+    pipeline_manager = manager
 
-def set_services(ocr_v5, vl, structure_v3):
-    """设置服务实例"""
-    global ocr_v5_service, vl_service, structure_v3_service
-    ocr_v5_service = ocr_v5
-    vl_service = vl
-    structure_v3_service = structure_v3
 
+def get_pipeline(name: str) -> ManagedPipeline:
+    """获取受管产线，未启用时返回503"""
+    pipeline = pipeline_manager.get(name) if pipeline_manager else None
+    if pipeline is None:
+        raise HTTPException(status_code=503, detail=f"{name}产线未启用")
+    return pipeline
 
-def sanitize_floats(obj):
+
+@asynccontextmanager
+async def use_pipeline(pipeline: ManagedPipeline):
     """
-    递归清理对象中的特殊浮点值（inf, nan），使其JSON兼容
+    持有产线执行推理（首次使用时加载模型，期间不会被空闲卸载）
+
+    Yields:
+        Service实例；模型加载失败返回503
+    """
+    try:
+        async with pipeline.lease() as service:
+            yield service
+    except PipelineLoadError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    Args:
-        obj: 要清理的对象
+
+async def load_pipeline(pipeline: ManagedPipeline):
+    """确保产线模型已加载，加载失败返回503"""
+    try:
+        await pipeline.load()
+    except PipelineLoadError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+async def predict_structure_fallback(
+    upload: UploadedFile,
+    output_format: str,
+    compress: bool,
+    total_start: float,
+    priority: str = PRIORITY_INTERACTIVE,
+    reason: Optional[str] = None,
+) -> tuple[dict, MetricsModel]:
+    """VL不可用时改由StructureV3处理（占用StructureV3准入名额），调用方以fallback_from标记降级来源"""
+    logger.warning(f"VL产线不可用，降级到StructureV3: {reason}")
+    prediction, metrics = await predict_upload("structure", upload, output_format, compress, total_start, priority)
+    if settings.ENABLE_METRICS:
+        FALLBACK_TOTAL.labels(pipeline="vl", fallback="structure").inc()
+    return prediction, metrics
+
+
+def parse_priority(priority: Optional[str]) -> str:
+    """校验请求优先级，缺省为interactive"""
+    if priority is None:
+        return PRIORITY_INTERACTIVE
+    priority = priority.strip().lower()
+    if priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"不支持的优先级: {priority}。仅支持: interactive/batch")
+    return priority
+
+
+async def acquire_admission(pipeline: str, priority: str) -> Callable[[], None]:
+    """
+    获取产线准入名额，排队已满时返回429（Retry-After按服务速率估算）
 
     Returns:
-        清理后的对象
-    """
-    if isinstance(obj, dict):
-        return {k: sanitize_floats(v) for k, v in obj.items()}
-    elif isinstance(obj, (list, tuple)):
-        return [sanitize_floats(item) for item in obj]
-    elif isinstance(obj, float):
-        if math.isnan(obj):
-            return None
-        elif math.isinf(obj):
-            return None  # 将inf也转换为null
-        else:
-            return obj
-    else:
-        return obj
+        归还名额的回调（必须调用且只调用一次）
+    """
+    controller = get_admission(pipeline)
+    if controller is None:
+        return lambda: None
+    try:
+        acquired_at = await controller.acquire(priority)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    return lambda: controller.release(acquired_at)
+
 
+def negotiate_response_type(accept: Optional[str]) -> str:
+    """按Accept请求头选择响应编码，客户端显式排除JSON且无其他可用编码时返回406"""
+    media_type = negotiate_media_type(accept)
+    if media_type is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"不支持的响应格式: {accept}。仅支持: {', '.join(ENCODERS)}"
+        )
+    return media_type
 
-def create_json_response(response_data):
+
+def create_response(response_data, media_type: str = JSON_MEDIA_TYPE) -> Response:
     """
-    创建JSON兼容的响应，处理特殊浮点值
+    单次编码生成响应（JSON中NaN/inf输出为null；二进制编码中NumPy数组以原始缓冲区传输）
 
     Args:
         response_data: 要响应的数据对象（通常是OCRResponse）
+        media_type: 响应编码，由negotiate_response_type协商得到
 
     Returns:
-        JSON兼容的响应
+        编码后的响应
     """
-    # 转换为字典并清理特殊浮点值
-    response_dict = response_data.model_dump() if hasattr(response_data, 'model_dump') else response_data
-    clean_dict = sanitize_floats(response_dict)
+    payload = to_payload(response_data) if isinstance(response_data, BaseModel) else response_data
+    return Response(
+        content=encode(payload, media_type),
+        media_type=media_type,
+        headers={"Vary": "Accept"}
+    )
 
-    # 使用标准的JSON序列化
-    json_str = json.dumps(clean_dict, ensure_ascii=False, separators=(',', ':'))
 
-    return JSONResponse(
-        content=json.loads(json_str),
-        media_type="application/json"
-    )
+def build_request_timer(pipeline: str, metrics: MetricsModel) -> RequestTimer:
+    """根据响应指标生成分阶段计时"""
+    timer = RequestTimer(pipeline)
+    timer.record("upload", metrics.upload_time)
+    timer.record("triage", metrics.triage_time)
+    for preprocess in (metrics.decode_time, metrics.disk_io_time, metrics.preprocess_time):
+        timer.record("preprocess", preprocess)
+    timer.record("queue", metrics.queue_time)
+    if not metrics.cache_hit:
+        timer.record("inference", metrics.inference_time)
+        timer.record("formatting", metrics.format_time)
+    return timer
+
+
+def finalize_response(response: OCRResponse, media_type: str = JSON_MEDIA_TYPE) -> Response:
+    """
+    序列化响应并记录分阶段耗时
+
+    耗时同时写入/metrics直方图与Server-Timing响应头。
+    """
+    timer = build_request_timer(response.pipeline, response.metrics)
+
+    serialize_start = time.time()
+    encoded_response = create_response(response, media_type)
+    timer.record("serialization", time.time() - serialize_start)
 
+    if settings.ENABLE_METRICS:
+        timer.observe()
+        export_request_metrics(response.pipeline, response.metrics)
+    encoded_response.headers["Server-Timing"] = timer.server_timing()
+    return encoded_response
 
-async def process_upload_file(file: UploadFile) -> tuple[str, float, float]:
+
+async def run_in_pipeline(pipeline: str, func, *args, **kwargs) -> tuple:
     """
-    处理上传文件，保存到临时文件并返回路径
+    在产线专属执行器中运行阻塞推理，不占用事件循环
 
     Returns:
-        (temp_file_path, upload_time, file_size_kb)
+        (func返回值, queue_time)
     """
-    start_time = time.time()
+    executor = get_executor(pipeline)
+    if executor is None:
+        raise HTTPException(status_code=503, detail=f"{pipeline}执行器未初始化")
+    return await executor.run(func, *args, **kwargs)
+
+
+async def make_cache_key(
+    pipeline: ManagedPipeline,
+    content_hash: str,
+    output_format: str,
+    preprocess: Optional[PreprocessOptions] = None,
+) -> Optional[str]:
+    """
+    构造结果缓存键，缓存未启用时返回None
 
-    # 验证文件类型
-    file_ext = file.filename.split('.')[-1].lower()
-    if file_ext not in settings.ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"不支持的文件格式: {file_ext}。仅支持: {settings.ALLOWED_EXTENSIONS}"
-        )
+    缓存键使用产线最近一次加载的构造参数，模型被空闲卸载后命中缓存无需重新加载；
+    预处理参数不同会得到不同的推理输入，也计入缓存键。
+    """
+    cache = get_cache()
+    if cache is None:
+        return None
+    try:
+        options = await pipeline.cache_options()
+    except PipelineLoadError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if preprocess is not None:
+        options = {**options, "preprocess": preprocess.signature()}
+    return cache.make_key(content_hash, pipeline.name, output_format, options)
 
-    # 读取文件
-    contents = await file.read()
-    file_size_kb = len(contents) / 1024
 
-    # 验证文件大小
-    if file_size_kb > settings.MAX_FILE_SIZE_MB * 1024:
-        raise HTTPException(
-            status_code=400,
-            detail=f"文件过大: {file_size_kb:.1f}KB。最大支持: {settings.MAX_FILE_SIZE_MB}MB"
-        )
+async def cache_lookup(cache_key: Optional[str]) -> Optional[dict]:
+    """
+    查询结果缓存（磁盘层读取在线程中执行）
 
-    # 保存到临时文件
+    Returns:
+        命中时返回预测结果（inference_time置0），否则返回None
+    """
+    cache = get_cache()
+    if cache is None or cache_key is None:
+        return None
+    prediction = await asyncio.to_thread(cache.get, cache_key)
+    if prediction is None:
+        return None
+    prediction["inference_time"] = 0.0
+    prediction.pop("batch_size", None)
+    prediction.pop("pages_reused", None)
+    prediction.pop("pages_recomputed", None)
+    return prediction
+
+
+async def cache_store(cache_key: Optional[str], prediction: dict):
+    """写入结果缓存"""
+    cache = get_cache()
+    if cache is None or cache_key is None:
+        return
     try:
-        temp_file = tempfile.NamedTemporaryFile(
-            suffix=f'.{file_ext}',
-            delete=False
+        await asyncio.to_thread(cache.set, cache_key, prediction)
+    except Exception as e:
+        logger.warning(f"结果缓存写入失败: {str(e)}")
+
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def encode_stream_event(event: str, payload: dict, stream: str) -> bytes:
+    """
+    编码一个流式事件
+
+    Args:
+        event: 事件类型 (page/done/error)
+        payload: 事件数据
+        stream: 流式格式 (ndjson/sse)
+
+    Returns:
+        编码后的字节块
+    """
+    data = dumps(payload)
+    if stream == "sse":
+        return b"event: " + event.encode("utf-8") + b"\ndata: " + data + b"\n\n"
+    return b'{"event":"' + event.encode("utf-8") + b'","data":' + data + b'}\n'
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    流式响应结束后执行清理回调
+
+    回调在响应的__call__中执行，客户端在流开始前断开（生成器从未运行，其finally不会执行）时同样会调用。
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            try:
+                # 先结束生成器（释放其持有的产线租约），再执行清理
+                if hasattr(self.body_iterator, "aclose"):
+                    await self.body_iterator.aclose()
+            finally:
+                self.on_close()
+
+
+def stream_structure_pages(
+    pipeline: ManagedPipeline,
+    upload: UploadedFile,
+    prepared: PreparedInput,
+    output_format: str,
+    stream: str,
+    compress: bool,
+    total_start: float,
+    on_close: Optional[Callable[[], None]] = None,
+) -> StreamingResponse:
+    """
+    逐页流式返回StructureV3结果，流结束后清理推理输入
+
+    Args:
+        pipeline: StructureV3产线
+        upload: 上传文件
+        prepared: 推理输入（由本函数负责清理）
+        output_format: 输出格式 (json/markdown)
+        stream: 流式格式 (ndjson/sse)
+        compress: 是否前端已压缩
+        total_start: 请求开始时间
+        on_close: 流结束（含客户端断开、流未开始）后的回调
+    """
+    async def page_events():
+        page_iter = None
+        pages = 0
+        pages_reused = 0
+        inference_time = 0.0
+        format_time = 0.0
+        queue_time = 0.0
+        try:
+            # 流式输出期间持有产线，避免被空闲卸载
+            async with pipeline.lease() as service:
+                page_iter = service.predict_stream(prepared.data, output_format=output_format)
+                while True:
+                    # 每一页都在structure执行器中推进生成器
+                    page, wait = await run_in_pipeline("structure", next, page_iter, None)
+                    queue_time += wait
+                    if page is None:
+                        break
+                    pages += 1
+                    if prepared.scales:
+                        page["result"] = rescale_result(page["result"], prepared.scales[page["page"]:page["page"] + 1])
+                    pages_reused += page["reused"]
+                    inference_time += page["inference_time"]
+                    format_time += page["format_time"]
+                    yield encode_stream_event("page", page, stream)
+
+            metrics = build_metrics(
+                {
+                    "inference_time": inference_time,
+                    "format_time": format_time,
+                    "pages_reused": pages_reused,
+                    "pages_recomputed": pages - pages_reused,
+                    "source": "local",
+                },
+                upload, prepared, compress, total_start, queue_time=queue_time
+            )
+            if settings.ENABLE_METRICS:
+                build_request_timer("structure", metrics).observe()
+                export_request_metrics("structure", metrics)
+            yield encode_stream_event(
+                "done",
+                {"success": True, "pipeline": "structure", "pages": pages, "metrics": metrics.model_dump()},
+                stream
+            )
+        except Exception as e:
+            logger.error(f"StructureV3流式推理失败: {str(e)}", exc_info=True)
+            yield encode_stream_event(
+                "error", {"success": False, "page": pages, "error": f"推理失败: {str(e)}"}, stream
+            )
+        finally:
+            try:
+                if page_iter is not None:
+                    page_iter.close()
+            except ValueError:
+                # 客户端断开时生成器可能仍在执行器线程中运行
+                pass
+
+    def close():
+        prepared.cleanup()
+        if on_close is not None:
+            on_close()
+
+    return ClosingStreamingResponse(page_events(), on_close=close, media_type=STREAM_MEDIA_TYPES[stream])
+
+
+async def start_structure_stream(
+    pipeline: ManagedPipeline,
+    upload: UploadedFile,
+    output_format: str,
+    stream: str,
+    compress: bool,
+    total_start: float,
+    priority: str,
+) -> StreamingResponse:
+    """获取准入名额并启动StructureV3逐页流，流式输出期间持续占用名额，流结束后归还"""
+    release_admission = await acquire_admission("structure", priority)
+    try:
+        # 模型加载失败时直接返回503，而不是在流中报错
+        await load_pipeline(pipeline)
+        prepared = await prepare_upload(upload, get_preprocess_options("structure", compress))
+    except BaseException:
+        release_admission()
+        raise
+    # 推理输入与准入名额交由流生成器清理
+    return stream_structure_pages(
+        pipeline, upload, prepared, output_format, stream, compress, total_start,
+        on_close=release_admission
+    )
+
+
+class UploadSpooler:
+    """
+    分块写入上传内容并校验
+
+    - 按块累计大小，超过MAX_FILE_SIZE_MB立即拒绝(413)，不等整个文件读完
+    - 内容写入有内存上限的spool缓冲区，超出部分自动落盘
+    - 结束时根据文件头魔数校验实际类型，而非仅凭扩展名
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        self.allowed = {normalize_ext(ext) for ext in settings.ALLOWED_EXTENSIONS}
+
+        # 验证文件类型（扩展名预检）
+        self.ext = normalize_ext(filename.split('.')[-1])
+        if self.ext not in self.allowed:
+            raise HTTPException(
+                status_code=400,
+                detail=f"不支持的文件格式: {self.ext}。仅支持: {settings.ALLOWED_EXTENSIONS}"
+            )
+
+        self.buffer = tempfile.SpooledTemporaryFile(
+            max_size=settings.UPLOAD_SPOOL_MAX_MEMORY_MB * 1024 * 1024
         )
-        temp_file.write(contents)
-        temp_file.close()
-        temp_path = temp_file.name
+        self.hasher = hashlib.sha256()
+        self.head = b""
+        self.size = 0
+
+    def check_declared_size(self, size: Optional[int]):
+        """已知大小超限时直接拒绝"""
+        if size is not None and size > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"文件过大: {size / 1024:.1f}KB。最大支持: {settings.MAX_FILE_SIZE_MB}MB"
+            )
+
+    def write(self, chunk: bytes):
+        """写入一块内容，边写边校验大小"""
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"文件过大: 已超过{settings.MAX_FILE_SIZE_MB}MB上限"
+            )
+        if len(self.head) < MAGIC_SNIFF_BYTES:
+            self.head += chunk[:MAGIC_SNIFF_BYTES - len(self.head)]
+        self.hasher.update(chunk)
+        self.buffer.write(chunk)
+
+    def finish(self, upload_time: float) -> UploadedFile:
+        """校验文件头并生成UploadedFile"""
+        if self.size == 0:
+            raise HTTPException(status_code=400, detail="上传文件为空")
+
+        # 验证文件头
+        file_type = sniff_file_type(self.head)
+        if file_type is None or file_type not in self.allowed:
+            raise HTTPException(
+                status_code=400,
+                detail=f"文件内容与支持的格式不符: {self.filename}。仅支持: {settings.ALLOWED_EXTENSIONS}"
+            )
+        if file_type != self.ext:
+            logger.info(f"文件扩展名与内容不一致，按内容识别: {self.filename} -> {file_type}")
+
+        return UploadedFile(
+            filename=self.filename,
+            ext=file_type,
+            buffer=self.buffer,
+            size=self.size,
+            content_hash=self.hasher.hexdigest(),
+            upload_time=upload_time
+        )
+
+    def close(self):
+        self.buffer.close()
+
+
+async def process_upload_file(file: UploadFile) -> UploadedFile:
+    """
+    分块读取并校验上传文件（校验规则见UploadSpooler）
+
+    Returns:
+        UploadedFile
+    """
+    start_time = time.time()
+    spooler = UploadSpooler(file.filename)
+
+    try:
+        spooler.check_declared_size(file.size)
+        # 分块读取，边读边校验大小
+        while True:
+            chunk = await file.read(settings.UPLOAD_CHUNK_SIZE_KB * 1024)
+            if not chunk:
+                break
+            spooler.write(chunk)
+        return spooler.finish(time.time() - start_time)
+    except BaseException:
+        spooler.close()
+        raise
+
+
+async def prepare_upload(upload: UploadedFile, preprocess: Optional[PreprocessOptions] = None) -> PreparedInput:
+    """在线程中解码并预处理上传文件，得到推理输入"""
+    try:
+        return await asyncio.to_thread(prepare_input, upload, preprocess)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"文件处理失败: {str(e)}")
+
+
+def build_metrics(
+    prediction: dict,
+    upload: UploadedFile,
+    prepared: Optional[PreparedInput],
+    compress: bool,
+    total_start: float,
+    queue_time: Optional[float] = None,
+    cache_hit: bool = False,
+) -> MetricsModel:
+    """汇总一次请求的性能指标"""
+    return MetricsModel(
+        total_time=time.time() - total_start,
+        inference_time=prediction["inference_time"],
+        format_time=prediction.get("format_time"),
+        upload_time=upload.upload_time,
+        decode_time=prepared.decode_time if prepared else None,
+        disk_io_time=prepared.disk_io_time if prepared else None,
+        preprocess_time=prepared.preprocess_time if prepared else None,
+        queue_time=queue_time,
+        batch_size=prediction.get("batch_size"),
+        image_size_kb=upload.size_kb,
+        compressed=compress,
+        cache_hit=cache_hit,
+        pages_reused=prediction.get("pages_reused"),
+        pages_recomputed=prediction.get("pages_recomputed"),
+        source=prediction["source"]
+    )
 
-    upload_time = time.time() - start_time
 
-    return temp_path, upload_time, file_size_kb
+async def predict_upload(
+    name: str,
+    upload: UploadedFile,
+    fmt: str,
+    compress: bool,
+    total_start: float,
+    priority: str = PRIORITY_INTERACTIVE,
+    regions: Optional[list] = None,
+    roi_mode: str = "line",
+) -> tuple[dict, MetricsModel]:
+    """
+    对已读入的上传文件执行推理（结果缓存、准入、预处理、微批/熔断），各同步、批量与自动路由端点共用
+
+    缓存命中时不占用准入名额；未命中时按priority获取产线名额，推理结束后归还。
+
+    Args:
+        name: 产线 (ocrv5/vl/structure)
+        upload: 上传文件
+        fmt: ocrv5为结果布局(rows/columnar)，其余为输出格式(json/markdown)
+        compress: 是否前端已压缩
+        total_start: 请求开始时间
+        priority: 准入优先级
+        regions: 只识别的区域（仅ocrv5，parse_regions的结果）
+        roi_mode: 区域识别模式(line/detect)
+
+    Returns:
+        (预测结果, 性能指标)
+    """
+    pipeline = get_pipeline(name)
+    preprocess = get_preprocess_options(name, compress)
+    # ocrv5的rows布局沿用原缓存键
+    cache_format = "json" if name == "ocrv5" and fmt == "rows" else fmt
+    if regions is not None:
+        if upload.is_pdf:
+            raise HTTPException(status_code=400, detail="区域识别仅支持图片")
+        # 区域坐标基于原图，不缩放分辨率（只裁剪区域，整图尺寸不影响推理耗时）
+        if preprocess is not None:
+            preprocess = replace(preprocess, max_side=0)
+        cache_format = f"{cache_format}|roi:{roi_mode}:{json.dumps(regions)}"
+    cache_key = await make_cache_key(pipeline, upload.content_hash, cache_format, preprocess)
+    prediction = await cache_lookup(cache_key)
+    if prediction is not None:
+        return prediction, build_metrics(prediction, upload, None, compress, total_start, cache_hit=True)
+
+    if name == "vl":
+        unavailable = vl_unavailable_reason()
+        if unavailable:
+            raise vl_unavailable_error(*unavailable)
+
+    queue_time = None
+    prepared = None
+    release_admission = await acquire_admission(name, priority)
+    try:
+        prepared = await prepare_upload(upload, preprocess)
+        if name == "vl":
+            prediction, queue_time = await predict_vl(pipeline, prepared.data, fmt)
+        else:
+            async with use_pipeline(pipeline) as service:
+                # 区域识别单独推理（各区域已在请求内整批）；单张图片走微批调度；PDF会展开为多页结果，单独推理
+                if regions is not None:
+                    prediction, queue_time = await run_in_pipeline(
+                        "ocrv5", service.predict_regions, prepared.data, regions, layout=fmt, mode=roi_mode
+                    )
+                elif name == "ocrv5" and pipeline.batcher and not upload.is_pdf:
+                    prediction, queue_time = await pipeline.batcher.submit((prepared.data, fmt))
+                elif name == "ocrv5":
+                    prediction, queue_time = await run_in_pipeline(
+                        "ocrv5", service.predict, prepared.data, layout=fmt
+                    )
+                else:
+                    prediction, queue_time = await run_in_pipeline(
+                        "structure", service.predict, prepared.data, output_format=fmt
+                    )
+        prediction["result"] = rescale_result(prediction["result"], prepared.scales)
+        if prepared.preprocess != preprocess:
+            # 解码失败回退临时文件时未做预处理，按实际执行的流程写入缓存
+            cache_key = await make_cache_key(pipeline, upload.content_hash, cache_format, prepared.preprocess)
+        await cache_store(cache_key, prediction)
+        metrics = build_metrics(prediction, upload, prepared, compress, total_start, queue_time=queue_time)
+    finally:
+        if prepared:
+            prepared.cleanup()
+        release_admission()
+    return prediction, metrics
+
+
+def parse_regions(regions: Optional[str]) -> Optional[list]:
+    """
+    解析区域识别参数（JSON数组，元素为 [x1, y1, x2, y2] 矩形或 [[x, y], ...] 多边形）
+
+    Returns:
+        规整后的四点多边形列表；未传入时返回None
+    """
+    if regions is None or not regions.strip():
+        return None
+    try:
+        items = json.loads(regions)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="regions必须为JSON数组")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(status_code=400, detail="regions必须为非空JSON数组")
+    if len(items) > settings.OCRV5_MAX_REGIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"区域数量 {len(items)} 超过上限 {settings.OCRV5_MAX_REGIONS}"
+        )
+    quads = []
+    for index, item in enumerate(items):
+        try:
+            quads.append(normalize_region(item))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"regions[{index}] 无效: {str(e)}")
+    return quads
 
 
 @router.post("/text", response_model=OCRResponse, summary="基础文本识别（OCRv5）")
 async def ocr_text(
     file: UploadFile = File(..., description="图片文件"),
-    compress: bool = Form(False, description="是否前端已压缩")
+    compress: bool = Form(False, description="是否前端已压缩"),
+    layout: str = Form("rows", description="结果布局(rows/columnar)，columnar返回texts/scores/boxes/polygons平行数组"),
+    packed: bool = Form(False, description="columnar布局下把scores/boxes/polygons打包为float32/int16的base64缓冲区"),
+    regions: Optional[str] = Form(None, description="只识别的区域，JSON数组：[x1,y1,x2,y2]矩形或[[x,y],...]多边形（原图坐标）"),
+    roi_mode: str = Form("line", description="区域识别模式(line/detect)：line每个区域视为一行文本、跳过检测；detect只在区域内检测"),
+    accept: Optional[str] = Header(None, description="响应编码(application/json/msgpack/cbor)"),
+    x_priority: Optional[str] = Header(None, description="请求优先级(interactive/batch)，interactive优先获得处理名额")
 ):
     """
     使用PP-OCRv5进行基础文本识别
@@ -136,54 +691,54 @@ async def ocr_text(
     - 适用场景：纯文本文档、证件照片、简单截图
     - 推理位置：宿主机本地
     - 预期耗时：~0.95s
+    - 密集文本页可使用layout=columnar减少后处理耗时与响应体积
+    - 固定版式（表单、票据）可传regions只识别指定区域，各区域整批推理，不做整页检测
+    - 响应编码：Accept: application/msgpack 或 application/cbor 时返回二进制编码
     """
-    if not ocr_v5_service:
-        raise HTTPException(status_code=503, detail="OCRv5服务未初始化")
+    pipeline = get_pipeline("ocrv5")
+    media_type = negotiate_response_type(accept)
+    priority = parse_priority(x_priority)
+
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"不支持的结果布局: {layout}。仅支持: rows/columnar")
+    if roi_mode not in ROI_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的区域识别模式: {roi_mode}。仅支持: line/detect")
+    quads = parse_regions(regions)
 
     total_start = time.time()
+    # 先读入并校验上传文件，无效请求不占用准入名额
+    upload = await process_upload_file(file)
 
     try:
-        # 处理文件上传
-        temp_path, upload_time, file_size_kb = await process_upload_file(file)
-
-        try:
-            # 执行OCR推理
-            prediction = ocr_v5_service.predict(temp_path)
-
-            # 构造响应
-            total_time = time.time() - total_start
+        prediction, metrics = await predict_upload(
+            "ocrv5", upload, layout, compress, total_start, priority, regions=quads, roi_mode=roi_mode
+        )
+        result = prediction["result"]
+        if layout == "columnar" and packed:
+            result = pack_columnar(result)
 
-            return OCRResponse(
-                success=True,
-                pipeline="ocrv5",
-                result=prediction["result"],
-                metrics=MetricsModel(
-                    total_time=total_time,
-                    inference_time=prediction["inference_time"],
-                    upload_time=upload_time,
-                    preprocess_time=None,
-                    image_size_kb=file_size_kb,
-                    compressed=compress,
-                    source=prediction["source"]
-                )
-            )
-        finally:
-            # 清理临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        # 构造响应
+        response = OCRResponse(success=True, pipeline="ocrv5", result=result, metrics=metrics)
+        return finalize_response(response, media_type)
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"OCRv5推理失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"推理失败: {str(e)}")
+    finally:
+        # 清理上传缓冲
+        upload.close()
 
 
 @router.post("/document/vl_model", response_model=OCRResponse, summary="复杂文档解析（PaddleOCR-VL，支持PDF）")
 async def ocr_document(
     file: UploadFile = File(..., description="图片或PDF文件"),
     compress: bool = Form(False, description="是否前端已压缩"),
-    format: str = Form("json", description="输出格式(json/markdown)")
+    format: str = Form("json", description="输出格式(json/markdown)"),
+    fallback: bool = Form(False, description="VL产线不可用（熔断或vLLM不可用）时降级到StructureV3"),
+    accept: Optional[str] = Header(None, description="响应编码(application/json/msgpack/cbor)"),
+    x_priority: Optional[str] = Header(None, description="请求优先级(interactive/batch)，interactive优先获得处理名额")
 ):
     """
     使用PaddleOCR-VL进行复杂文档解析
@@ -193,54 +748,55 @@ async def ocr_document(
     - 预期耗时：~2.2s（图片） / ~3-5s（PDF，取决于页数）
     - 支持格式：jpg/png/bmp/pdf
     - 支持输出：json（结构化数据） / markdown（文档格式）
+    - vLLM端点不可用或产线熔断时立即返回503（缓存命中除外）；fallback=true时改由StructureV3处理，
+      响应中pipeline为structure、fallback_from为vl
+    - 响应编码：Accept: application/msgpack 或 application/cbor 时返回二进制编码
     """
-    if not vl_service:
-        raise HTTPException(status_code=503, detail="VL服务未初始化")
+    get_pipeline("vl")
+    media_type = negotiate_response_type(accept)
+    priority = parse_priority(x_priority)
 
     total_start = time.time()
+    # 先读入并校验上传文件，无效请求不占用准入名额
+    upload = await process_upload_file(file)
 
     try:
-        # 处理文件上传
-        temp_path, upload_time, file_size_kb = await process_upload_file(file)
-
         try:
-            # 执行VL推理
-            prediction = vl_service.predict(temp_path, format=format)
-
-            # 构造响应
-            total_time = time.time() - total_start
-
-            return OCRResponse(
+            prediction, metrics = await predict_upload("vl", upload, format, compress, total_start, priority)
+            response = OCRResponse(success=True, pipeline="vl", result=prediction["result"], metrics=metrics)
+        except PipelineUnavailable as e:
+            if not fallback:
+                raise
+            prediction, metrics = await predict_structure_fallback(
+                upload, format, compress, total_start, priority, reason=e.detail
+            )
+            response = OCRResponse(
                 success=True,
-                pipeline="vl",
+                pipeline="structure",
+                fallback_from="vl",
                 result=prediction["result"],
-                metrics=MetricsModel(
-                    total_time=total_time,
-                    inference_time=prediction["inference_time"],
-                    upload_time=upload_time,
-                    preprocess_time=None,
-                    image_size_kb=file_size_kb,
-                    compressed=compress,
-                    source=prediction["source"]
-                )
+                metrics=metrics
             )
-        finally:
-            # 清理临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        return finalize_response(response, media_type)
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"VL推理失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"推理失败: {str(e)}")
+    finally:
+        # 清理上传缓冲
+        upload.close()
 
 
 @router.post("/document/structure_model", response_model=OCRResponse, summary="文档结构识别（StructureV3，支持PDF）")
 async def ocr_table(
     file: UploadFile = File(..., description="图片或PDF文件"),
     compress: bool = Form(False, description="是否前端已压缩"),
-    output_format: str = Form("json", description="输出格式(json/markdown)")
+    output_format: str = Form("json", description="输出格式(json/markdown)"),
+    stream: Optional[str] = Form(None, description="逐页流式输出(ndjson/sse)，为空则整体返回"),
+    accept: Optional[str] = Header(None, description="响应编码(application/json/msgpack/cbor)，流式输出时忽略"),
+    x_priority: Optional[str] = Header(None, description="请求优先级(interactive/batch)，interactive优先获得处理名额")
 ):
     """
     使用PP-StructureV3进行文档结构化解析
@@ -250,48 +806,36 @@ async def ocr_table(
     - 预期耗时：~1.5s（图片） / ~3-5s（PDF，取决于页数）
     - 支持输出：json（结构化数据）/ markdown（文档格式）
     - 支持格式：jpg/png/bmp/pdf
+    - 流式输出：stream=ndjson/sse 时每页完成即返回一个事件，最后返回done事件
+    - 响应编码：Accept: application/msgpack 或 application/cbor 时返回二进制编码
     """
-    if not structure_v3_service:
-        raise HTTPException(status_code=503, detail="StructureV3服务未初始化")
+    pipeline = get_pipeline("structure")
+    if stream and stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的流式格式: {stream}。仅支持: ndjson/sse")
+    media_type = JSON_MEDIA_TYPE if stream else negotiate_response_type(accept)
+    priority = parse_priority(x_priority)
 
     total_start = time.time()
+    # 先读入并校验上传文件，无效请求不占用准入名额
+    upload = await process_upload_file(file)
 
     try:
-        # 处理文件上传
-        temp_path, upload_time, file_size_kb = await process_upload_file(file)
-
-        try:
-            # 执行Structure推理
-            prediction = structure_v3_service.predict(temp_path, output_format=output_format)
-
-            # 构造响应
-            total_time = time.time() - total_start
-
-            # 创建响应对象
-            response = OCRResponse(
-                success=True,
-                pipeline="structure",
-                result=prediction["result"],
-                metrics=MetricsModel(
-                    total_time=total_time,
-                    inference_time=prediction["inference_time"],
-                    upload_time=upload_time,
-                    preprocess_time=None,
-                    image_size_kb=file_size_kb,
-                    compressed=compress,
-                    source=prediction["source"]
-                )
+        if stream:
+            return await start_structure_stream(
+                pipeline, upload, output_format, stream, compress, total_start, priority
             )
 
-            # 使用清理后的JSON响应
-            return create_json_response(response)
-        finally:
-            # 清理临时文件
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        prediction, metrics = await predict_upload(
+            "structure", upload, output_format, compress, total_start, priority
+        )
+        response = OCRResponse(success=True, pipeline="structure", result=prediction["result"], metrics=metrics)
+        return finalize_response(response, media_type)
 
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"StructureV3推理失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"推理失败: {str(e)}")
+    finally:
+        # 清理上传缓冲与临时文件（流式模式下输入已解码，缓冲可立即释放）
+        upload.close()
@@ -0,0 +1,191 @@
+"""
+产线准入控制
+限制每条产线同时处理的请求数与排队请求数，超限直接返回429，
+按观测到的服务速率估算Retry-After；interactive优先级的等待请求先于batch获得名额
+"""
+import asyncio
+import math
+import time
+import logging
+from collections import deque
+from typing import Optional
+
+from core.config import settings
+from core.metrics import ADMISSION_INFLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_INTERACTIVE, PRIORITY_BATCH)
+
+
+class AdmissionRejected(Exception):
+    """产线已满，请求被拒绝"""
+
+    def __init__(self, pipeline: str, retry_after: float):
+        super().__init__(f"{pipeline}产线繁忙，请{math.ceil(retry_after)}秒后重试")
+        self.pipeline = pipeline
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """单条产线的准入控制（仅在事件循环内调用）"""
+
+    def __init__(
+        self,
+        name: str,
+        max_inflight: int,
+        max_queued: int,
+        batch_queue_ratio: float = 0.5,
+        ewma_alpha: float = 0.2,
+    ):
+        """
+        Args:
+            name: 产线名称
+            max_inflight: 同时处理的请求数上限
+            max_queued: 等待名额的请求数上限（超出返回429）
+            batch_queue_ratio: batch请求最多占用的排队名额比例，其余留给interactive请求
+            ewma_alpha: 服务耗时指数滑动平均系数
+        """
+        self.name = name
+        self.max_inflight = max(1, max_inflight)
+        self.max_queued = max(0, max_queued)
+        self.max_batch_queued = int(self.max_queued * batch_queue_ratio)
+        self.ewma_alpha = ewma_alpha
+
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = {priority: 0 for priority in PRIORITIES}
+        self.avg_service_time: Optional[float] = None   # 单个请求占用名额的平均时长(秒)
+        self._waiters: dict[str, deque] = {priority: deque() for priority in PRIORITIES}
+
+        ADMISSION_INFLIGHT.labels(pipeline=name).set_function(lambda: self.inflight)
+        ADMISSION_QUEUED.labels(pipeline=name).set_function(lambda: self.queued)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def service_rate(self) -> Optional[float]:
+        """观测到的服务速率(请求/秒)，尚无样本时返回None"""
+        if not self.avg_service_time:
+            return None
+        return self.max_inflight / self.avg_service_time
+
+    def retry_after(self) -> float:
+        """按当前排队长度与服务速率估算排空所需秒数"""
+        rate = self.service_rate()
+        if rate is None:
+            return 1.0
+        return (self.queued + 1) / rate
+
+    async def acquire(self, priority: str = PRIORITY_INTERACTIVE) -> float:
+        """
+        获取处理名额，满员时排队等待
+
+        Args:
+            priority: 优先级 (interactive/batch)
+
+        Returns:
+            获取名额的时间戳（传给release用于统计服务耗时）
+
+        Raises:
+            AdmissionRejected: 排队已满
+        """
+        # interactive只需等待前面的interactive请求，batch需要等待所有请求
+        ahead = len(self._waiters[PRIORITY_INTERACTIVE])
+        if priority == PRIORITY_BATCH:
+            ahead = self.queued
+        if self.inflight < self.max_inflight and ahead == 0:
+            self.inflight += 1
+            self.admitted += 1
+            return time.time()
+
+        queue_limit = self.max_batch_queued if priority == PRIORITY_BATCH else self.max_queued
+        queued = len(self._waiters[PRIORITY_BATCH]) if priority == PRIORITY_BATCH else self.queued
+        if queued >= queue_limit:
+            self.rejected[priority] += 1
+            ADMISSION_REJECTED.labels(pipeline=self.name, priority=priority).inc()
+            raise AdmissionRejected(self.name, self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 名额已移交给本请求，转交下一个等待者
+                self._hand_off()
+            else:
+                try:
+                    self._waiters[priority].remove(waiter)
+                except ValueError:
+                    # 取消后、本协程恢复前，_hand_off已跳过并弹出了这个等待者
+                    pass
+            raise
+        self.admitted += 1
+        return time.time()
+
+    def release(self, acquired_at: float):
+        """归还名额并记录服务耗时"""
+        service_time = time.time() - acquired_at
+        if self.avg_service_time is None:
+            self.avg_service_time = service_time
+        else:
+            self.avg_service_time += self.ewma_alpha * (service_time - self.avg_service_time)
+        self._hand_off()
+
+    def _hand_off(self):
+        """把名额直接移交给下一个等待者（interactive优先），无等待者时归还"""
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.inflight -= 1
+
+    def stats(self) -> dict:
+        """准入统计（用于/health）"""
+        rate = self.service_rate()
+        return {
+            "max_inflight": self.max_inflight,
+            "max_queued": self.max_queued,
+            "max_batch_queued": self.max_batch_queued,
+            "inflight": self.inflight,
+            "queued": {priority: len(waiters) for priority, waiters in self._waiters.items()},
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_service_time": self.avg_service_time,
+            "service_rate": round(rate, 3) if rate is not None else None,
+        }
+
+
+# 全局准入控制器（在main.py中初始化）
+controllers: dict[str, AdmissionController] = {}
+
+
+def init_admission():
+    """按配置创建各产线准入控制器"""
+    if not settings.ADMISSION_ENABLED:
+        return
+    limits = {
+        "ocrv5": (settings.OCRV5_MAX_INFLIGHT, settings.OCRV5_MAX_QUEUED),
+        "vl": (settings.VL_MAX_INFLIGHT, settings.VL_MAX_QUEUED),
+        "structure": (settings.STRUCTURE_MAX_INFLIGHT, settings.STRUCTURE_MAX_QUEUED),
+    }
+    for name, (max_inflight, max_queued) in limits.items():
+        controllers[name] = AdmissionController(
+            name, max_inflight, max_queued, batch_queue_ratio=settings.ADMISSION_BATCH_QUEUE_RATIO
+        )
+    logger.info(
+        "产线准入控制: "
+        + ", ".join(f"{name}={c.max_inflight}+{c.max_queued}" for name, c in controllers.items())
+    )
+
+
+def get_admission(pipeline: str) -> Optional[AdmissionController]:
+    """获取指定产线的准入控制器，未启用时返回None"""
+    return controllers.get(pipeline)
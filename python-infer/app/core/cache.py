@@ -0,0 +1,342 @@
+"""
+推理结果缓存
+按上传内容哈希寻址的两级缓存：内存LRU（字节预算） + 磁盘目录；
+另有按栅格化页面像素哈希寻址的逐页结果存储，修订后重新上传的PDF只需推理新增或变化的页
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """内容寻址的两级推理结果缓存"""
+
+    def __init__(
+        self,
+        memory_max_bytes: int,
+        disk_dir: Optional[str],
+        disk_max_bytes: int,
+        ttl_seconds: int,
+    ):
+        """
+        初始化缓存
+
+        Args:
+            memory_max_bytes: 内存层字节预算
+            disk_dir: 磁盘层目录，为空则禁用磁盘层
+            disk_max_bytes: 磁盘层字节预算
+            ttl_seconds: 条目有效期(秒)，<=0表示永不过期
+        """
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.ttl = ttl_seconds
+
+        self._lock = threading.Lock()
+        # key -> (写入时间, 序列化后的字节)
+        self._memory: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._memory_bytes = 0
+        # key -> (写入时间, 文件大小)
+        self._disk_index: dict[str, tuple[float, int]] = {}
+        self._disk_bytes = 0
+
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        self.evictions = {"memory": 0, "disk": 0}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(content_hash: str, pipeline: str, output_format: str, options: dict) -> str:
+        """
+        构造缓存键
+
+        Args:
+            content_hash: 上传文件内容的sha256
+            pipeline: 产线名称
+            output_format: 输出格式
+            options: 服务构造参数
+
+        Returns:
+            形如 "<pipeline>-<sha256>" 的缓存键
+        """
+        options_str = json.dumps(options, sort_keys=True, default=str)
+        digest = hashlib.sha256(
+            f"{content_hash}|{pipeline}|{output_format}|{options_str}".encode("utf-8")
+        ).hexdigest()
+        return f"{pipeline}-{digest}"
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        读取缓存，先查内存层再查磁盘层（磁盘命中会回填内存）
+
+        Returns:
+            缓存的预测结果，未命中或已过期返回None
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, data = entry
+                if self._expired(created, now):
+                    self._memory_pop(key)
+                else:
+                    self._memory.move_to_end(key)
+                    self.hits["memory"] += 1
+                    return pickle.loads(data)
+
+        data = self._disk_get(key, now)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits["disk"] += 1
+            self._memory_put(key, data, now)
+        return pickle.loads(data)
+
+    def set(self, key: str, value: dict):
+        """写入缓存（内存层与磁盘层）"""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+
+        with self._lock:
+            self._memory_put(key, data, now)
+        self._disk_put(key, data, now)
+
+    def purge(self, pipeline: Optional[str] = None) -> int:
+        """
+        清空缓存
+
+        Args:
+            pipeline: 仅清理指定产线，为空则全部清理
+
+        Returns:
+            删除的条目数（两层合计）
+        """
+        prefix = f"{pipeline}-" if pipeline else ""
+        removed = 0
+
+        with self._lock:
+            for key in [k for k in self._memory if k.startswith(prefix)]:
+                self._memory_pop(key)
+                removed += 1
+            disk_keys = [k for k in self._disk_index if k.startswith(prefix)]
+            for key in disk_keys:
+                self._disk_remove(key)
+                removed += 1
+
+        logger.info(f"缓存已清理: pipeline={pipeline or 'all'}, removed={removed}")
+        return removed
+
+    def stats(self) -> dict:
+        """返回缓存统计"""
+        with self._lock:
+            return {
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes,
+                "disk_entries": len(self._disk_index),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+                "ttl_seconds": self.ttl,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "evictions": dict(self.evictions),
+            }
+
+    # ---------- 内部实现（调用方需持有锁） ----------
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl > 0 and now - created > self.ttl
+
+    def _memory_put(self, key: str, data: bytes, created: float):
+        if len(data) > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory_pop(key)
+        self._memory[key] = (created, data)
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            oldest = next(iter(self._memory))
+            self._memory_pop(oldest)
+            self.evictions["memory"] += 1
+
+    def _memory_pop(self, key: str):
+        _, data = self._memory.pop(key)
+        self._memory_bytes -= len(data)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _load_disk_index(self):
+        """启动时扫描磁盘层，重建索引"""
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            self._disk_index[name[:-4]] = (stat.st_mtime, stat.st_size)
+            self._disk_bytes += stat.st_size
+        logger.info(f"磁盘缓存索引: {len(self._disk_index)}条, {self._disk_bytes / 1024 / 1024:.1f}MB")
+
+    def _disk_get(self, key: str, now: float) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        with self._lock:
+            entry = self._disk_index.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[0], now):
+                self._disk_remove(key)
+                return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                if key in self._disk_index:
+                    self._disk_remove(key)
+            return None
+
+    def _disk_put(self, key: str, data: bytes, created: float):
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"磁盘缓存写入失败: {str(e)}")
+            return
+
+        with self._lock:
+            if key in self._disk_index:
+                self._disk_bytes -= self._disk_index[key][1]
+            self._disk_index[key] = (created, len(data))
+            self._disk_bytes += len(data)
+            if self._disk_bytes > self.disk_max_bytes:
+                # 按写入时间淘汰最旧的条目
+                for old_key, _ in sorted(self._disk_index.items(), key=lambda kv: kv[1][0]):
+                    if self._disk_bytes <= self.disk_max_bytes:
+                        break
+                    self._disk_remove(old_key)
+                    self.evictions["disk"] += 1
+
+    def _disk_remove(self, key: str):
+        _, size = self._disk_index.pop(key)
+        self._disk_bytes -= size
+        try:
+            os.remove(self._disk_path(key))
+        except OSError:
+            pass
+
+
+# 全局缓存实例（在main.py中初始化）
+result_cache: Optional[ResultCache] = None
+# 逐页结果存储（与结果缓存同一实现，独立预算与目录）
+page_cache: Optional[ResultCache] = None
+
+
+def init_cache():
+    """按配置创建结果缓存与逐页结果存储"""
+    global result_cache, page_cache
+    if not settings.CACHE_ENABLED:
+        result_cache = None
+        page_cache = None
+        return
+    result_cache = ResultCache(
+        memory_max_bytes=settings.CACHE_MEMORY_MAX_MB * 1024 * 1024,
+        disk_dir=settings.CACHE_DIR or None,
+        disk_max_bytes=settings.CACHE_DISK_MAX_MB * 1024 * 1024,
+        ttl_seconds=settings.CACHE_TTL_SECONDS,
+    )
+    logger.info(f"结果缓存已启用: 内存{settings.CACHE_MEMORY_MAX_MB}MB, 磁盘目录{settings.CACHE_DIR}")
+
+    if settings.PAGE_CACHE_ENABLED:
+        page_cache = ResultCache(
+            memory_max_bytes=settings.PAGE_CACHE_MEMORY_MAX_MB * 1024 * 1024,
+            disk_dir=settings.PAGE_CACHE_DIR or None,
+            disk_max_bytes=settings.PAGE_CACHE_DISK_MAX_MB * 1024 * 1024,
+            ttl_seconds=settings.CACHE_TTL_SECONDS,
+        )
+        logger.info(f"逐页结果存储已启用: 内存{settings.PAGE_CACHE_MEMORY_MAX_MB}MB, 磁盘目录{settings.PAGE_CACHE_DIR}")
+    else:
+        page_cache = None
+
+
+def get_cache() -> Optional[ResultCache]:
+    """获取全局结果缓存"""
+    return result_cache
+
+
+def get_page_cache() -> Optional[ResultCache]:
+    """获取全局逐页结果存储"""
+    return page_cache
+
+
+def hash_page(page: np.ndarray) -> str:
+    """
+    栅格化页面的像素哈希
+
+    尺寸与数据类型一并计入，同一页以不同分辨率渲染视为不同的页。
+    """
+    digest = hashlib.sha256(f"{page.shape}|{page.dtype}|".encode("utf-8"))
+    digest.update(np.ascontiguousarray(page).data)
+    return digest.hexdigest()
+
+
+def lookup_pages(
+    pages: list[np.ndarray],
+    pipeline: str,
+    output_format: str,
+    options: dict,
+) -> tuple[list[Optional[str]], list[Optional[dict]]]:
+    """
+    查询逐页结果存储（阻塞函数，在推理线程中调用）
+
+    Args:
+        pages: 逐页BGR数组
+        pipeline: 产线名称
+        output_format: 输出格式
+        options: 服务构造参数
+
+    Returns:
+        (逐页存储键, 逐页已存储的格式化结果)；未启用时键与结果均为None
+    """
+    store = get_page_cache()
+    if store is None:
+        return [None] * len(pages), [None] * len(pages)
+    keys = [ResultCache.make_key(hash_page(page), pipeline, output_format, options) for page in pages]
+    return keys, [store.get(key) for key in keys]
+
+
+def store_page(key: Optional[str], result: dict):
+    """写入单页格式化结果（写入失败只记录日志）"""
+    store = get_page_cache()
+    if store is None or key is None:
+        return
+    try:
+        store.set(key, result)
+    except Exception as e:
+        logger.warning(f"逐页结果写入失败: {str(e)}")
@@ -0,0 +1,250 @@
+"""
+产线熔断器
+按滑动窗口内的失败率与慢调用率熔断，熔断期满后进入半开状态放行少量试探请求
+"""
+import threading
+import time
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+import httpx
+from starlette.exceptions import HTTPException
+
+from core.config import settings
+from core.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS, CIRCUIT_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态（数值用于导出指标）
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_HALF_OPEN = "half_open"
+CIRCUIT_OPEN = "open"
+STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+# 后端客户端库（openai/requests等）的连接与超时异常类名，按名称匹配以免引入可选依赖
+BACKEND_ERROR_NAMES = frozenset({
+    "APIConnectionError", "APITimeoutError", "ConnectTimeout", "ReadTimeout", "Timeout", "ConnectionError",
+})
+
+
+def is_backend_failure(exc: BaseException) -> bool:
+    """
+    异常是否由后端服务（vLLM）故障引起：连接失败、超时或5xx响应
+
+    网关自身抛出的HTTPException、输入/解码错误等不计入熔断统计。沿__cause__/__context__
+    检查异常链，以识别被推理框架包装过的后端异常。
+
+    Args:
+        exc: 推理调用抛出的异常
+
+    Returns:
+        是否计为熔断失败
+    """
+    if isinstance(exc, HTTPException):
+        return False
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, (ConnectionError, TimeoutError, httpx.TransportError)):
+            return True
+        if type(exc).__name__ in BACKEND_ERROR_NAMES:
+            return True
+        status = getattr(exc, "status_code", None)
+        if status is None:
+            status = getattr(getattr(exc, "response", None), "status_code", None)
+        if isinstance(status, int) and status >= 500:
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class CircuitBreaker:
+    """单条产线的熔断器"""
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = 20,
+        min_calls: int = 5,
+        failure_rate_threshold: float = 0.5,
+        slow_call_seconds: float = 30.0,
+        slow_rate_threshold: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 2,
+    ):
+        """
+        Args:
+            name: 产线名称
+            window_size: 统计最近多少次调用
+            min_calls: 窗口内至少多少次调用后才计算比率
+            failure_rate_threshold: 失败率达到该值时熔断
+            slow_call_seconds: 耗时超过该值视为慢调用
+            slow_rate_threshold: 慢调用率达到该值时熔断
+            open_seconds: 熔断持续多少秒后进入半开
+            half_open_max_calls: 半开状态放行的试探请求数，全部成功后恢复
+        """
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate_threshold = slow_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+
+        self.state = CIRCUIT_CLOSED
+        self.opened_at: Optional[float] = None
+        self.open_reason: Optional[str] = None
+        self.rejected = 0
+        self.events: deque = deque(maxlen=20)
+        # 最近调用结果: (是否失败, 是否慢调用)
+        self._calls: deque = deque(maxlen=max(1, window_size))
+        self._half_open_inflight = 0
+        self._half_open_successes = 0
+        self._lock = threading.Lock()
+
+        CIRCUIT_STATE.labels(pipeline=name).set(STATE_VALUES[self.state])
+
+    @property
+    def available(self) -> bool:
+        """当前是否会放行调用（不占用半开试探名额）"""
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                return time.time() - self.opened_at >= self.open_seconds
+            if self.state == CIRCUIT_HALF_OPEN:
+                return self._half_open_inflight < self.half_open_max_calls
+            return True
+
+    def allow(self) -> bool:
+        """
+        是否放行一次调用；放行后必须调用record_success或record_failure
+
+        Returns:
+            熔断中（或半开试探名额已满）时返回False
+        """
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                if time.time() - self.opened_at < self.open_seconds:
+                    return self._reject()
+                self._transition(CIRCUIT_HALF_OPEN, "open timeout elapsed")
+
+            if self.state == CIRCUIT_HALF_OPEN:
+                if self._half_open_inflight >= self.half_open_max_calls:
+                    return self._reject()
+                self._half_open_inflight += 1
+            return True
+
+    def record_success(self, duration: float):
+        """记录一次成功调用（耗时超过阈值计为慢调用）"""
+        self._record(failed=False, slow=duration >= self.slow_call_seconds)
+
+    def record_failure(self):
+        """记录一次失败调用"""
+        self._record(failed=True, slow=False)
+
+    def release(self):
+        """放行的调用被取消（如客户端断开），不计入统计但归还半开试探名额"""
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN:
+                self._half_open_inflight = max(0, self._half_open_inflight - 1)
+
+    def retry_after(self) -> float:
+        """熔断剩余秒数"""
+        with self._lock:
+            if self.state != CIRCUIT_OPEN:
+                return 0.0
+            return max(0.0, self.open_seconds - (time.time() - self.opened_at))
+
+    def _record(self, failed: bool, slow: bool):
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN:
+                self._half_open_inflight = max(0, self._half_open_inflight - 1)
+                if failed or slow:
+                    self._open("half-open probe " + ("failed" if failed else "slow"))
+                    return
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._transition(CIRCUIT_CLOSED, "half-open probes succeeded")
+                return
+
+            if self.state == CIRCUIT_OPEN:
+                # 熔断前已放行的调用，结果不再计入
+                return
+
+            self._calls.append((failed, slow))
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            failure_rate = sum(1 for f, _ in self._calls if f) / total
+            slow_rate = sum(1 for _, s in self._calls if s) / total
+            if failure_rate >= self.failure_rate_threshold:
+                self._open(f"failure rate {failure_rate:.0%}")
+            elif slow_rate >= self.slow_rate_threshold:
+                self._open(f"slow call rate {slow_rate:.0%}")
+
+    def _open(self, reason: str):
+        self.opened_at = time.time()
+        self.open_reason = reason
+        self._transition(CIRCUIT_OPEN, reason)
+
+    def _reject(self) -> bool:
+        self.rejected += 1
+        CIRCUIT_REJECTED.labels(pipeline=self.name).inc()
+        return False
+
+    def _transition(self, state: str, reason: str):
+        previous = self.state
+        self.state = state
+        self._calls.clear()
+        self._half_open_inflight = 0
+        self._half_open_successes = 0
+        CIRCUIT_STATE.labels(pipeline=self.name).set(STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.labels(pipeline=self.name, from_state=previous, to_state=state).inc()
+        self.events.append({
+            "time": datetime.now().isoformat(),
+            "from": previous,
+            "to": state,
+            "reason": reason,
+        })
+        log = logger.warning if state == CIRCUIT_OPEN else logger.info
+        log(f"{self.name} 熔断器 {previous} -> {state} ({reason})")
+
+    def stats(self) -> dict:
+        """熔断器状态（用于/health）"""
+        with self._lock:
+            total = len(self._calls)
+            return {
+                "state": self.state,
+                "open_reason": self.open_reason if self.state != CIRCUIT_CLOSED else None,
+                "window_calls": total,
+                "failure_rate": sum(1 for f, _ in self._calls if f) / total if total else 0.0,
+                "slow_call_rate": sum(1 for _, s in self._calls if s) / total if total else 0.0,
+                "rejected": self.rejected,
+                "events": list(self.events),
+            }
+
+
+# 全局熔断器实例（在main.py中初始化）
+breakers: dict[str, CircuitBreaker] = {}
+
+
+def init_breakers():
+    """按配置创建熔断器（目前仅VL产线依赖外部vLLM服务）"""
+    if not settings.VL_BREAKER_ENABLED:
+        return
+    breakers["vl"] = CircuitBreaker(
+        "vl",
+        window_size=settings.VL_BREAKER_WINDOW_SIZE,
+        min_calls=settings.VL_BREAKER_MIN_CALLS,
+        failure_rate_threshold=settings.VL_BREAKER_FAILURE_RATE,
+        slow_call_seconds=settings.VL_BREAKER_SLOW_CALL_SECONDS,
+        slow_rate_threshold=settings.VL_BREAKER_SLOW_CALL_RATE,
+        open_seconds=settings.VL_BREAKER_OPEN_SECONDS,
+        half_open_max_calls=settings.VL_BREAKER_HALF_OPEN_CALLS,
+    )
+
+
+def get_breaker(pipeline: str) -> Optional[CircuitBreaker]:
+    """获取指定产线的熔断器，未启用时返回None"""
+    return breakers.get(pipeline)
@@ -1,9 +1,14 @@
 """
 FastAPI配置文件
 """
+import os
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from typing import Optional
 
+# 数据目录的相对路径按app目录解析，不随启动时的工作目录变化
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 class Settings(BaseSettings):
     """应用配置"""
@@ -20,18 +25,150 @@ class Settings(BaseSettings):
     # 文件上传限制
     MAX_FILE_SIZE_MB: int = 10
     ALLOWED_EXTENSIONS: set[str] = {"jpg", "jpeg", "png", "bmp", "pdf"}
+    # 分块读取上传：块大小与spool缓冲区内存上限（超出部分落盘）
+    UPLOAD_CHUNK_SIZE_KB: int = 256
+    UPLOAD_SPOOL_MAX_MEMORY_MB: int = 4
+    # 请求体在文件大小之外允许的额外开销（multipart边界、表单字段）
+    UPLOAD_REQUEST_OVERHEAD_KB: int = 64
+    # 在内存中解码图片/栅格化PDF，关闭后回退为临时文件
+    INMEMORY_INGEST: bool = True
+    # 批量端点（多文件或zip/tar归档，NDJSON逐项返回）：单次请求体上限、项数上限与推理并发
+    BATCH_MAX_REQUEST_MB: int = 512
+    BATCH_MAX_ITEMS: int = 1000
+    BATCH_CONCURRENCY: int = 4
 
     # Docker vLLM配置
     VLLM_ENDPOINT: str = "http://localhost:8118"
     VLLM_TIMEOUT: int = 30
+    # vLLM后台健康探测：/health读取缓存状态，判定不可用时VL请求直接返回503
+    VLLM_PROBE_ENABLED: bool = True
+    VLLM_PROBE_INTERVAL_SECONDS: float = 5.0
+    VLLM_PROBE_TIMEOUT_SECONDS: float = 2.0
+    VLLM_PROBE_FAILURE_THRESHOLD: int = 2
+    VLLM_PROBE_HISTORY: int = 60
+    VL_FAIL_FAST: bool = True
+    # VL产线熔断：最近VL_BREAKER_WINDOW_SIZE次调用的失败率或慢调用率超限时熔断，
+    # 期满后半开放行VL_BREAKER_HALF_OPEN_CALLS个试探请求；熔断期间可选择降级到StructureV3
+    VL_BREAKER_ENABLED: bool = True
+    VL_BREAKER_WINDOW_SIZE: int = 20
+    VL_BREAKER_MIN_CALLS: int = 5
+    VL_BREAKER_FAILURE_RATE: float = 0.5
+    VL_BREAKER_SLOW_CALL_SECONDS: float = 30.0
+    VL_BREAKER_SLOW_CALL_RATE: float = 0.8
+    VL_BREAKER_OPEN_SECONDS: float = 30.0
+    VL_BREAKER_HALF_OPEN_CALLS: int = 2
+    # 多页PDF按页并发推理；并发上限不宜超过vllm_config.yaml中的max-num-seqs
+    # 开启时加载VL产线会额外创建VL_MAX_CONCURRENCY个分页VL对象（计入resident_memory_mb，卸载时释放）
+    VL_CONCURRENT_PAGES: bool = True
+    VL_MAX_CONCURRENCY: int = 4
+
+    # 服务端预处理（与前端ImagePreprocessor对齐，compress=True的请求跳过）
+    PREPROCESS_ENABLED: bool = True
+    OCRV5_MAX_IMAGE_SIDE: int = 2048
+    VL_MAX_IMAGE_SIDE: int = 2048
+    STRUCTURE_MAX_IMAGE_SIDE: int = 2048
+    PREPROCESS_EXIF_TRANSPOSE: bool = True
+    PREPROCESS_GRAYSCALE_PIPELINES: list[str] = []
+
+    # PDF栅格化分辨率
+    PDF_RASTER_DPI: int = 144
+
+    # 自动路由（/auto）：CPU分诊后分发到OCRv5/StructureV3/VL，
+    # 阈值可用 bench/tune_triage.py 在标注样本上拟合
+    AUTO_TRIAGE_MAX_SIDE: int = 1024
+    AUTO_TRIAGE_MAX_PAGES: int = 3
+    AUTO_TABLE_MIN_INTERSECTIONS: int = 12
+    AUTO_TABLE_MIN_RULING_LINES: int = 8
+    AUTO_VL_MIN_GRAPHIC_RATIO: float = 0.2
+    AUTO_VL_MIN_TEXT_DENSITY: float = 0.15
+    AUTO_VL_MAX_PAGES: int = 10
 
     # OCR模型配置
     USE_GPU: bool = True
     SHOW_LOG: bool = False
 
+    # OCRv5推理设备与多进程池（OCRV5_PROCESSES=0 表示在网关进程内推理）
+    OCRV5_DEVICE: str = "gpu:0"
+    OCRV5_PROCESSES: int = 0
+    # 多进程时按进程序号轮流分配的设备，为空则全部使用OCRV5_DEVICE
+    OCRV5_DEVICES: list[str] = []
+    # 每个进程的CPU推理线程数（为空使用PaddleOCR默认值）
+    OCRV5_CPU_THREADS: Optional[int] = None
+    # 区域识别（/text的regions参数）：单次请求的区域数上限；line模式的识别模型（为空使用PaddleOCR默认模型）
+    OCRV5_MAX_REGIONS: int = 256
+    OCRV5_ROI_REC_MODEL: Optional[str] = None
+
+    # 产线推理执行器（每条产线独立线程池，避免阻塞事件循环）
+    OCRV5_MAX_WORKERS: int = 1
+    # VL执行器线程数：直接使用主VL对象的调用（图片、单页）互斥执行，多页PDF经分页VL对象并发
+    VL_MAX_WORKERS: int = 2
+    STRUCTURE_MAX_WORKERS: int = 1
+
+    # 产线准入控制：同时处理数 + 排队数上限，超出返回429；
+    # 请求头X-Priority: batch的请求最多占用ADMISSION_BATCH_QUEUE_RATIO比例的排队名额，且排在interactive之后
+    ADMISSION_ENABLED: bool = True
+    OCRV5_MAX_INFLIGHT: int = 8
+    OCRV5_MAX_QUEUED: int = 32
+    VL_MAX_INFLIGHT: int = 4
+    VL_MAX_QUEUED: int = 16
+    STRUCTURE_MAX_INFLIGHT: int = 2
+    STRUCTURE_MAX_QUEUED: int = 8
+    ADMISSION_BATCH_QUEUE_RATIO: float = 0.5
+
+    # OCRv5动态微批（合并并发请求为一次批量推理）
+    OCRV5_BATCH_ENABLED: bool = True
+    OCRV5_BATCH_MAX_SIZE: int = 8
+    OCRV5_BATCH_MAX_WAIT_MS: float = 10.0
+
+    # 产线按需加载：仅白名单中的产线在启动时加载，其余在首次请求时加载
+    PRELOAD_PIPELINES: list[str] = []
+    # 空闲多少秒后卸载模型释放内存/显存（0表示常驻）
+    OCRV5_IDLE_UNLOAD_SECONDS: int = 0
+    VL_IDLE_UNLOAD_SECONDS: int = 1800
+    STRUCTURE_IDLE_UNLOAD_SECONDS: int = 1800
+    PIPELINE_IDLE_CHECK_SECONDS: float = 30.0
+
+    # 推理结果缓存（内存LRU + 磁盘两级，按上传内容哈希寻址）
+    CACHE_ENABLED: bool = True
+    CACHE_MEMORY_MAX_MB: int = 256
+    CACHE_DIR: str = "./cache"
+    CACHE_DISK_MAX_MB: int = 2048
+    CACHE_TTL_SECONDS: int = 86400
+    # 逐页结果存储（StructureV3/VL多页输入按栅格化页面像素哈希复用单页结果，TTL同CACHE_TTL_SECONDS）
+    PAGE_CACHE_ENABLED: bool = True
+    PAGE_CACHE_MEMORY_MAX_MB: int = 256
+    PAGE_CACHE_DIR: str = "./cache/pages"
+    PAGE_CACHE_DISK_MAX_MB: int = 2048
+
+    # 异步任务（SQLite持久化队列，结果按TTL保留）
+    JOBS_ENABLED: bool = True
+    JOBS_DIR: str = "./jobs"
+    JOBS_CONCURRENCY: int = 2
+    JOBS_RESULT_TTL_SECONDS: int = 86400
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0
+
+    # 管理接口令牌（为空则禁用/admin接口）
+    ADMIN_TOKEN: Optional[str] = None
+
     # 性能监控
     ENABLE_METRICS: bool = True
     METRICS_EXPORT_DIR: str = "./metrics"
+    # 请求指标持久化导出（滚动CSV，滚动时另存Parquet/Arrow列式文件）
+    METRICS_EXPORT_ENABLED: bool = True
+    METRICS_EXPORT_ROTATE_ROWS: int = 10000
+    METRICS_EXPORT_COLUMNAR_FORMAT: str = "parquet"  # parquet/arrow/none
+    # 按需剖析（POST /admin/profile）：结果写入METRICS_EXPORT_DIR/profiles
+    PROFILE_SAMPLE_INTERVAL_MS: float = 5.0
+    PROFILE_MAX_SECONDS: float = 300.0
+    PROFILE_ALLOC_FRAMES: int = 32
+
+    @field_validator("CACHE_DIR", "PAGE_CACHE_DIR", "JOBS_DIR", "METRICS_EXPORT_DIR")
+    @classmethod
+    def _resolve_data_dir(cls, value: str) -> str:
+        """相对路径转为app目录下的绝对路径（为空表示禁用磁盘层，原样保留）"""
+        if value and not os.path.isabs(value):
+            return os.path.normpath(os.path.join(APP_DIR, value))
+        return value
 
     class Config:
         env_file = ".env"
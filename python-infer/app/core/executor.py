@@ -0,0 +1,161 @@
+"""
+产线推理执行器
+每条产线使用独立的有界线程池，避免阻塞推理占用asyncio事件循环
+"""
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from core.config import settings
+from core.metrics import EXECUTOR_QUEUE_DEPTH, EXECUTOR_RUNNING
+from core.profiling import get_profile_session
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineExecutor:
+    """单条产线的有界推理执行器"""
+
+    def __init__(self, name: str, max_workers: int):
+        """
+        初始化执行器
+
+        Args:
+            name: 产线名称 (ocrv5/vl/structure)
+            max_workers: 最大并发推理线程数
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-infer"
+        )
+        self._lock = threading.Lock()
+
+        # 队列统计
+        self.queued = 0             # 等待执行的任务数
+        self.running = 0            # 正在执行的任务数
+        self.completed = 0          # 已完成的任务数
+        self.failed = 0             # 执行失败的任务数
+        self.total_wait_time = 0.0  # 累计排队耗时(秒)
+        self.max_wait_time = 0.0    # 最大排队耗时(秒)
+        self.last_wait_time = 0.0   # 最近一次排队耗时(秒)
+
+    async def run(self, func: Callable, *args, **kwargs) -> tuple[Any, float]:
+        """
+        在产线线程池中执行阻塞调用
+
+        Args:
+            func: 阻塞函数（通常是Service.predict）
+            *args, **kwargs: 传给func的参数
+
+        Returns:
+            (func返回值, 排队耗时秒数)
+        """
+        submit_time = time.time()
+        wait_box = [0.0]
+        # 任务状态：pending 排队中 / started 已开始 / cancelled 排队期间被取消
+        state = ["pending"]
+
+        def task():
+            wait_time = time.time() - submit_time
+            wait_box[0] = wait_time
+            with self._lock:
+                if state[0] == "cancelled":
+                    # 等待方已取消且排队计数已归还，不再执行
+                    return None
+                state[0] = "started"
+                self.queued -= 1
+                self.running += 1
+                self.total_wait_time += wait_time
+                self.last_wait_time = wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+            # 确定性剖析进行中时为推理线程挂载追踪函数
+            profile_session = get_profile_session()
+            if profile_session is not None:
+                profile_session.attach_thread()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if profile_session is not None:
+                    profile_session.detach_thread()
+                with self._lock:
+                    self.running -= 1
+
+        with self._lock:
+            self.queued += 1
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._pool, task)
+        except asyncio.CancelledError:
+            # 等待方被取消（客户端断开、任务执行器停止）或线程池关闭时取消了排队中的任务：
+            # task()不会再执行，由此处归还排队计数
+            with self._lock:
+                if state[0] == "pending":
+                    state[0] = "cancelled"
+                    self.queued -= 1
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.completed += 1
+
+        return result, wait_box[0]
+
+    def stats(self) -> dict:
+        """返回执行器队列统计"""
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_time": self.total_wait_time / finished if finished else 0.0,
+                "max_wait_time": self.max_wait_time,
+                "last_wait_time": self.last_wait_time,
+            }
+
+    def shutdown(self):
+        """关闭线程池"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# 全局执行器实例（在main.py中初始化）
+executors: dict[str, PipelineExecutor] = {}
+
+
+def init_executors():
+    """按配置创建各产线执行器"""
+    # 多进程池模式下每个工作进程至少需要一个调度线程
+    executors["ocrv5"] = PipelineExecutor(
+        "ocrv5", max(settings.OCRV5_MAX_WORKERS, settings.OCRV5_PROCESSES)
+    )
+    executors["vl"] = PipelineExecutor("vl", settings.VL_MAX_WORKERS)
+    executors["structure"] = PipelineExecutor("structure", settings.STRUCTURE_MAX_WORKERS)
+    for name, executor in executors.items():
+        EXECUTOR_QUEUE_DEPTH.labels(pipeline=name).set_function(lambda ex=executor: ex.queued)
+        EXECUTOR_RUNNING.labels(pipeline=name).set_function(lambda ex=executor: ex.running)
+    logger.info(
+        "产线执行器就绪: "
+        + ", ".join(f"{name}={ex.max_workers}" for name, ex in executors.items())
+    )
+
+
+def shutdown_executors():
+    """关闭所有产线执行器"""
+    for executor in executors.values():
+        executor.shutdown()
+    executors.clear()
+
+
+def get_executor(pipeline: str) -> Optional[PipelineExecutor]:
+    """获取指定产线的执行器"""
+    return executors.get(pipeline)
@@ -0,0 +1,157 @@
+"""
+图像与PDF处理工具
+"""
+import logging
+from numbers import Real
+from typing import Any, BinaryIO, Optional, Union
+
+import numpy as np
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PdfSource = Union[str, bytes, BinaryIO]
+
+# 坐标缩放系数(x, y)：推理输入上的坐标乘以系数得到原图坐标
+Scale = tuple[float, float]
+
+# 结果中表示坐标的字段（点/框数组按x、y交替排列）
+COORDINATE_KEYS = frozenset({
+    "bbox", "block_bbox", "layout_bbox", "coordinate", "polygon", "polygons", "boxes",
+    "dt_polys", "dt_boxes", "rec_polys", "rec_boxes",
+})
+
+
+def rasterize_pdf(
+    source: PdfSource,
+    dpi: Optional[int] = None,
+    max_side: Optional[int] = None,
+    max_pages: Optional[int] = None,
+) -> list[np.ndarray]:
+    """
+    将PDF逐页渲染为BGR图像（与PaddleOCR读取图片的通道顺序一致）
+
+    Args:
+        source: PDF文件路径、文件字节或可seek的字节流
+        dpi: 渲染分辨率，默认使用settings.PDF_RASTER_DPI
+        max_side: 渲染结果长边上限(像素)，超出时按页降低渲染分辨率而非渲染后再缩小
+        max_pages: 只渲染前若干页，为空则渲染全部
+
+    Returns:
+        每页一张 HxWx3 uint8 BGR数组
+    """
+    return rasterize_pdf_scaled(source, dpi, max_side, max_pages)[0]
+
+
+def rasterize_pdf_scaled(
+    source: PdfSource,
+    dpi: Optional[int] = None,
+    max_side: Optional[int] = None,
+    max_pages: Optional[int] = None,
+) -> tuple[list[np.ndarray], list[Scale]]:
+    """
+    同rasterize_pdf，同时返回各页相对dpi分辨率的坐标缩放系数（受max_side限制降低分辨率的页大于1）
+
+    Returns:
+        (逐页BGR数组, 逐页坐标缩放系数)
+    """
+    import pypdfium2 as pdfium
+
+    dpi = dpi or settings.PDF_RASTER_DPI
+    scale = dpi / 72
+
+    doc = pdfium.PdfDocument(source)
+    try:
+        pages = []
+        scales = []
+        for page_index, page in enumerate(doc):
+            if max_pages is not None and page_index >= max_pages:
+                page.close()
+                break
+            page_scale = scale
+            if max_side and max_side > 0:
+                # 页面尺寸单位为pt(1/72英寸)
+                page_scale = min(scale, max_side / max(page.get_size()))
+            image = page.render(scale=page_scale).to_pil().convert("RGB")
+            pages.append(np.ascontiguousarray(np.asarray(image)[:, :, ::-1]))
+            scales.append((scale / page_scale, scale / page_scale))
+            page.close()
+        return pages, scales
+    finally:
+        doc.close()
+
+
+def count_pdf_pages(source: PdfSource) -> int:
+    """PDF页数（只读取页面树，不渲染）"""
+    import pypdfium2 as pdfium
+
+    doc = pdfium.PdfDocument(source)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def is_pdf(path: str) -> bool:
+    """根据扩展名判断是否为PDF"""
+    return path.lower().endswith(".pdf")
+
+
+def scale_coordinates(value: Any, scale: Scale) -> Any:
+    """
+    按(x, y)系数缩放坐标值（不修改原对象）
+
+    数值数组的最后一维按x、y交替缩放（点[x, y]、框[x1, y1, x2, y2]），整数坐标缩放后取整；
+    列表逐项处理，字典交给rescale_result按字段处理。
+    """
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind not in "iuf" or value.ndim == 0 or value.shape[-1] % 2:
+            return value
+        scaled = value * np.tile(np.asarray(scale, dtype=np.float64), value.shape[-1] // 2)
+        if value.dtype.kind == "f":
+            return scaled.astype(value.dtype)
+        return np.rint(scaled).astype(np.promote_types(value.dtype, np.int32))
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, Real) and not isinstance(item, bool) for item in value):
+            if len(value) % 2:
+                return value
+            integer = all(isinstance(item, (int, np.integer)) for item in value)
+            scaled = [item * scale[index % 2] for index, item in enumerate(value)]
+            return [round(item) if integer else item for item in scaled]
+        return [scale_coordinates(item, scale) for item in value]
+    if isinstance(value, dict):
+        return _rescale(value, [scale], scale)
+    return value
+
+
+def rescale_result(result: Any, scales: Optional[list[Scale]]) -> Any:
+    """
+    把推理结果中的坐标映射回原图（服务端缩小分辨率或PDF降分辨率渲染后推理）
+
+    带page字段的元素按所在页的系数缩放，其余按第一页的系数缩放。
+
+    Args:
+        result: 格式化后的推理结果（dict/list，可含NumPy数组）
+        scales: 逐页坐标缩放系数（PreparedInput.scales），为空表示未缩放
+
+    Returns:
+        坐标已映射回原图的新结果；无需缩放时返回原对象
+    """
+    if not scales or all(scale == (1.0, 1.0) for scale in scales):
+        return result
+    return _rescale(result, scales, scales[0])
+
+
+def _rescale(obj: Any, scales: list[Scale], scale: Scale) -> Any:
+    if isinstance(obj, dict):
+        page = obj.get("page")
+        if isinstance(page, int) and 0 <= page < len(scales):
+            scale = scales[page]
+        return {
+            key: scale_coordinates(value, scale) if key in COORDINATE_KEYS else _rescale(value, scales, scale)
+            for key, value in obj.items()
+        }
+    if isinstance(obj, list):
+        return [_rescale(item, scales, scale) for item in obj]
+    return obj
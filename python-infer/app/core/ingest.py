@@ -0,0 +1,232 @@
+"""
+上传文件摄取
+优先在内存中解码图片/栅格化PDF，直接把NumPy数组交给产线推理；
+解码失败或关闭内存摄取时回退为临时文件路径
+"""
+import os
+import shutil
+import tempfile
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Optional
+
+import cv2
+import numpy as np
+
+from core.config import settings
+from core.imaging import Scale, rasterize_pdf_scaled
+from core.preprocess import PreprocessOptions, decode_flags, preprocess_image, to_grayscale
+
+logger = logging.getLogger(__name__)
+
+
+# 文件头魔数 → 规范化文件类型
+MAGIC_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"BM", "bmp"),
+    (b"%PDF-", "pdf"),
+)
+# PDF规范允许%PDF-出现在文件前1024字节内
+MAGIC_SNIFF_BYTES = 1024
+
+
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """
+    根据文件头识别文件类型
+
+    Args:
+        head: 文件开头的若干字节
+
+    Returns:
+        jpg/png/bmp/pdf，无法识别返回None
+    """
+    for signature, file_type in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return file_type
+    if b"%PDF-" in head[:MAGIC_SNIFF_BYTES]:
+        return "pdf"
+    return None
+
+
+def normalize_ext(ext: str) -> str:
+    """扩展名规范化（jpeg → jpg）"""
+    ext = ext.lower()
+    return "jpg" if ext == "jpeg" else ext
+
+
+@dataclass
+class UploadedFile:
+    """已分块读入并通过校验的上传文件（内容位于有内存上限的spool缓冲区）"""
+
+    filename: str
+    ext: str                                    # 由文件头识别出的类型
+    buffer: BinaryIO                            # SpooledTemporaryFile，超过上限自动落盘
+    size: int
+    content_hash: str
+    upload_time: float
+
+    @property
+    def size_kb(self) -> float:
+        return self.size / 1024
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.ext == "pdf"
+
+    def read_bytes(self) -> bytes:
+        """读取完整内容"""
+        self.buffer.seek(0)
+        return self.buffer.read()
+
+    def pdf_source(self):
+        """
+        供pypdfium2读取的PDF源
+
+        缓冲区支持readinto（Python 3.11+）时直接按流读取，避免整份复制；
+        否则退回完整字节。
+        """
+        if hasattr(self.buffer, "readinto"):
+            self.buffer.seek(0)
+            return self.buffer
+        return self.read_bytes()
+
+    def close(self):
+        """释放缓冲区"""
+        self.buffer.close()
+
+
+@dataclass
+class PreparedInput:
+    """可直接传给Service.predict的推理输入"""
+
+    data: Any                                   # np.ndarray / list[np.ndarray] / 文件路径
+    decode_time: float = 0.0                    # 内存解码/栅格化耗时(秒)
+    preprocess_time: Optional[float] = None     # 服务端预处理耗时(秒)，未预处理为None
+    disk_io_time: float = 0.0                   # 临时文件读写耗时(秒)
+    temp_path: Optional[str] = None             # 回退路径下的临时文件
+    pages: int = field(default=1)               # 输入页数
+    preprocess: Optional[PreprocessOptions] = None  # 实际执行的预处理（回退路径为None）
+    scales: Optional[list[Scale]] = None        # 逐页坐标缩放系数，推理坐标×系数=原图坐标；未缩放为None
+
+    @property
+    def in_memory(self) -> bool:
+        return self.temp_path is None
+
+    def cleanup(self):
+        """删除回退路径产生的临时文件"""
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+            self.temp_path = None
+
+
+def decode_image(content: bytes, flags: int = cv2.IMREAD_COLOR) -> Optional[np.ndarray]:
+    """
+    将图片字节解码为BGR数组
+
+    Args:
+        content: 图片字节
+        flags: OpenCV解码标志（默认按EXIF方向旋转）
+
+    Returns:
+        HxWx3 uint8数组，无法解码时返回None
+    """
+    buffer = np.frombuffer(content, dtype=np.uint8)
+    return cv2.imdecode(buffer, flags)
+
+
+def write_temp_file(upload: UploadedFile) -> tuple[str, float]:
+    """
+    将上传内容写入临时文件（回退路径）
+
+    Returns:
+        (临时文件路径, 写入耗时)
+    """
+    start_time = time.time()
+    temp_file = tempfile.NamedTemporaryFile(suffix=f".{upload.ext}", delete=False)
+    try:
+        upload.buffer.seek(0)
+        shutil.copyfileobj(upload.buffer, temp_file)
+    finally:
+        temp_file.close()
+    return temp_file.name, time.time() - start_time
+
+
+def prepare_input(upload: UploadedFile, preprocess: Optional[PreprocessOptions] = None) -> PreparedInput:
+    """
+    把上传文件转换为推理输入（阻塞函数，需在线程中调用）
+
+    - 图片：内存解码为BGR数组
+    - PDF：直接从spool缓冲区逐页栅格化为数组列表
+    - 关闭INMEMORY_INGEST或解码失败：写临时文件并返回路径（不做预处理）
+
+    服务端缩小了分辨率时在scales中记录缩放系数，供rescale_result把结果坐标映射回原图
+    （PDF以PDF_RASTER_DPI渲染的页面为准）。
+
+    Args:
+        upload: 上传文件
+        preprocess: 服务端预处理参数，为空则不预处理
+
+    Returns:
+        PreparedInput
+    """
+    decode_time = 0.0
+
+    if settings.INMEMORY_INGEST:
+        start_time = time.time()
+        try:
+            if upload.is_pdf:
+                if preprocess is not None:
+                    # 按长边上限选择每页渲染分辨率
+                    pages, scales = rasterize_pdf_scaled(
+                        upload.pdf_source(), preprocess.pdf_dpi, preprocess.max_side
+                    )
+                else:
+                    pages, scales = rasterize_pdf_scaled(upload.pdf_source())
+                if pages:
+                    decode_time = time.time() - start_time
+                    preprocess_time = None
+                    if preprocess is not None:
+                        preprocess_start = time.time()
+                        if preprocess.grayscale:
+                            pages = [to_grayscale(page) for page in pages]
+                        preprocess_time = time.time() - preprocess_start
+                    return PreparedInput(
+                        data=pages,
+                        decode_time=decode_time,
+                        preprocess_time=preprocess_time,
+                        pages=len(pages),
+                        preprocess=preprocess,
+                        scales=scales
+                    )
+            else:
+                image = decode_image(upload.read_bytes(), decode_flags(preprocess))
+                if image is not None:
+                    decode_time = time.time() - start_time
+                    preprocess_time = None
+                    scales = None
+                    if preprocess is not None:
+                        preprocess_start = time.time()
+                        height, width = image.shape[:2]
+                        image = preprocess_image(image, preprocess)
+                        scales = [(width / image.shape[1], height / image.shape[0])]
+                        preprocess_time = time.time() - preprocess_start
+                    return PreparedInput(
+                        data=image,
+                        decode_time=decode_time,
+                        preprocess_time=preprocess_time,
+                        preprocess=preprocess,
+                        scales=scales
+                    )
+        except Exception as e:
+            logger.warning(f"内存解码失败，回退临时文件: {upload.filename}: {str(e)}")
+        decode_time = time.time() - start_time
+
+    temp_path, disk_io_time = write_temp_file(upload)
+    return PreparedInput(
+        data=temp_path,
+        decode_time=decode_time,
+        disk_io_time=disk_io_time,
+        temp_path=temp_path
+    )
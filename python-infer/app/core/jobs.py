@@ -0,0 +1,277 @@
+"""
+异步任务存储
+基于SQLite的持久化任务队列：记录任务状态、逐页进度与推理结果，网关重启后任务不丢失
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from typing import Any, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    pipeline TEXT NOT NULL,
+    status TEXT NOT NULL,
+    options BLOB NOT NULL,
+    filename TEXT NOT NULL,
+    input_path TEXT,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    pages_total INTEGER,
+    pages_done INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result BLOB,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+
+class JobStore:
+    """SQLite持久化任务队列"""
+
+    def __init__(self, jobs_dir: str, result_ttl_seconds: int):
+        """
+        初始化任务存储
+
+        Args:
+            jobs_dir: 任务目录（jobs.db与待处理输入文件）
+            result_ttl_seconds: 任务结束后结果保留时间(秒)
+        """
+        self.jobs_dir = jobs_dir
+        self.inputs_dir = os.path.join(jobs_dir, "inputs")
+        self.result_ttl = result_ttl_seconds
+        os.makedirs(self.inputs_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # 手动控制事务（isolation_level=None），认领任务时使用BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(
+            os.path.join(jobs_dir, "jobs.db"),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def input_path(self, job_id: str, ext: str) -> str:
+        """任务输入文件路径"""
+        return os.path.join(self.inputs_dir, f"{job_id}.{ext}")
+
+    def create(
+        self,
+        pipeline: str,
+        options: dict,
+        filename: str,
+        input_path: str,
+        size: int,
+        content_hash: str,
+        job_id: Optional[str] = None,
+    ) -> str:
+        """
+        新建排队任务
+
+        Returns:
+            任务ID
+        """
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, pipeline, status, options, filename, input_path, size, "
+                "content_hash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, pipeline, JOB_QUEUED, pickle.dumps(options), filename, input_path,
+                 size, content_hash, time.time())
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        查询任务（不含结果），已过期的任务视为不存在
+
+        Returns:
+            任务字典，不存在返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, pipeline, status, options, filename, input_path, size, content_hash, "
+                "pages_total, pages_done, error, created_at, started_at, finished_at, expires_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        if job["expires_at"] is not None and job["expires_at"] <= time.time():
+            return None
+        job["options"] = pickle.loads(job["options"])
+        return job
+
+    def get_result(self, job_id: str) -> Optional[Any]:
+        """读取已完成任务的结果"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM jobs WHERE id = ? AND status = ?", (job_id, JOB_SUCCEEDED)
+            ).fetchone()
+        if row is None or row["result"] is None:
+            return None
+        return pickle.loads(row["result"])
+
+    def claim_next(self) -> Optional[dict]:
+        """
+        认领最早的排队任务并标记为运行中
+
+        Returns:
+            任务字典，无排队任务返回None
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (JOB_QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, pages_done = 0 WHERE id = ?",
+                        (JOB_RUNNING, time.time(), row["id"])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def update_progress(self, job_id: str, pages_done: int, pages_total: Optional[int] = None):
+        """更新逐页进度"""
+        with self._lock:
+            if pages_total is None:
+                self._conn.execute(
+                    "UPDATE jobs SET pages_done = ? WHERE id = ?", (pages_done, job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET pages_done = ?, pages_total = ? WHERE id = ?",
+                    (pages_done, pages_total, job_id)
+                )
+
+    def complete(self, job_id: str, result: Any):
+        """标记任务成功并保存结果"""
+        self._finish(job_id, JOB_SUCCEEDED, result=pickle.dumps(result))
+
+    def fail(self, job_id: str, error: str):
+        """标记任务失败"""
+        self._finish(job_id, JOB_FAILED, error=error)
+
+    def _finish(self, job_id: str, status: str, result: Optional[bytes] = None, error: Optional[str] = None):
+        now = time.time()
+        expires_at = now + self.result_ttl if self.result_ttl > 0 else None
+        with self._lock:
+            row = self._conn.execute("SELECT input_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ?, "
+                "input_path = NULL WHERE id = ?",
+                (status, result, error, now, expires_at, job_id)
+            )
+        if row is not None:
+            self._remove_file(row["input_path"])
+
+    def requeue_interrupted(self) -> int:
+        """
+        将上次退出时仍在运行的任务重新排队（启动时调用）
+
+        Returns:
+            重新排队的任务数
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, pages_done = 0 WHERE status = ?",
+                (JOB_QUEUED, JOB_RUNNING)
+            )
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        """
+        删除结果已过期的任务
+
+        Returns:
+            删除的任务数
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, input_path FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,)
+            ).fetchall()
+            self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            )
+        for row in rows:
+            self._remove_file(row["input_path"])
+        return len(rows)
+
+    def stats(self) -> dict:
+        """按状态统计任务数"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"
+            ).fetchall()
+        counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_SUCCEEDED: 0, JOB_FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _remove_file(path: Optional[str]):
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"删除任务输入文件失败: {path}: {str(e)}")
+
+
+# 全局任务存储实例（在main.py中初始化）
+job_store: Optional[JobStore] = None
+
+
+def init_job_store():
+    """按配置创建任务存储，并把中断的任务重新排队"""
+    global job_store
+    if not settings.JOBS_ENABLED:
+        job_store = None
+        return
+    job_store = JobStore(settings.JOBS_DIR, settings.JOBS_RESULT_TTL_SECONDS)
+    requeued = job_store.requeue_interrupted()
+    logger.info(f"任务存储就绪: {settings.JOBS_DIR} (重新排队 {requeued} 个中断任务)")
+
+
+def shutdown_job_store():
+    """关闭任务存储"""
+    global job_store
+    if job_store is not None:
+        job_store.close()
+        job_store = None
+
+
+def get_job_store() -> Optional[JobStore]:
+    """获取全局任务存储"""
+    return job_store
@@ -0,0 +1,152 @@
+"""
+性能指标采集
+基于prometheus_client的计数器、仪表盘与直方图，注册到网关专用注册表并以Prometheus文本格式导出
+"""
+from typing import Optional
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    disable_created_metrics,
+    generate_latest,
+)
+
+# 不导出 *_created 时间戳序列
+disable_created_metrics()
+
+# 常用分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 批大小分桶
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# 网关专用注册表：指标均在模块导入时注册一次，避免重复注册与默认进程指标混入
+REGISTRY = CollectorRegistry(auto_describe=True)
+
+# 指标名均为传统字符集，固定按0.0.4文本格式声明，兼容Prometheus 2.x抓取
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def render() -> bytes:
+    """导出全部网关指标（Prometheus text exposition format）"""
+    return generate_latest(REGISTRY)
+
+
+def histogram_snapshot(histogram: Histogram) -> dict:
+    """
+    返回直方图（或其某个标签子指标）的快照
+
+    Args:
+        histogram: 无标签直方图或 labels() 得到的子指标
+
+    Returns:
+        包含累积分桶计数、总和与样本数的字典
+    """
+    buckets = {}
+    total = 0.0
+    count = 0
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_bucket"):
+                le = sample.labels["le"]
+                buckets["+Inf" if le == "+Inf" else str(float(le))] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                total = sample.value
+            elif sample.name.endswith("_count"):
+                count = int(sample.value)
+
+    return {
+        "buckets": buckets,
+        "count": count,
+        "sum": total,
+        "avg": total / count if count else 0.0
+    }
+
+
+# ---------- 网关指标 ----------
+
+STAGES = ("upload", "preprocess", "queue", "inference", "formatting", "serialization")
+
+REQUESTS_TOTAL = Counter(
+    "ocr_requests_total", "OCR端点请求数", ("pipeline",), registry=REGISTRY
+)
+ERRORS_TOTAL = Counter(
+    "ocr_errors_total", "OCR端点错误响应数", ("pipeline", "code"), registry=REGISTRY
+)
+BYTES_IN_TOTAL = Counter(
+    "ocr_request_bytes_total", "请求体字节数", ("pipeline",), registry=REGISTRY
+)
+BYTES_OUT_TOTAL = Counter(
+    "ocr_response_bytes_total", "响应体字节数", ("pipeline",), registry=REGISTRY
+)
+INFLIGHT_REQUESTS = Gauge(
+    "ocr_inflight_requests", "正在处理的请求数", ("pipeline",), registry=REGISTRY
+)
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "ocr_executor_queue_depth", "产线执行器排队任务数", ("pipeline",), registry=REGISTRY
+)
+EXECUTOR_RUNNING = Gauge(
+    "ocr_executor_running", "产线执行器正在执行的任务数", ("pipeline",), registry=REGISTRY
+)
+STAGE_DURATION = Histogram(
+    "ocr_stage_duration_seconds", "各处理阶段耗时", ("pipeline", "stage"),
+    buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+
+CIRCUIT_STATE = Gauge(
+    "ocr_circuit_state", "产线熔断器状态(0=closed,1=half_open,2=open)", ("pipeline",), registry=REGISTRY
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "ocr_circuit_transitions_total", "熔断器状态切换次数", ("pipeline", "from_state", "to_state"),
+    registry=REGISTRY
+)
+CIRCUIT_REJECTED = Counter(
+    "ocr_circuit_rejected_total", "熔断期间被拒绝的请求数", ("pipeline",), registry=REGISTRY
+)
+FALLBACK_TOTAL = Counter(
+    "ocr_fallback_total", "产线不可用时降级到其他产线的请求数", ("pipeline", "fallback"), registry=REGISTRY
+)
+
+BATCH_SIZE = Histogram(
+    "ocr_batch_size", "每批合并的请求数", ("pipeline",),
+    buckets=BATCH_SIZE_BUCKETS, registry=REGISTRY
+)
+BATCH_QUEUE_WAIT = Histogram(
+    "ocr_batch_queue_wait_seconds", "请求进入批次前的等待时间", ("pipeline",),
+    buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+
+ADMISSION_INFLIGHT = Gauge(
+    "ocr_admission_inflight", "已获准入正在处理的请求数", ("pipeline",), registry=REGISTRY
+)
+ADMISSION_QUEUED = Gauge(
+    "ocr_admission_queued", "等待准入的请求数", ("pipeline",), registry=REGISTRY
+)
+ADMISSION_REJECTED = Counter(
+    "ocr_admission_rejected_total", "因产线繁忙被拒绝(429)的请求数", ("pipeline", "priority"), registry=REGISTRY
+)
+
+
+class RequestTimer:
+    """单次请求的分阶段计时，输出到直方图与Server-Timing响应头"""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.stages: dict[str, float] = {}
+
+    def record(self, stage: str, seconds: Optional[float]):
+        """记录一个阶段耗时（None表示该阶段未发生）"""
+        if seconds is not None:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def observe(self):
+        """写入分阶段耗时直方图"""
+        for stage, seconds in self.stages.items():
+            STAGE_DURATION.labels(pipeline=self.pipeline, stage=stage).observe(seconds)
+
+    def server_timing(self) -> str:
+        """生成Server-Timing响应头（单位毫秒）"""
+        return ", ".join(
+            f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()
+        )
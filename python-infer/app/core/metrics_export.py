@@ -0,0 +1,202 @@
+"""
+请求指标持久化导出
+后台线程把每个请求的MetricsModel追加到METRICS_EXPORT_DIR下的滚动CSV文件，
+文件滚动时另存一份列式副本（Parquet或Arrow IPC，需安装pyarrow）
+"""
+import csv
+import os
+import queue
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Optional
+
+from core.config import settings
+from core.models import MetricsModel
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["timestamp", "pipeline"] + list(MetricsModel.model_fields)
+
+
+class MetricsExporter:
+    """非阻塞的请求指标导出器"""
+
+    def __init__(
+        self,
+        export_dir: str,
+        rotate_rows: int = 10000,
+        columnar_format: str = "parquet",
+        queue_size: int = 10000,
+    ):
+        """
+        Args:
+            export_dir: 导出目录
+            rotate_rows: 单个分段文件的最大行数（跨天也会滚动）
+            columnar_format: 滚动时额外写出的列式格式 (parquet/arrow/none)
+            queue_size: 待写入队列上限，满时丢弃新记录而不阻塞请求
+        """
+        self.export_dir = export_dir
+        self.rotate_rows = rotate_rows
+        self.columnar_format = columnar_format
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        # 当前分段
+        self._segment_path: Optional[str] = None
+        self._segment_day: Optional[str] = None
+        self._segment_file = None
+        self._segment_writer = None
+        self._segment_rows: list[dict] = []
+
+        self.written = 0
+        self.dropped = 0
+
+        os.makedirs(self.export_dir, exist_ok=True)
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+            self._thread.start()
+            logger.info(f"指标导出已启动: {self.export_dir} (列式格式: {self.columnar_format})")
+
+    def stop(self):
+        """停止线程并关闭当前分段"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def record(self, pipeline: str, metrics: MetricsModel):
+        """
+        记录一条请求指标（请求路径上调用，不做任何I/O）
+
+        Args:
+            pipeline: 产线名称
+            metrics: 该请求的性能指标
+        """
+        row = {"timestamp": time.time(), "pipeline": pipeline, **metrics.model_dump()}
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "export_dir": self.export_dir,
+            "segment": self._segment_path,
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    # ---------- 后台线程 ----------
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                rows = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                continue
+            while len(rows) < 1000:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_rows(rows)
+            except Exception as e:
+                logger.error(f"指标导出写入失败: {str(e)}")
+
+        self._close_segment()
+
+    def _write_rows(self, rows: list[dict]):
+        for row in rows:
+            day = datetime.fromtimestamp(row["timestamp"]).strftime("%Y%m%d")
+            if (
+                self._segment_writer is None
+                or day != self._segment_day
+                or len(self._segment_rows) >= self.rotate_rows
+            ):
+                self._close_segment()
+                self._open_segment(day)
+            self._segment_writer.writerow(row)
+            self._segment_rows.append(row)
+            self.written += 1
+        self._segment_file.flush()
+
+    def _open_segment(self, day: str):
+        name = f"metrics-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.csv"
+        self._segment_path = os.path.join(self.export_dir, name)
+        self._segment_day = day
+        self._segment_file = open(self._segment_path, "w", newline="", encoding="utf-8")
+        self._segment_writer = csv.DictWriter(self._segment_file, fieldnames=COLUMNS)
+        self._segment_writer.writeheader()
+        self._segment_rows = []
+
+    def _close_segment(self):
+        if self._segment_file is None:
+            return
+        self._segment_file.close()
+        try:
+            self._write_columnar(self._segment_path, self._segment_rows)
+        except Exception as e:
+            logger.warning(f"列式指标文件写出失败: {str(e)}")
+        self._segment_file = None
+        self._segment_writer = None
+        self._segment_rows = []
+
+    def _write_columnar(self, csv_path: str, rows: list[dict]):
+        """把已关闭分段另存为列式文件"""
+        if self.columnar_format == "none" or not rows:
+            return
+        try:
+            import pyarrow as pa
+        except ImportError:
+            logger.warning("未安装pyarrow，跳过列式指标导出")
+            self.columnar_format = "none"
+            return
+
+        table = pa.Table.from_pylist(rows)
+        base = csv_path[:-len(".csv")]
+        if self.columnar_format == "arrow":
+            import pyarrow.feather as feather
+            feather.write_feather(table, f"{base}.arrow")
+        else:
+            import pyarrow.parquet as pq
+            pq.write_table(table, f"{base}.parquet")
+
+
+# 全局导出器实例（在main.py中初始化）
+metrics_exporter: Optional[MetricsExporter] = None
+
+
+def init_metrics_exporter():
+    """按配置创建并启动指标导出器"""
+    global metrics_exporter
+    if not (settings.ENABLE_METRICS and settings.METRICS_EXPORT_ENABLED):
+        metrics_exporter = None
+        return
+    metrics_exporter = MetricsExporter(
+        settings.METRICS_EXPORT_DIR,
+        rotate_rows=settings.METRICS_EXPORT_ROTATE_ROWS,
+        columnar_format=settings.METRICS_EXPORT_COLUMNAR_FORMAT,
+    )
+    metrics_exporter.start()
+
+
+def shutdown_metrics_exporter():
+    """停止指标导出器并落盘剩余记录"""
+    global metrics_exporter
+    if metrics_exporter is not None:
+        metrics_exporter.stop()
+        metrics_exporter = None
+
+
+def export_request_metrics(pipeline: str, metrics: MetricsModel):
+    """记录一次请求的指标（导出器未启用时忽略）"""
+    if metrics_exporter is not None:
+        metrics_exporter.record(pipeline, metrics)
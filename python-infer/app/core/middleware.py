@@ -0,0 +1,194 @@
+"""
+ASGI中间件
+"""
+import logging
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from core.metrics import (
+    REQUESTS_TOTAL, ERRORS_TOTAL, BYTES_IN_TOTAL, BYTES_OUT_TOTAL, INFLIGHT_REQUESTS
+)
+from core.profiling import get_profile_session, stop_profile
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTooLarge(HTTPException):
+    """请求体超过上限"""
+
+    def __init__(self, limit_bytes: int):
+        super().__init__(
+            status_code=413,
+            detail=f"请求体过大。最大支持: {limit_bytes / 1024 / 1024:.1f}MB"
+        )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    上传大小限制中间件
+
+    在multipart解析之前按Content-Length拒绝超限请求；
+    对分块传输等未声明长度的请求，在字节到达时累计并在超限时立即中断，
+    避免超大上传先被完整接收再被拒绝。
+    """
+
+    def __init__(
+        self,
+        app,
+        max_body_bytes: int,
+        path_prefix: str = "",
+        path_limits: Optional[dict[str, int]] = None,
+    ):
+        """
+        Args:
+            app: 下游ASGI应用
+            max_body_bytes: 单个请求体的最大字节数
+            path_prefix: 仅对该前缀下的路径生效
+            path_limits: 路径 → 该路径的请求体上限（如批量端点），覆盖max_body_bytes
+        """
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_prefix = path_prefix
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PUT")
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_body_bytes)
+
+        # 声明长度超限：不读取请求体直接拒绝
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > limit:
+                    logger.warning(f"拒绝超限上传: {scope['path']} Content-Length={declared}")
+                    await self._reject(scope, receive, send, limit)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise RequestTooLarge(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLarge:
+            if response_started:
+                raise
+            await self._reject(scope, receive, send, limit)
+
+    @staticmethod
+    async def _reject(scope, receive, send, limit: int):
+        error = RequestTooLarge(limit)
+        response = JSONResponse(
+            status_code=error.status_code,
+            content={"detail": error.detail},
+            headers={"Connection": "close"}
+        )
+        await response(scope, receive, send)
+
+
+class PipelineMetricsMiddleware:
+    """
+    产线请求指标中间件
+
+    按路由统计请求数、错误数、请求/响应字节数以及在途请求数。
+    """
+
+    def __init__(self, app, routes: dict[str, str]):
+        """
+        Args:
+            app: 下游ASGI应用
+            routes: 路径 → 产线名称
+        """
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        pipeline = self.routes.get(scope.get("path")) if scope["type"] == "http" else None
+        if pipeline is None:
+            await self.app(scope, receive, send)
+            return
+
+        REQUESTS_TOTAL.labels(pipeline=pipeline).inc()
+        inflight = INFLIGHT_REQUESTS.labels(pipeline=pipeline)
+        inflight.inc()
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                BYTES_IN_TOTAL.labels(pipeline=pipeline).inc(len(message.get("body", b"")))
+            return message
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start" and message["status"] >= 400:
+                ERRORS_TOTAL.labels(pipeline=pipeline, code=message["status"]).inc()
+            elif message["type"] == "http.response.body":
+                BYTES_OUT_TOTAL.labels(pipeline=pipeline).inc(len(message.get("body", b"")))
+            await send(message)
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        except Exception:
+            ERRORS_TOTAL.labels(pipeline=pipeline, code=500).inc()
+            raise
+        finally:
+            inflight.dec()
+
+
+class ProfilingMiddleware:
+    """
+    按需剖析中间件
+
+    剖析开启时统计产线请求，达到指定请求数后结束剖析并写出结果；
+    未开启时只做一次全局变量判断。
+    """
+
+    def __init__(self, app, routes: dict[str, str]):
+        """
+        Args:
+            app: 下游ASGI应用
+            routes: 计入剖析请求数的路径 → 产线名称
+        """
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        session = get_profile_session()
+        if session is None or scope["type"] != "http" or scope.get("path") not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        if not session.begin_request():
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if session.end_request():
+                await stop_profile("requests", session)
@@ -1,6 +1,7 @@
 """
 统一响应模型
 """
+from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import Any, Optional, Literal
 
@@ -10,8 +11,19 @@ class MetricsModel(BaseModel):
 
     total_time: float = Field(..., description="总耗时(秒)")
     inference_time: float = Field(..., description="推理耗时(秒)")
+    format_time: Optional[float] = Field(None, description="结果格式化耗时(秒)")
     upload_time: Optional[float] = Field(None, description="上传耗时(秒)")
+    decode_time: Optional[float] = Field(None, description="内存解码/PDF栅格化耗时(秒)")
+    disk_io_time: Optional[float] = Field(None, description="临时文件读写耗时(秒)，内存路径为0")
     preprocess_time: Optional[float] = Field(None, description="预处理耗时(秒)")
+    queue_time: Optional[float] = Field(None, description="产线执行器排队耗时(秒)")
+    batch_size: Optional[int] = Field(None, description="所在推理批次的请求数")
+    cache_hit: bool = Field(False, description="是否命中结果缓存")
+    pages_reused: Optional[int] = Field(None, description="从逐页结果存储复用的页数")
+    pages_recomputed: Optional[int] = Field(None, description="重新推理的页数")
+    route: Optional[str] = Field(None, description="自动路由分诊选择的产线")
+    route_reason: Optional[str] = Field(None, description="自动路由的判定依据")
+    triage_time: Optional[float] = Field(None, description="自动路由分诊耗时(秒)")
     image_size_kb: float = Field(..., description="图片大小(KB)")
     compressed: bool = Field(..., description="是否压缩")
     source: Literal["local", "docker"] = Field(..., description="推理位置")
@@ -22,6 +34,9 @@ class OCRResponse(BaseModel):
 
     success: bool = Field(..., description="是否成功")
     pipeline: Literal["ocrv5", "vl", "structure"] = Field(..., description="使用的产线")
+    fallback_from: Optional[Literal["ocrv5", "vl", "structure"]] = Field(
+        None, description="请求的产线不可用而降级时，原请求的产线"
+    )
     result: Any = Field(..., description="识别结果")
     metrics: MetricsModel = Field(..., description="性能指标")
 
@@ -41,3 +56,21 @@ class HealthResponse(BaseModel):
     status: Literal["healthy", "degraded", "unhealthy"] = Field(..., description="服务状态")
     timestamp: str = Field(..., description="检查时间")
     pipelines: dict = Field(..., description="各产线状态")
+
+
+class JobResponse(BaseModel):
+    """异步任务状态"""
+
+    job_id: str = Field(..., description="任务ID")
+    pipeline: Literal["ocrv5", "vl", "structure"] = Field(..., description="使用的产线")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(..., description="任务状态")
+    filename: str = Field(..., description="上传文件名")
+    pages_total: Optional[int] = Field(None, description="总页数（未知时为空）")
+    pages_done: int = Field(0, description="已完成页数")
+    error: Optional[str] = Field(None, description="失败原因")
+    created_at: datetime = Field(..., description="提交时间")
+    started_at: Optional[datetime] = Field(None, description="开始执行时间")
+    finished_at: Optional[datetime] = Field(None, description="结束时间")
+    expires_at: Optional[datetime] = Field(None, description="结果过期时间")
+    status_url: str = Field(..., description="状态查询地址")
+    result_url: str = Field(..., description="结果获取地址")
@@ -0,0 +1,102 @@
+"""
+服务端图像预处理
+与前端 client/imagePreprocessor.js 对齐：按产线限制分辨率、EXIF方向校正、灰度化、PDF渲染分辨率控制。
+前端已处理（compress=True）的请求跳过本阶段
+"""
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from core.config import settings
+
+
+@dataclass(frozen=True)
+class PreprocessOptions:
+    """单条产线的预处理参数"""
+
+    max_side: int               # 长边上限(像素)，<=0表示不限制
+    exif_transpose: bool        # 按EXIF方向旋转图片
+    grayscale: bool             # 转为灰度（仍保持3通道，兼容模型输入）
+    pdf_dpi: int                # PDF渲染分辨率上限
+
+    def signature(self) -> dict:
+        """参与结果缓存键的参数"""
+        return asdict(self)
+
+
+def get_preprocess_options(pipeline: str, compressed: bool) -> Optional[PreprocessOptions]:
+    """
+    获取产线的预处理参数
+
+    Args:
+        pipeline: 产线名称 (ocrv5/vl/structure)
+        compressed: 前端是否已完成预处理
+
+    Returns:
+        预处理参数；未启用或前端已处理时返回None
+    """
+    if not settings.PREPROCESS_ENABLED or compressed:
+        return None
+    max_side = {
+        "ocrv5": settings.OCRV5_MAX_IMAGE_SIDE,
+        "vl": settings.VL_MAX_IMAGE_SIDE,
+        "structure": settings.STRUCTURE_MAX_IMAGE_SIDE,
+    }.get(pipeline, 0)
+    return PreprocessOptions(
+        max_side=max_side,
+        exif_transpose=settings.PREPROCESS_EXIF_TRANSPOSE,
+        grayscale=pipeline in settings.PREPROCESS_GRAYSCALE_PIPELINES,
+        pdf_dpi=settings.PDF_RASTER_DPI,
+    )
+
+
+def decode_flags(options: Optional[PreprocessOptions]) -> int:
+    """
+    图片解码标志
+
+    OpenCV解码时即可按EXIF方向旋转，无需额外拷贝；关闭方向校正时忽略EXIF。
+    """
+    if options is not None and not options.exif_transpose:
+        return cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+    return cv2.IMREAD_COLOR
+
+
+def cap_resolution(image: np.ndarray, max_side: int) -> np.ndarray:
+    """长边超过max_side时等比缩小（区域插值，适合大幅缩小）"""
+    if max_side <= 0:
+        return image
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if longest <= max_side:
+        return image
+    scale = max_side / longest
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """转为灰度并恢复3通道BGR"""
+    if image.ndim == 2:
+        gray = image
+    else:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def preprocess_image(image: np.ndarray, options: PreprocessOptions) -> np.ndarray:
+    """
+    对解码后的BGR图像执行预处理（先缩小再灰度化，减少后续计算量）
+
+    Args:
+        image: HxWx3 BGR数组
+        options: 预处理参数
+
+    Returns:
+        处理后的BGR数组（无需处理时返回原数组）
+    """
+    image = cap_resolution(image, options.max_side)
+    if options.grayscale:
+        image = to_grayscale(image)
+    return image
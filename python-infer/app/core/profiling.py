@@ -0,0 +1,421 @@
+"""
+按需性能剖析
+由管理接口开启，对接下来的N个产线请求或T秒内的网关进程做采样或确定性剖析（可同时追踪内存分配），
+结果以折叠栈格式（flamegraph.pl / inferno / speedscope 可直接读取）写入 METRICS_EXPORT_DIR/profiles
+
+未开启时不安装任何追踪函数、采样线程或tracemalloc，请求路径上只有一次全局变量判断。
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 剖析模式：sampling 定时抓取全部线程的调用栈；deterministic 记录每次函数调用的耗时
+PROFILE_MODES = ("sampling", "deterministic")
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 空闲线程的栈顶帧（等待任务、事件循环等待IO），采样摘要中单独统计为idle
+IDLE_FRAMES = ("wait (threading.py", "select (selectors.py", "_worker (thread.py", "get (queue.py")
+
+
+def _short_path(filename: str) -> str:
+    """缩短源文件路径：第三方包取site-packages之后的部分，本项目取相对路径"""
+    for marker in ("site-packages" + os.sep, "dist-packages" + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    if filename.startswith(APP_DIR + os.sep):
+        return os.path.relpath(filename, APP_DIR)
+    return os.path.basename(filename)
+
+
+class ProfileSession:
+    """一次剖析会话"""
+
+    def __init__(
+        self,
+        mode: str,
+        max_requests: Optional[int],
+        seconds: float,
+        allocations: bool,
+        interval_ms: float,
+    ):
+        """
+        Args:
+            mode: 剖析模式 (sampling/deterministic)
+            max_requests: 剖析的产线请求数，为空则只按时长结束
+            seconds: 最长剖析时长(秒)
+            allocations: 是否用tracemalloc追踪内存分配
+            interval_ms: 采样间隔(毫秒)，仅sampling模式
+        """
+        # 精确到微秒，同一秒内先后开启的会话不会覆盖彼此的结果文件
+        self.id = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{mode}"
+        self.mode = mode
+        self.max_requests = max_requests
+        self.seconds = seconds
+        self.allocations = allocations
+        self.interval = interval_ms / 1000
+        self.active = False
+        self.started_at = 0.0
+
+        self._lock = threading.Lock()
+        self.requests_started = 0
+        self.requests_finished = 0
+        self.inflight = 0
+
+        # 折叠栈 → 权重（sampling为采样次数，deterministic为自身耗时微秒）
+        self._counters: list[Counter] = []
+        self._labels: dict = {}
+        self._local = threading.local()
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._owns_tracemalloc = False
+        self.samples = 0
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        """开始剖析（在事件循环线程中调用）"""
+        self.active = True
+        self.started_at = time.time()
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.PROFILE_ALLOC_FRAMES)
+            self._owns_tracemalloc = True
+
+        if self.mode == "sampling":
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+        elif hasattr(threading, "setprofile_all_threads"):
+            # Python 3.12+ 可为已存在的全部线程安装追踪函数
+            threading.setprofile_all_threads(self._trace)
+        else:
+            # 事件循环线程在此安装；产线推理线程由执行器在任务前后挂载。
+            # 事件循环上的协程交替执行，无法按请求区分，会话期间该线程上的全部请求都会被记录
+            sys.setprofile(self._trace)
+
+    def stop(self) -> dict:
+        """
+        停止剖析（在事件循环线程中调用），收集结果
+
+        Returns:
+            {"stacks": Counter, "alloc": 内存快照或None, "alloc_peak": 峰值字节}
+        """
+        self.active = False
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join(timeout=5)
+        elif hasattr(threading, "setprofile_all_threads"):
+            threading.setprofile_all_threads(None)
+        else:
+            # 其余线程的追踪函数在下一次调用事件时自行卸载
+            sys.setprofile(None)
+
+        snapshot, peak = None, 0
+        if self.allocations and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            peak = tracemalloc.get_traced_memory()[1]
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+
+        stacks: Counter = Counter()
+        with self._lock:
+            for counter in self._counters:
+                stacks.update(counter)
+        return {"stacks": stacks, "alloc": snapshot, "alloc_peak": peak}
+
+    # ---------- 请求计数（由ProfilingMiddleware调用） ----------
+
+    def begin_request(self) -> bool:
+        """登记一个产线请求，超过剖析请求数时返回False"""
+        with self._lock:
+            if not self.active or (self.max_requests is not None and self.requests_started >= self.max_requests):
+                return False
+            self.requests_started += 1
+            self.inflight += 1
+            return True
+
+    def end_request(self) -> bool:
+        """登记请求完成，达到剖析请求数时返回True（仅返回一次）"""
+        with self._lock:
+            self.inflight -= 1
+            self.requests_finished += 1
+            return self.max_requests is not None and self.requests_finished == self.max_requests
+
+    # ---------- 调用栈 ----------
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _new_counter(self) -> Counter:
+        counter = Counter()
+        with self._lock:
+            self._counters.append(counter)
+        return counter
+
+    def _sample_loop(self):
+        """采样线程：有剖析中的请求时定时抓取全部线程的调用栈"""
+        counter = self._new_counter()
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self.inflight <= 0:
+                continue
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, str(ident)))
+                counter[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    # ---------- 确定性剖析 ----------
+
+    def attach_thread(self):
+        """为当前线程安装追踪函数（执行器在推理任务开始时调用）"""
+        if self.mode == "deterministic" and self.active and sys.getprofile() is None:
+            self._local.state = None
+            self._local.attached = True
+            sys.setprofile(self._trace)
+
+    def detach_thread(self):
+        """卸载attach_thread安装的追踪函数（推理任务结束时调用）"""
+        if getattr(self._local, "attached", False):
+            sys.setprofile(None)
+            self._local.attached = False
+            self._local.state = None
+
+    def _thread_state(self, frame, event: str) -> dict:
+        """线程首次触发事件时，以已在执行的外层调用栈作为前缀"""
+        state = getattr(self._local, "state", None)
+        if state is None:
+            outer = frame.f_back if event == "call" else frame
+            base = []
+            while outer is not None:
+                base.append(self._label(outer.f_code))
+                outer = outer.f_back
+            base.append(threading.current_thread().name)
+            base.reverse()
+            state = {"base": base, "stack": [], "counter": self._new_counter()}
+            self._local.state = state
+        return state
+
+    def _trace(self, frame, event, arg):
+        """追踪函数：记录每个调用栈路径的自身耗时（微秒）"""
+        if not self.active:
+            sys.setprofile(None)
+            return
+        now = time.perf_counter_ns()
+        state = self._thread_state(frame, event)
+        stack = state["stack"]
+
+        if event == "call" or event == "c_call":
+            if event == "call":
+                label = self._label(frame.f_code)
+            else:
+                module = getattr(arg, "__module__", None) or "builtins"
+                label = f"{module}.{getattr(arg, '__qualname__', repr(arg))}".replace(";", ":")
+            parent = stack[-1][0] if stack else ";".join(state["base"])
+            # [路径, 开始时间, 子调用耗时]
+            stack.append([f"{parent};{label}", now, 0])
+        elif stack:
+            path, start, children = stack.pop()
+            elapsed = now - start
+            state["counter"][path] += max(elapsed - children, 0) // 1000
+            if stack:
+                stack[-1][2] += elapsed
+        elif event == "return" and len(state["base"]) > 1:
+            # 追踪开始前已在执行的外层函数返回
+            state["base"].pop()
+
+
+# 当前剖析会话与最近一次结果（在管理接口中开启）
+_session: Optional[ProfileSession] = None
+_last_result: Optional[dict] = None
+
+
+def get_profile_session() -> Optional[ProfileSession]:
+    """获取进行中的剖析会话，未开启时返回None"""
+    return _session
+
+
+def get_last_profile() -> Optional[dict]:
+    """获取最近一次完成的剖析摘要"""
+    return _last_result
+
+
+def start_profile(
+    mode: str,
+    max_requests: Optional[int] = None,
+    seconds: Optional[float] = None,
+    allocations: bool = False,
+    interval_ms: Optional[float] = None,
+) -> ProfileSession:
+    """
+    开启剖析（在事件循环线程中调用）
+
+    达到请求数或时长（不超过PROFILE_MAX_SECONDS）后自动结束并写出结果。
+
+    Raises:
+        ValueError: 参数无效
+        RuntimeError: 已有进行中的剖析
+    """
+    global _session
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"不支持的剖析模式: {mode}。仅支持: sampling/deterministic")
+    if _session is not None:
+        raise RuntimeError(f"剖析进行中: {_session.id}")
+
+    seconds = min(seconds or settings.PROFILE_MAX_SECONDS, settings.PROFILE_MAX_SECONDS)
+    session = ProfileSession(
+        mode,
+        max_requests,
+        seconds,
+        allocations,
+        interval_ms or settings.PROFILE_SAMPLE_INTERVAL_MS,
+    )
+    session.start()
+    _session = session
+    asyncio.get_running_loop().call_later(
+        seconds, lambda: asyncio.ensure_future(stop_profile("timeout", session))
+    )
+    logger.info(
+        f"开始剖析: {session.id}, 请求数={max_requests or '-'}, 时长上限={seconds}s, 内存分配={allocations}"
+    )
+    return session
+
+
+async def stop_profile(reason: str = "manual", session: Optional[ProfileSession] = None) -> Optional[dict]:
+    """
+    结束剖析并写出结果（在事件循环线程中调用）
+
+    Args:
+        reason: 结束原因 (requests/timeout/manual/shutdown)
+        session: 仅当进行中的会话为该会话时结束，为空则结束当前会话
+
+    Returns:
+        剖析摘要；没有进行中的剖析时返回None
+    """
+    global _session, _last_result
+    if _session is None or (session is not None and _session is not session):
+        return None
+    session, _session = _session, None
+    collected = session.stop()
+    try:
+        _last_result = await asyncio.to_thread(write_profile, session, collected, reason)
+    except Exception as e:
+        logger.error(f"剖析结果写出失败: {str(e)}", exc_info=True)
+        _last_result = {"id": session.id, "error": str(e)}
+        return _last_result
+    logger.info(f"剖析结束({reason}): {_last_result['files']}")
+    return _last_result
+
+
+def write_profile(session: ProfileSession, collected: dict, reason: str, top: int = 20) -> dict:
+    """
+    写出折叠栈文件与摘要JSON
+
+    - <id>.collapsed: 调用栈，sampling权重为采样次数，deterministic为自身耗时(微秒)
+    - <id>.alloc.collapsed: 剖析期间分配且结束时仍存活的内存(字节)
+    - <id>.json: 摘要（耗时最多的函数、内存分配热点）
+    """
+    output_dir = os.path.join(settings.METRICS_EXPORT_DIR, "profiles")
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, session.id)
+
+    stacks = collected["stacks"]
+    with open(f"{base}.collapsed", "w", encoding="utf-8") as f:
+        for stack, weight in stacks.most_common():
+            if weight > 0:
+                f.write(f"{stack} {weight}\n")
+    files = [f"{base}.collapsed"]
+
+    # 叶子帧的自身权重（采样模式下空闲线程的等待帧不计入排名）
+    leaves: Counter = Counter()
+    idle = 0
+    for stack, weight in stacks.items():
+        leaf = stack.rsplit(";", 1)[-1]
+        if session.mode == "sampling" and leaf.startswith(IDLE_FRAMES):
+            idle += weight
+            continue
+        leaves[leaf] += weight
+    total = sum(leaves.values())
+
+    summary = {
+        "id": session.id,
+        "mode": session.mode,
+        "reason": reason,
+        "started_at": datetime.fromtimestamp(session.started_at).isoformat(),
+        "duration": time.time() - session.started_at,
+        "requests": session.requests_finished,
+        "weight_unit": "samples" if session.mode == "sampling" else "us",
+        "samples": session.samples if session.mode == "sampling" else None,
+        "idle_weight": idle if session.mode == "sampling" else None,
+        "top_self": [
+            {"frame": frame, "weight": weight, "ratio": weight / total if total else 0.0}
+            for frame, weight in leaves.most_common(top)
+        ],
+    }
+
+    snapshot = collected["alloc"]
+    if snapshot is not None:
+        stats = snapshot.statistics("traceback")
+        with open(f"{base}.alloc.collapsed", "w", encoding="utf-8") as f:
+            for stat in stats:
+                frames = [f"{_short_path(frame.filename)}:{frame.lineno}".replace(";", ":") for frame in stat.traceback]
+                f.write(f"{';'.join(frames)} {stat.size}\n")
+        files.append(f"{base}.alloc.collapsed")
+        summary["alloc_peak_bytes"] = collected["alloc_peak"]
+        summary["alloc_retained_bytes"] = sum(stat.size for stat in stats)
+        summary["top_alloc"] = [
+            {
+                "site": f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                "bytes": stat.size,
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:top]
+        ]
+
+    files.append(f"{base}.json")
+    summary["files"] = files
+    with open(f"{base}.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def profile_status() -> dict:
+    """进行中的剖析状态"""
+    session = _session
+    if session is None:
+        return {"active": False}
+    return {
+        "active": True,
+        "id": session.id,
+        "mode": session.mode,
+        "allocations": session.allocations,
+        "max_requests": session.max_requests,
+        "requests_started": session.requests_started,
+        "requests_finished": session.requests_finished,
+        "elapsed": time.time() - session.started_at,
+        "max_seconds": session.seconds,
+    }
@@ -0,0 +1,244 @@
+"""
+响应序列化
+单次遍历完成编码：NaN/inf输出为null，NumPy标量与数组直接编码，无需预先清洗或转换。
+安装orjson时使用orjson，否则回退到标准库的纯Python编码器。
+
+按Accept请求头协商编码：JSON（默认）、MessagePack、CBOR；
+二进制编码中NumPy数组以原始小端字节缓冲区传输，不展开为嵌套列表
+"""
+import json
+import json.encoder
+import logging
+from typing import Any, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于部署环境
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 取决于部署环境
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover - 取决于部署环境
+    cbor2 = None
+
+logger = logging.getLogger(__name__)
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+CBOR_MEDIA_TYPE = "application/cbor"
+
+# Accept中的别名
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK_MEDIA_TYPE,
+    "application/vnd.msgpack": MSGPACK_MEDIA_TYPE,
+}
+
+
+def to_payload(model: BaseModel) -> dict:
+    """
+    浅层展开响应模型
+
+    只展开顶层字段，识别结果等大对象按原样交给编码器，避免model_dump深拷贝。
+    """
+    return {name: getattr(model, name) for name in type(model).model_fields}
+
+
+def _default(obj: Any) -> Any:
+    """编码器无法直接处理的类型"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, BaseModel):
+        return to_payload(obj)
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _floatstr(value: float, _repr=float.__repr__, _inf=float("inf")) -> str:
+    """非有限浮点数编码为null"""
+    if value != value or value == _inf or value == -_inf:
+        return "null"
+    return _repr(value)
+
+
+def _dumps_stdlib(obj: Any) -> bytes:
+    # 标准库C编码器无法替换NaN的输出，这里复用纯Python编码器并注入floatstr
+    iterencode = json.encoder._make_iterencode(
+        None, _default, json.encoder.encode_basestring, None, _floatstr,
+        ":", ",", False, False, True
+    )
+    return "".join(iterencode(obj, 0)).encode("utf-8")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """
+        编码为紧凑UTF-8 JSON
+
+        Args:
+            obj: 任意由dict/list/标量/NumPy/Pydantic模型组成的对象
+
+        Returns:
+            JSON字节串
+        """
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        """
+        编码为紧凑UTF-8 JSON
+
+        Args:
+            obj: 任意由dict/list/标量/NumPy/Pydantic模型组成的对象
+
+        Returns:
+            JSON字节串
+        """
+        return _dumps_stdlib(obj)
+
+
+# ---------- 二进制编码 ----------
+
+def _little_endian(array: np.ndarray) -> np.ndarray:
+    """转为C连续、小端字节序的数组"""
+    return np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+
+
+def _msgpack_default(obj: Any) -> Any:
+    """
+    MessagePack无法直接处理的类型
+
+    NumPy数组编码为 {"dtype", "shape", "data"} 映射，data为原始小端字节（bin类型）
+    """
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind not in "biuf":
+            return obj.tolist()
+        array = _little_endian(obj)
+        return {"dtype": array.dtype.name, "shape": list(array.shape), "data": array.tobytes()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, BaseModel):
+        return to_payload(obj)
+    if isinstance(obj, set):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+# RFC 8746 类型化数组标签（小端）
+_CBOR_TYPED_ARRAY_TAGS = {
+    "uint8": 64, "uint16": 69, "uint32": 70, "uint64": 71,
+    "int8": 72, "int16": 77, "int32": 78, "int64": 79,
+    "float16": 84, "float32": 85, "float64": 86,
+}
+# RFC 8746 多维数组（行优先）
+_CBOR_MULTI_DIM_TAG = 40
+
+
+def _cbor_default(encoder, obj: Any):
+    """
+    CBOR无法直接处理的类型
+
+    NumPy数组按RFC 8746编码：类型化数组标签包装原始小端字节，多维数组外层再加标签40（[shape, 数据]）
+    """
+    if isinstance(obj, np.ndarray):
+        tag = _CBOR_TYPED_ARRAY_TAGS.get(obj.dtype.name)
+        if tag is None:
+            encoder.encode(obj.tolist())
+            return
+        typed = cbor2.CBORTag(tag, _little_endian(obj).tobytes())
+        if obj.ndim == 1:
+            encoder.encode(typed)
+        else:
+            encoder.encode(cbor2.CBORTag(_CBOR_MULTI_DIM_TAG, [list(obj.shape), typed]))
+        return
+    if isinstance(obj, np.generic):
+        encoder.encode(obj.item())
+        return
+    if isinstance(obj, BaseModel):
+        encoder.encode(to_payload(obj))
+        return
+    raise TypeError(f"Object of type {type(obj).__name__} is not CBOR serializable")
+
+
+def _dumps_msgpack(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_msgpack_default, use_bin_type=True)
+
+
+def _dumps_cbor(obj: Any) -> bytes:
+    return cbor2.dumps(obj, default=_cbor_default)
+
+
+# 服务端支持的编码（按优先级），未安装依赖的编码不参与协商
+ENCODERS = {JSON_MEDIA_TYPE: dumps}
+if msgpack is not None:
+    ENCODERS[MSGPACK_MEDIA_TYPE] = _dumps_msgpack
+if cbor2 is not None:
+    ENCODERS[CBOR_MEDIA_TYPE] = _dumps_cbor
+
+
+def negotiate_media_type(accept: Optional[str]) -> Optional[str]:
+    """
+    按Accept请求头选择响应编码
+
+    Args:
+        accept: Accept请求头，为空时使用JSON
+
+    Returns:
+        选中的媒体类型；没有可用的类型时回退JSON，仅当客户端显式以q=0排除JSON
+        （如 ``application/json;q=0``、``*/*;q=0``）时返回None
+    """
+    if not accept:
+        return JSON_MEDIA_TYPE
+
+    candidates = []
+    json_refused = False
+    for order, part in enumerate(accept.split(",")):
+        media_range, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        media_range = MEDIA_TYPE_ALIASES.get(media_range.lower(), media_range.lower())
+        if quality <= 0:
+            if media_range in (JSON_MEDIA_TYPE, "*/*", "application/*"):
+                json_refused = True
+            continue
+        if media_range in ENCODERS:
+            candidates.append((-quality, order, media_range))
+        elif media_range in ("*/*", "application/*"):
+            # 通配符使用默认的JSON
+            candidates.append((-quality, order, JSON_MEDIA_TYPE))
+
+    if not candidates:
+        # text/html等浏览器默认值不应导致406，除非客户端明确拒绝JSON
+        return None if json_refused else JSON_MEDIA_TYPE
+    return min(candidates)[2]
+
+
+def encode(obj: Any, media_type: str = JSON_MEDIA_TYPE) -> bytes:
+    """
+    按媒体类型编码
+
+    Args:
+        obj: 任意由dict/list/标量/NumPy/Pydantic模型组成的对象
+        media_type: negotiate_media_type选出的媒体类型
+
+    Returns:
+        编码后的字节串
+    """
+    return ENCODERS[media_type](obj)
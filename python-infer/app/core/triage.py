@@ -0,0 +1,210 @@
+"""
+自动路由分诊
+在CPU上对上传内容做廉价的版面分析（文本密度、表格线与网格、图形区域、页数），
+决定交给OCRv5、StructureV3还是PaddleOCR-VL处理
+"""
+import time
+import logging
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from core.config import settings
+from core.imaging import count_pdf_pages, rasterize_pdf
+from core.ingest import UploadedFile, decode_image
+from core.preprocess import cap_resolution
+
+logger = logging.getLogger(__name__)
+
+# 图形区域判定的网格单元边长(像素，在分诊分辨率下)
+CELL_SIZE = 32
+# 单元内灰度标准差高于此值且中间调像素占多数时视为照片/插图
+GRAPHIC_CELL_MIN_STD = 20.0
+GRAPHIC_CELL_MIN_MIDTONE = 0.5
+
+
+@dataclass(frozen=True)
+class TriageThresholds:
+    """路由阈值（可用 bench/tune_triage.py 在标注样本上拟合）"""
+
+    table_min_intersections: int        # 横竖线交点数达到该值视为表格
+    table_min_ruling_lines: int         # 长横线/竖线总数达到该值视为表格或表单
+    vl_min_graphic_ratio: float         # 图形区域面积比例达到该值视为图文混排
+    vl_min_text_density: float          # 文字笔画面积比例达到该值视为密集版面
+    vl_max_pages: int                   # 超过该页数的复杂文档改用StructureV3（VL按页计费过高）
+
+    @classmethod
+    def from_settings(cls) -> "TriageThresholds":
+        return cls(
+            table_min_intersections=settings.AUTO_TABLE_MIN_INTERSECTIONS,
+            table_min_ruling_lines=settings.AUTO_TABLE_MIN_RULING_LINES,
+            vl_min_graphic_ratio=settings.AUTO_VL_MIN_GRAPHIC_RATIO,
+            vl_min_text_density=settings.AUTO_VL_MIN_TEXT_DENSITY,
+            vl_max_pages=settings.AUTO_VL_MAX_PAGES,
+        )
+
+
+@dataclass
+class TriageFeatures:
+    """分诊特征（多页文档取已分析各页的最大值）"""
+
+    pages: int                  # 总页数
+    text_density: float         # 文字笔画（去除表格线）占页面的面积比例
+    ruling_lines: int           # 长横线与长竖线条数
+    grid_intersections: int     # 横竖线交点数
+    graphic_ratio: float        # 照片/插图区域占页面的面积比例
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class TriageDecision:
+    """分诊结论"""
+
+    pipeline: str                           # 选中的产线 (ocrv5/vl/structure)
+    reason: str                             # 判定依据
+    triage_time: float                      # 分诊耗时(秒)
+    features: Optional[TriageFeatures] = None
+
+
+def page_features(image: np.ndarray, max_side: int) -> dict:
+    """
+    计算单页分诊特征
+
+    Args:
+        image: 灰度或BGR数组
+        max_side: 分析分辨率（长边像素），特征与原图分辨率无关
+
+    Returns:
+        {"text_density", "ruling_lines", "grid_intersections", "graphic_ratio"}
+    """
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray = cap_resolution(gray, max_side)
+    if np.median(gray) < 128:
+        # 深色背景（如深色主题截图）反色为浅底深字
+        gray = 255 - gray
+    height, width = gray.shape
+    area = float(height * width)
+
+    # 按网格单元判定照片/插图区域：纹理丰富且以中间调为主
+    rows, cols = height // CELL_SIZE, width // CELL_SIZE
+    graphic_mask = np.zeros((height, width), dtype=bool)
+    graphic_ratio = 0.0
+    if rows and cols:
+        cells = gray[:rows * CELL_SIZE, :cols * CELL_SIZE].reshape(rows, CELL_SIZE, cols, CELL_SIZE)
+        midtone = ((cells > 50) & (cells < 205)).mean(axis=(1, 3))
+        graphic_cells = (cells.std(axis=(1, 3)) > GRAPHIC_CELL_MIN_STD) & (midtone > GRAPHIC_CELL_MIN_MIDTONE)
+        graphic_ratio = float(graphic_cells.sum() * CELL_SIZE * CELL_SIZE / area)
+        # 屏蔽范围外扩一个单元，覆盖图形区域与网格不对齐的边缘
+        masked_cells = cv2.dilate(graphic_cells.astype(np.uint8), np.ones((3, 3), np.uint8)) > 0
+        graphic_mask[:rows * CELL_SIZE, :cols * CELL_SIZE] = np.repeat(
+            np.repeat(masked_cells, CELL_SIZE, axis=0), CELL_SIZE, axis=1
+        )
+
+    # 自适应阈值得到墨迹（文字笔画与线条），对不均匀背景稳健；图形区域不参与线条与文字统计
+    ink = cv2.adaptiveThreshold(
+        gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 10
+    )
+    ink[graphic_mask] = 0
+
+    # 开运算提取长横线/长竖线（长度超过长边的1/25，宽扁截图中字形的竖笔画不会被当作竖线）
+    min_line = max(40, max(height, width) // 25)
+    horizontal = cv2.morphologyEx(
+        ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (min_line, 1))
+    )
+    vertical = cv2.morphologyEx(
+        ink, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, (1, min_line))
+    )
+    h_lines = cv2.connectedComponents(horizontal)[0] - 1
+    v_lines = cv2.connectedComponents(vertical)[0] - 1
+    cross = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    joints = cv2.bitwise_and(cv2.dilate(horizontal, cross), cv2.dilate(vertical, cross))
+    intersections = cv2.connectedComponents(joints)[0] - 1
+
+    # 文字笔画：墨迹去除表格线
+    text = (ink > 0) & (horizontal == 0) & (vertical == 0)
+    return {
+        "text_density": float(np.count_nonzero(text) / area),
+        "ruling_lines": h_lines + v_lines,
+        "grid_intersections": intersections,
+        "graphic_ratio": graphic_ratio,
+    }
+
+
+def extract_features(upload: UploadedFile, max_side: int, max_pages: int) -> TriageFeatures:
+    """
+    对上传文件计算分诊特征（阻塞函数，需在线程中调用）
+
+    图片按灰度解码；PDF只按分析分辨率渲染前max_pages页。
+
+    Raises:
+        ValueError: 无法解码
+    """
+    if upload.is_pdf:
+        total_pages = count_pdf_pages(upload.pdf_source())
+        images = rasterize_pdf(upload.pdf_source(), max_side=max_side, max_pages=max_pages)
+    else:
+        image = decode_image(upload.read_bytes(), cv2.IMREAD_GRAYSCALE)
+        total_pages = 1
+        images = [image] if image is not None else []
+    if not images:
+        raise ValueError(f"无法解码: {upload.filename}")
+
+    per_page = [page_features(image, max_side) for image in images]
+    return TriageFeatures(
+        pages=total_pages,
+        text_density=max(page["text_density"] for page in per_page),
+        ruling_lines=max(page["ruling_lines"] for page in per_page),
+        grid_intersections=max(page["grid_intersections"] for page in per_page),
+        graphic_ratio=max(page["graphic_ratio"] for page in per_page),
+    )
+
+
+def decide(features: TriageFeatures, thresholds: TriageThresholds) -> tuple[str, str]:
+    """
+    按阈值选择产线
+
+    - 表格网格 → StructureV3（表格识别）
+    - 图文混排或密集版面 → VL；页数超过vl_max_pages时改用StructureV3
+    - 大量表格线（无网格的表单、三线表）→ StructureV3；插图边框也会形成线条，故排在图形判定之后
+    - 其余（纯文本截图、简单文档）→ OCRv5
+
+    Returns:
+        (产线, 判定依据)
+    """
+    if features.grid_intersections >= thresholds.table_min_intersections:
+        return "structure", "table_grid"
+
+    reason = None
+    if features.graphic_ratio >= thresholds.vl_min_graphic_ratio:
+        reason = "graphics"
+    elif features.text_density >= thresholds.vl_min_text_density:
+        reason = "dense_layout"
+    if reason is not None:
+        if features.pages > thresholds.vl_max_pages:
+            return "structure", "long_document"
+        return "vl", reason
+
+    if features.ruling_lines >= thresholds.table_min_ruling_lines:
+        return "structure", "ruling_lines"
+    return "ocrv5", "plain_text"
+
+
+def triage(upload: UploadedFile, thresholds: Optional[TriageThresholds] = None) -> TriageDecision:
+    """
+    对上传文件分诊（阻塞函数，需在线程中调用）
+
+    无法解码时交给通用性最强的VL产线，由产线自身的回退路径处理。
+    """
+    start_time = time.time()
+    thresholds = thresholds or TriageThresholds.from_settings()
+    try:
+        features = extract_features(upload, settings.AUTO_TRIAGE_MAX_SIDE, settings.AUTO_TRIAGE_MAX_PAGES)
+    except Exception as e:
+        logger.warning(f"分诊失败，交给VL产线: {upload.filename}: {str(e)}")
+        return TriageDecision("vl", "triage_failed", time.time() - start_time)
+    pipeline, reason = decide(features, thresholds)
+    return TriageDecision(pipeline, reason, time.time() - start_time, features)
@@ -10,10 +10,23 @@ import logging
 
 from typing import Optional
 from core.config import settings
-from api.v1 import ocr, health
+from core.executor import init_executors, shutdown_executors, get_executor
+from core.cache import init_cache
+from core.circuit_breaker import init_breakers
+from core.admission import init_admission
+from core.metrics_export import init_metrics_exporter, shutdown_metrics_exporter
+from core.jobs import init_job_store, shutdown_job_store, get_job_store
+from core.middleware import UploadSizeLimitMiddleware, PipelineMetricsMiddleware, ProfilingMiddleware
+from core.profiling import stop_profile
+from api.v1 import ocr, health, admin, metrics, jobs, batch, auto
 from services.ocr_v5 import OCRv5Service
+from services.ocr_v5_pool import OCRv5ProcessPool
 from services.vl_service import VLService
 from services.structure_v3 import StructureV3Service
+from services.batcher import MicroBatcher
+from services.job_runner import JobRunner
+from services.vllm_prober import init_vllm_prober, shutdown_vllm_prober, vllm_base_url
+from services.pipeline_manager import PipelineManager, ManagedPipeline
 
 # 配置日志
 logging.basicConfig(
@@ -22,16 +35,68 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# 全局服务实例
-ocr_v5_service: Optional[OCRv5Service] = None
-vl_service: Optional[VLService] = None
-structure_v3_service: Optional[StructureV3Service] = None
+# 全局产线管理器与任务执行器
+pipeline_manager: Optional[PipelineManager] = None
+job_runner: Optional[JobRunner] = None
+
+
+def build_ocr_v5_service():
+    """构造OCRv5服务（OCRV5_PROCESSES>0时为多进程推理池）"""
+    if settings.OCRV5_PROCESSES > 0:
+        return OCRv5ProcessPool(
+            processes=settings.OCRV5_PROCESSES,
+            devices=settings.OCRV5_DEVICES or [settings.OCRV5_DEVICE],
+            lang='ch',
+            cpu_threads=settings.OCRV5_CPU_THREADS,
+            roi_rec_model=settings.OCRV5_ROI_REC_MODEL,
+        )
+    return OCRv5Service(
+        lang = 'ch',
+        device = settings.OCRV5_DEVICE,
+        cpu_threads = settings.OCRV5_CPU_THREADS,
+        roi_rec_model = settings.OCRV5_ROI_REC_MODEL,
+    )
+
+
+def build_structure_v3_service() -> StructureV3Service:
+    """构造StructureV3服务"""
+    return StructureV3Service(
+        device='gpu:0',
+        use_table_recognition=True,
+        use_formula_recognition=True,
+        use_region_detection=True,
+    )
+
+
+def build_vl_service() -> VLService:
+    """构造VL服务"""
+    return VLService(
+        vl_rec_server_url=f"{vllm_base_url(settings.VLLM_ENDPOINT)}/v1",
+        concurrent_pages=settings.VL_CONCURRENT_PAGES,
+        max_concurrency=settings.VL_MAX_CONCURRENCY,
+    )
+
+
+def build_ocr_v5_batcher(service) -> MicroBatcher:
+    """OCRv5动态微批（随产线加载创建、卸载停止），批内各请求为(图像, 结果布局)"""
+    def predict_batch(items: list) -> list[dict]:
+        return service.predict_batch(
+            [image for image, _ in items], layouts=[layout for _, layout in items]
+        )
+
+    return MicroBatcher(
+        "ocrv5",
+        predict_batch,
+        get_executor("ocrv5"),
+        max_batch_size=settings.OCRV5_BATCH_MAX_SIZE,
+        max_wait_ms=settings.OCRV5_BATCH_MAX_WAIT_MS,
+    )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    global ocr_v5_service, vl_service, structure_v3_service
+    global pipeline_manager, job_runner
 
     # 启动时初始化服务
     logger.info("=" * 60)
@@ -39,35 +104,67 @@ async def lifespan(app: FastAPI):
     logger.info("=" * 60)
 
     try:
-        # 初始化OCRv5服务
-        logger.info("正在初始化 OCRv5 服务...")
-        ocr_v5_service = OCRv5Service(
-            lang = 'ch',
-            device = 'gpu:0',
-        )
-        logger.info("✓ OCRv5 服务就绪")
-
-        # 初始化StructureV3服务
-        logger.info("正在初始化 StructureV3 服务...")
-        structure_v3_service = StructureV3Service(
-            device='gpu:0',
-            use_table_recognition=True,
-            use_formula_recognition=True,
-            use_region_detection=True,
+        # 初始化产线执行器与准入控制
+        init_executors()
+        init_admission()
+
+        # 初始化结果缓存
+        init_cache()
+
+        # 初始化指标导出
+        init_metrics_exporter()
+
+        # vLLM后台健康探测与VL产线熔断器
+        init_vllm_prober()
+        init_breakers()
+
+        # 产线按需加载：首次请求时加载模型，空闲超时后卸载
+        pipeline_manager = PipelineManager(
+            [
+                ManagedPipeline(
+                    "ocrv5",
+                    build_ocr_v5_service,
+                    idle_timeout=settings.OCRV5_IDLE_UNLOAD_SECONDS,
+                    batcher_factory=build_ocr_v5_batcher if settings.OCRV5_BATCH_ENABLED else None,
+                ),
+                ManagedPipeline(
+                    "structure",
+                    build_structure_v3_service,
+                    idle_timeout=settings.STRUCTURE_IDLE_UNLOAD_SECONDS,
+                ),
+                ManagedPipeline(
+                    "vl",
+                    build_vl_service,
+                    idle_timeout=settings.VL_IDLE_UNLOAD_SECONDS,
+                ),
+            ],
+            check_interval=settings.PIPELINE_IDLE_CHECK_SECONDS,
         )
-        logger.info("✓ StructureV3 服务就绪")
 
-        # 初始化VL服务
-        logger.info("正在初始化 PaddleOCR-VL 服务...")
-        vl_service = VLService()
-        logger.info(f"✓ VL 服务就绪 (vLLM端点: {settings.VLLM_ENDPOINT})")
+        # 仅预加载白名单中的产线
+        if settings.PRELOAD_PIPELINES:
+            logger.info(f"正在预加载产线: {settings.PRELOAD_PIPELINES}")
+            await pipeline_manager.preload(settings.PRELOAD_PIPELINES)
+        pipeline_manager.start()
+
+        # 将产线管理器注入到路由模块
+        ocr.set_pipelines(pipeline_manager)
+        health.set_pipelines(pipeline_manager)
 
-        # 将服务实例注入到路由模块
-        ocr.set_services(ocr_v5_service, vl_service, structure_v3_service)
-        health.set_services(ocr_v5_service, vl_service, structure_v3_service)
+        # 异步任务队列（重启前未完成的任务会继续执行）
+        init_job_store()
+        if get_job_store() is not None:
+            job_runner = JobRunner(
+                get_job_store(),
+                pipeline_manager,
+                concurrency=settings.JOBS_CONCURRENCY,
+                poll_interval=settings.JOBS_POLL_INTERVAL_SECONDS,
+            )
+            job_runner.start()
+        jobs.set_job_runner(job_runner)
 
         logger.info("=" * 60)
-        logger.info("✓ 所有服务初始化完成，API网关已启动")
+        logger.info("✓ API网关已启动（未预加载的产线将在首次请求时加载）")
         logger.info(f"API文档: http://0.0.0.0:8090{settings.API_V1_PREFIX}/docs")
         logger.info("=" * 60)
 
@@ -79,9 +176,17 @@ async def lifespan(app: FastAPI):
 
     # 关闭时清理
     logger.info("正在关闭服务...")
-    ocr_v5_service = None
-    vl_service = None
-    structure_v3_service = None
+    if job_runner:
+        await job_runner.stop()
+        job_runner = None
+    shutdown_job_store()
+    if pipeline_manager:
+        await pipeline_manager.stop()
+        pipeline_manager = None
+    await stop_profile("shutdown")
+    shutdown_executors()
+    await shutdown_vllm_prober()
+    shutdown_metrics_exporter()
     logger.info("服务已关闭")
 
 
@@ -102,9 +207,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 上传大小限制（在multipart解析前拒绝超限请求）
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_bytes=settings.MAX_FILE_SIZE_MB * 1024 * 1024 + settings.UPLOAD_REQUEST_OVERHEAD_KB * 1024,
+    path_prefix=settings.API_V1_PREFIX,
+    path_limits={
+        f"{settings.API_V1_PREFIX}{path}/batch": settings.BATCH_MAX_REQUEST_MB * 1024 * 1024
+        for path in ("/text", "/document/vl_model", "/document/structure_model")
+    },
+)
+
+# 产线路由（路径 → 产线名称）
+PIPELINE_ROUTES = {
+    f"{settings.API_V1_PREFIX}/text": "ocrv5",
+    f"{settings.API_V1_PREFIX}/document/vl_model": "vl",
+    f"{settings.API_V1_PREFIX}/document/structure_model": "structure",
+    f"{settings.API_V1_PREFIX}/text/batch": "ocrv5",
+    f"{settings.API_V1_PREFIX}/document/vl_model/batch": "vl",
+    f"{settings.API_V1_PREFIX}/document/structure_model/batch": "structure",
+    f"{settings.API_V1_PREFIX}/auto": "auto",
+}
+
+# 产线请求指标（请求数、错误数、字节数、在途请求）
+if settings.ENABLE_METRICS:
+    app.add_middleware(PipelineMetricsMiddleware, routes=PIPELINE_ROUTES)
+
+# 按需剖析（管理接口开启后统计产线请求数）
+app.add_middleware(ProfilingMiddleware, routes=PIPELINE_ROUTES)
+
 # 注册路由
 app.include_router(ocr.router, prefix=settings.API_V1_PREFIX, tags=["OCR"])
+app.include_router(batch.router, prefix=settings.API_V1_PREFIX, tags=["Batch"])
+app.include_router(auto.router, prefix=settings.API_V1_PREFIX, tags=["Auto"])
 app.include_router(health.router, prefix=settings.API_V1_PREFIX, tags=["Health"])
+app.include_router(jobs.router, prefix=settings.API_V1_PREFIX, tags=["Jobs"])
+app.include_router(admin.router, prefix=settings.API_V1_PREFIX, tags=["Admin"])
+app.include_router(metrics.router, prefix=settings.API_V1_PREFIX, tags=["Metrics"])
 
 
 @app.get("/", summary="根路径")
@@ -116,6 +255,7 @@ async def root():
         "description": settings.DESCRIPTION,
         "docs_url": f"{settings.API_V1_PREFIX}/docs",
         "health_check": f"{settings.API_V1_PREFIX}/health",
+        "jobs": f"{settings.API_V1_PREFIX}/jobs",
         "pipelines": {
             "ocrv5": f"{settings.API_V1_PREFIX}/text",
             "vl": f"{settings.API_V1_PREFIX}/document",
@@ -0,0 +1,150 @@
+"""
+动态微批调度器
+在时间窗口内收集并发请求，合并为一次批量推理
+"""
+import asyncio
+import time
+import logging
+from typing import Any, Callable, Optional
+
+from core.executor import PipelineExecutor
+from core.metrics import BATCH_SIZE, BATCH_QUEUE_WAIT, histogram_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """动态微批调度器"""
+
+    def __init__(
+        self,
+        name: str,
+        batch_fn: Callable[[list], list],
+        executor: PipelineExecutor,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+    ):
+        """
+        初始化微批调度器
+
+        Args:
+            name: 调度器名称（通常为产线名）
+            batch_fn: 批量推理函数，输入列表，返回等长结果列表
+            executor: 执行批量推理的产线执行器
+            max_batch_size: 单批最大请求数
+            max_wait_ms: 首个请求到达后最多等待的毫秒数
+        """
+        self.name = name
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        # 直方图在模块级按产线标签注册一次，重建调度器（如重载产线）不会重置计数
+        self.batch_size_hist = BATCH_SIZE.labels(pipeline=name)
+        self.queue_wait_hist = BATCH_QUEUE_WAIT.labels(pipeline=name)
+
+        self._queue: asyncio.Queue = asyncio.Queue()
+        # 同时在途的批次数不超过执行器线程数，其余请求继续累积成更大的批
+        self._slots = asyncio.Semaphore(executor.max_workers)
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+
+    def start(self):
+        """启动调度循环（需在事件循环内调用）"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(), name=f"{self.name}-batcher")
+            logger.info(
+                f"{self.name} 微批调度已启动: max_batch_size={self.max_batch_size}, "
+                f"max_wait_ms={self.max_wait * 1000:.1f}"
+            )
+
+    async def stop(self):
+        """停止调度循环，并让仍在排队的请求失败"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.name} 微批调度已停止"))
+
+    async def submit(self, item: Any) -> tuple[Any, float]:
+        """
+        提交单个请求并等待其所在批次完成
+
+        Args:
+            item: 单个推理输入
+
+        Returns:
+            (该请求对应的结果, 排队耗时秒数)
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.time()))
+        return await future
+
+    async def _loop(self):
+        """调度循环：凑批 → 派发"""
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = [await self._queue.get()]
+                deadline = time.time() + self.max_wait
+
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except BaseException:
+                self._slots.release()
+                raise
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list):
+        """执行一个批次并把结果分发给各请求"""
+        dispatch_time = time.time()
+        waits = [dispatch_time - enqueued for _, _, enqueued in batch]
+        for wait in waits:
+            self.queue_wait_hist.observe(wait)
+        self.batch_size_hist.observe(len(batch))
+
+        try:
+            results, executor_wait = await self.executor.run(
+                self.batch_fn, [item for item, _, _ in batch]
+            )
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"批量推理结果数量不匹配: 期望{len(batch)}，实际{len(results)}"
+                )
+            for (_, future, _), result, wait in zip(batch, results, waits):
+                if not future.done():
+                    future.set_result((result, wait + executor_wait))
+        except Exception as e:
+            logger.error(f"{self.name} 批量推理失败: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        """返回批大小与排队耗时直方图"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending": self._queue.qsize(),
+            "batch_size": histogram_snapshot(self.batch_size_hist),
+            "queue_wait": histogram_snapshot(self.queue_wait_hist),
+        }
@@ -0,0 +1,252 @@
+"""
+异步任务执行器
+从SQLite任务队列认领任务，通过产线执行器驱动现有Service完成推理
+"""
+import asyncio
+import time
+import logging
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+
+from core.admission import get_admission, AdmissionRejected, PRIORITY_BATCH
+from core.config import settings
+from core.executor import get_executor
+from core.imaging import rescale_result
+from core.ingest import UploadedFile, PreparedInput, prepare_input
+from core.preprocess import get_preprocess_options
+from core.jobs import JobStore
+from core.models import MetricsModel
+from core.metrics import FALLBACK_TOTAL
+from core.metrics_export import export_request_metrics
+from services.vl_routing import PipelineUnavailable, predict_vl, vl_unavailable_error, vl_unavailable_reason
+
+logger = logging.getLogger(__name__)
+
+
+class JobRunner:
+    """异步任务执行器"""
+
+    def __init__(
+        self,
+        store: JobStore,
+        pipelines,
+        concurrency: int = 2,
+        poll_interval: float = 1.0,
+    ):
+        """
+        初始化任务执行器
+
+        Args:
+            store: 任务存储
+            pipelines: 产线管理器（PipelineManager），按需加载模型
+            concurrency: 同时执行的任务数（实际推理并发仍受产线执行器限制）
+            poll_interval: 空闲时轮询队列与清理过期任务的间隔(秒)
+        """
+        self.store = store
+        self.pipelines = pipelines
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        """启动任务工作协程（需在事件循环内调用）"""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+                for i in range(self.concurrency)
+            ]
+            logger.info(f"异步任务执行器已启动: concurrency={self.concurrency}")
+
+    async def stop(self):
+        """停止工作协程；运行中的任务保持running状态，下次启动时重新排队"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def notify(self):
+        """有新任务入队时唤醒空闲的工作协程"""
+        self._wakeup.set()
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim_next)
+            except Exception as e:
+                logger.error(f"认领任务失败: {str(e)}")
+                job = None
+
+            if job is None:
+                await asyncio.to_thread(self.store.purge_expired)
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._execute(job)
+
+    async def _execute(self, job: dict):
+        """执行单个任务并写回结果"""
+        job_id = job["id"]
+        pipeline = job["pipeline"]
+        options = job["options"]
+        logger.info(f"开始执行任务 {job_id} ({pipeline}, {job['filename']})")
+
+        upload = None
+        prepared = None
+        try:
+            upload = UploadedFile(
+                filename=job["filename"],
+                ext=job["input_path"].rsplit(".", 1)[-1],
+                buffer=open(job["input_path"], "rb"),
+                size=job["size"],
+                content_hash=job["content_hash"],
+                upload_time=options.get("upload_time", 0.0),
+            )
+
+            fallback_from = None
+            try:
+                prediction, prepared, queue_time = await self._predict(job_id, pipeline, upload, options)
+            except PipelineUnavailable as e:
+                if pipeline != "vl" or not options.get("fallback", False):
+                    raise
+                logger.warning(f"任务 {job_id} VL产线不可用，降级到StructureV3: {e.detail}")
+                fallback_from, pipeline = pipeline, "structure"
+                prediction, prepared, queue_time = await self._predict(job_id, pipeline, upload, options)
+                if settings.ENABLE_METRICS:
+                    FALLBACK_TOTAL.labels(pipeline="vl", fallback="structure").inc()
+
+            metrics = MetricsModel(
+                total_time=time.time() - job["created_at"],
+                inference_time=prediction["inference_time"],
+                format_time=prediction.get("format_time"),
+                upload_time=upload.upload_time,
+                decode_time=prepared.decode_time,
+                disk_io_time=prepared.disk_io_time,
+                preprocess_time=prepared.preprocess_time,
+                queue_time=queue_time,
+                image_size_kb=upload.size_kb,
+                compressed=options.get("compress", False),
+                pages_reused=prediction.get("pages_reused"),
+                pages_recomputed=prediction.get("pages_recomputed"),
+                source=prediction["source"],
+            )
+            export_request_metrics(pipeline, metrics)
+
+            pages_total = prepared.pages if prepared.in_memory else None
+            pages_done = prediction["result"].get("pages", pages_total) if isinstance(
+                prediction["result"], dict
+            ) else pages_total
+            if pages_done is not None:
+                await asyncio.to_thread(self.store.update_progress, job_id, pages_done, pages_done)
+            await asyncio.to_thread(
+                self.store.complete, job_id,
+                {
+                    "result": prediction["result"],
+                    "metrics": metrics.model_dump(),
+                    "pipeline": pipeline,
+                    "fallback_from": fallback_from,
+                }
+            )
+            logger.info(f"任务完成 {job_id} ({metrics.total_time:.2f}s)")
+
+        except asyncio.CancelledError:
+            # 网关关闭：保持running状态，重启后重新排队
+            raise
+        except HTTPException as e:
+            logger.error(f"任务执行失败 {job_id}: {e.detail}")
+            await asyncio.to_thread(self.store.fail, job_id, f"推理失败: {e.detail}")
+        except Exception as e:
+            logger.error(f"任务执行失败 {job_id}: {str(e)}", exc_info=True)
+            await asyncio.to_thread(self.store.fail, job_id, f"推理失败: {str(e)}")
+        finally:
+            if upload:
+                upload.close()
+            if prepared:
+                prepared.cleanup()
+
+    async def _predict(
+        self,
+        job_id: str,
+        pipeline: str,
+        upload: UploadedFile,
+        options: dict,
+    ) -> tuple[dict, PreparedInput, float]:
+        """
+        占用产线准入名额准备输入并推理（VL经熔断器，与同步端点一致）
+
+        Returns:
+            (预测结果, 推理输入, queue_time)；推理输入由调用方清理
+
+        Raises:
+            PipelineUnavailable: VL产线不可用
+        """
+        managed = self.pipelines.get(pipeline)
+        executor = get_executor(pipeline)
+        if managed is None or executor is None:
+            raise RuntimeError(f"{pipeline}服务未初始化")
+        if pipeline == "vl":
+            unavailable = vl_unavailable_reason()
+            if unavailable:
+                raise vl_unavailable_error(*unavailable)
+
+        def on_progress(pages_done: int):
+            # 在执行器线程中回调
+            self.store.update_progress(job_id, pages_done)
+
+        release_admission = await self._admit(pipeline)
+        prepared = None
+        try:
+            preprocess = get_preprocess_options(pipeline, options.get("compress", False))
+            prepared = await asyncio.to_thread(prepare_input, upload, preprocess)
+            pages_total = prepared.pages if prepared.in_memory else None
+            await asyncio.to_thread(self.store.update_progress, job_id, 0, pages_total)
+
+            if pipeline == "vl":
+                prediction, queue_time = await predict_vl(
+                    managed, prepared.data, options["format"], progress_callback=on_progress
+                )
+            else:
+                kwargs = {}
+                if pipeline == "structure":
+                    kwargs = {"output_format": options["format"], "progress_callback": on_progress}
+                async with managed.lease() as service:
+                    prediction, queue_time = await executor.run(service.predict, prepared.data, **kwargs)
+            prediction["result"] = rescale_result(prediction["result"], prepared.scales)
+            return prediction, prepared, queue_time
+        except BaseException:
+            if prepared:
+                prepared.cleanup()
+            raise
+        finally:
+            release_admission()
+
+    async def _admit(self, pipeline: str) -> Callable[[], None]:
+        """
+        以batch优先级获取产线准入名额；排队已满时按Retry-After等待后重试，任务不因繁忙而失败
+
+        Returns:
+            归还名额的回调
+        """
+        controller = get_admission(pipeline)
+        if controller is None:
+            return lambda: None
+        while True:
+            try:
+                acquired_at = await controller.acquire(PRIORITY_BATCH)
+            except AdmissionRejected as e:
+                await asyncio.sleep(max(self.poll_interval, e.retry_after))
+                continue
+            return lambda: controller.release(acquired_at)
+
+    def stats(self) -> dict:
+        return {"concurrency": self.concurrency, **self.store.stats()}
@@ -3,12 +3,23 @@ OCRv5服务层
 使用PaddleOCR进行基础文本识别
 """
 import time
+import base64
+import threading
 from paddleocr import PaddleOCR
-from typing import Optional
+from typing import Optional, Union
 import logging
+import cv2
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# 结果布局：rows 每行一个对象（默认）；columnar texts/scores/boxes/polygons 为平行数组
+LAYOUTS = ("rows", "columnar")
+# 区域识别模式：line 每个区域视为一行文本（跳过检测）；detect 只在区域内检测（多行区域）
+ROI_MODES = ("line", "detect")
+# line模式下识别模型的批大小
+ROI_REC_BATCH_SIZE = 16
+
 
 class OCRv5Service:
     """PP-OCRv5服务"""
@@ -21,24 +32,45 @@ class OCRv5Service:
         use_doc_unwarping: bool = False,                # 是否启用文本图像矫正
         use_textline_orientation: bool = False,         # 是否启用文本行方向分类
         ocr_version: str = 'PP-OCRv5',                  # OCR版本选择,如 'PP-OCRv5', 'PP-OCRv4', 'PP-OCRv3'
+        cpu_threads: Optional[int] = None,              # CPU推理线程数（多进程部署时避免超额订阅）
+        roi_rec_model: Optional[str] = None,            # 区域识别(line模式)的文本识别模型，为空使用PaddleOCR默认模型
     ):
         logger.info("初始化OCRv5模型...")
+        # 构造参数（参与结果缓存键）
+        self.options = {
+            "lang": lang,
+            "device": device,
+            "use_doc_orientation_classify": use_doc_orientation_classify,
+            "use_doc_unwarping": use_doc_unwarping,
+            "use_textline_orientation": use_textline_orientation,
+            "ocr_version": ocr_version,
+        }
+        if roi_rec_model:
+            self.options["roi_rec_model"] = roi_rec_model
+        extra_kwargs = {"cpu_threads": cpu_threads} if cpu_threads else {}
+        self._extra_kwargs = extra_kwargs
+        # 区域识别使用的独立识别模型，首次区域识别请求时加载
+        self._roi_rec_model = roi_rec_model
+        self._recognizer = None
+        self._recognizer_lock = threading.Lock()
         self.ocr = PaddleOCR(
             lang=lang,
             ocr_version=ocr_version,
             device=device,
             use_doc_orientation_classify=use_doc_orientation_classify,
             use_doc_unwarping=use_doc_unwarping,
-            use_textline_orientation=use_textline_orientation
+            use_textline_orientation=use_textline_orientation,
+            **extra_kwargs
         )
         logger.info("OCRv5模型加载完成")
 
-    def predict(self, image_path: str) -> dict:
+    def predict(self, image_path: Union[str, np.ndarray, list], layout: str = "rows") -> dict:
         """
         执行OCR推理
 
         Args:
-            image_path: 图片文件路径
+            image_path: 图片文件路径，或内存中的BGR数组/逐页数组列表
+            layout: 结果布局 (rows/columnar)
 
         Returns:
             包含识别结果和推理时间的字典
@@ -51,11 +83,13 @@ class OCRv5Service:
             inference_time = time.time() - start_time
 
             # 格式化结果
-            formatted_result = self._format_result(result)
+            format_start = time.time()
+            formatted_result = self._format(result, layout)
 
             return {
                 "result": formatted_result,
                 "inference_time": inference_time,
+                "format_time": time.time() - format_start,
                 "source": "local"
             }
 
@@ -63,6 +97,156 @@ class OCRv5Service:
             logger.error(f"OCRv5推理失败: {str(e)}")
             raise
 
+    def predict_batch(self, image_paths: list, layouts: Optional[list[str]] = None) -> list[dict]:
+        """
+        批量执行OCR推理（供微批调度器调用）
+
+        Args:
+            image_paths: 图片路径或BGR数组列表（不支持PDF，PDF会展开为多页结果）
+            layouts: 与输入一一对应的结果布局，为空则全部为rows
+
+        Returns:
+            与输入一一对应的结果字典列表，inference_time为整批耗时
+        """
+        start_time = time.time()
+
+        try:
+            results = self.ocr.predict(image_paths)
+            inference_time = time.time() - start_time
+
+            layouts = layouts or ["rows"] * len(image_paths)
+            predictions = []
+            for result, layout in zip(results, layouts):
+                format_start = time.time()
+                formatted_result = self._format([result], layout)
+                predictions.append({
+                    "result": formatted_result,
+                    "inference_time": inference_time,
+                    "format_time": time.time() - format_start,
+                    "batch_size": len(image_paths),
+                    "source": "local"
+                })
+            return predictions
+
+        except Exception as e:
+            logger.error(f"OCRv5批量推理失败: {str(e)}")
+            raise
+
+    def predict_regions(
+        self,
+        image: Union[str, np.ndarray],
+        regions: list,
+        layout: str = "rows",
+        mode: str = "line",
+    ) -> dict:
+        """
+        只识别指定区域（ROI）
+
+        各区域经透视矫正裁剪后整批推理：line模式跳过检测直接送入识别模型，
+        detect模式只在裁剪图上检测；坐标映射回原图，结果结构与predict一致，
+        每行额外带roi（所属区域序号，columnar布局为rois数组）。
+
+        Args:
+            image: 图片文件路径或BGR数组
+            regions: normalize_region规整后的四点多边形列表（原图坐标）
+            layout: 结果布局 (rows/columnar)
+            mode: 区域识别模式 (line/detect)
+
+        Returns:
+            包含识别结果和推理时间的字典
+        """
+        start_time = time.time()
+
+        try:
+            if isinstance(image, str):
+                image = cv2.imread(image, cv2.IMREAD_COLOR)
+                if image is None:
+                    raise ValueError("无法读取图片")
+
+            crops = [crop_region(image, quad) for quad in regions]
+            if mode == "detect":
+                raw_result, rois = self._detect_regions(crops)
+            else:
+                raw_result, rois = self._recognize_regions(crops)
+            inference_time = time.time() - start_time
+
+            format_start = time.time()
+            formatted_result = self._format([raw_result], layout)
+            if layout == "columnar":
+                formatted_result["rois"] = np.asarray(rois, dtype=np.int32)
+            else:
+                for region, roi in zip(formatted_result["regions"], rois):
+                    region["roi"] = roi
+
+            return {
+                "result": formatted_result,
+                "inference_time": inference_time,
+                "format_time": time.time() - format_start,
+                "source": "local"
+            }
+
+        except Exception as e:
+            logger.error(f"OCRv5区域识别失败: {str(e)}")
+            raise
+
+    def _get_recognizer(self):
+        """获取区域识别使用的文本识别模型（首次调用时加载）"""
+        with self._recognizer_lock:
+            if self._recognizer is None:
+                from paddleocr import TextRecognition
+
+                logger.info("加载区域识别模型...")
+                model_kwargs = {"model_name": self._roi_rec_model} if self._roi_rec_model else {}
+                self._recognizer = TextRecognition(
+                    device=self.options["device"], **model_kwargs, **self._extra_kwargs
+                )
+                logger.info("区域识别模型加载完成")
+        return self._recognizer
+
+    def _recognize_regions(self, crops: list) -> tuple[dict, list[int]]:
+        """line模式：每个区域一行文本，裁剪图整批送入识别模型（空区域返回空文本）"""
+        texts = [""] * len(crops)
+        scores = [0.0] * len(crops)
+        indices = [i for i, (crop, _, _) in enumerate(crops) if crop is not None]
+        if indices:
+            inputs = []
+            for i in indices:
+                crop = crops[i][0]
+                # 竖排文本行旋转为横排（与PaddleOCR产线一致）
+                if crop.shape[0] >= crop.shape[1] * 1.5:
+                    crop = np.ascontiguousarray(np.rot90(crop))
+                inputs.append(crop)
+            outputs = self._get_recognizer().predict(input=inputs, batch_size=ROI_REC_BATCH_SIZE)
+            for i, output in zip(indices, outputs):
+                texts[i] = output["rec_text"]
+                scores[i] = float(output["rec_score"])
+
+        polygons = [np.rint(quad).astype(np.int32) for _, _, quad in crops]
+        return _raw_result(texts, scores, polygons), list(range(len(crops)))
+
+    def _detect_regions(self, crops: list) -> tuple[dict, list[int]]:
+        """detect模式：只在各区域的裁剪图上检测与识别，检测框经逆变换映射回原图"""
+        indices = [i for i, (crop, _, _) in enumerate(crops) if crop is not None]
+        results = self.ocr.predict([crops[i][0] for i in indices]) if indices else []
+
+        texts, scores, polygons, rois = [], [], [], []
+        for i, result in zip(indices, results):
+            inverse = crops[i][1]
+            for text, score, poly in zip(result["rec_texts"], result["rec_scores"], result["dt_polys"]):
+                points = np.asarray(poly, dtype=np.float32).reshape(-1, 1, 2)
+                mapped = cv2.perspectiveTransform(points, inverse).reshape(-1, 2)
+                texts.append(text)
+                scores.append(float(score))
+                polygons.append(np.rint(mapped).astype(np.int32))
+                rois.append(i)
+        return _raw_result(texts, scores, polygons), rois
+
+    def _format(self, raw_result, layout: str) -> dict:
+        """按布局格式化OCR原始结果"""
+        if layout == "columnar":
+            return self._format_columnar(raw_result)
+        return self._format_result(raw_result)
+
     def _format_result(self, raw_result) -> dict:
         """
         格式化OCR原始结果
@@ -123,9 +307,174 @@ class OCRv5Service:
             "detected_lines": len(regions)
         }
 
+    def _format_columnar(self, raw_result) -> dict:
+        """
+        格式化为列式结果（texts/scores/boxes/polygons平行数组）
+
+        boxes与polygons直接取自PaddleOCR的NumPy数组，不为每行创建Python对象，
+        由序列化器整体编码
+
+        Args:
+            raw_result: PaddleOCR返回的原始结果
+
+        Returns:
+            列式结果字典
+        """
+        if isinstance(raw_result, list):
+            raw_result = raw_result[0] if raw_result else None
+        if not isinstance(raw_result, dict):
+            raw_result = {}
+
+        texts = list(raw_result.get("rec_texts") or [])
+        count = len(texts)
+        scores = np.asarray(raw_result.get("rec_scores", []), dtype=np.float32).reshape(-1)[:count]
+
+        rec_boxes = raw_result.get("rec_boxes")
+        boxes = np.asarray(rec_boxes if rec_boxes is not None and len(rec_boxes) else np.empty((0, 4)))
+        boxes = boxes.reshape(-1, 4)[:count]
+
+        dt_polys = raw_result.get("dt_polys")
+        if dt_polys is None or len(dt_polys) == 0:
+            polygons = np.empty((0, 4, 2), dtype=np.int16)
+        else:
+            try:
+                polygons = np.stack(dt_polys[:count])
+            except ValueError:
+                # 多边形检测模式下各行点数不同，无法合并为一个数组时逐行保留
+                polygons = [np.asarray(poly) for poly in dt_polys[:count]]
+
+        return {
+            "layout": "columnar",
+            "text": "\n".join(texts),
+            "texts": texts,
+            "scores": scores,
+            "boxes": boxes,
+            "polygons": polygons,
+            "detected_lines": count
+        }
+
     def health_check(self) -> dict:
         """健康检查"""
         return {
             "status": "ready",
-            "model_loaded": self.ocr is not None
+            "model_loaded": self.ocr is not None,
+            "roi_model_loaded": self._recognizer is not None
         }
+
+
+def normalize_region(region) -> list[list[float]]:
+    """
+    把矩形 [x1, y1, x2, y2] 或多边形 [[x, y], ...] 规整为从左上角起顺时针的四点多边形
+
+    多于四个点的多边形取最小外接旋转矩形。
+
+    Raises:
+        ValueError: 格式错误或面积为零
+    """
+    try:
+        points = np.asarray(region, dtype=np.float32)
+    except (TypeError, ValueError):
+        raise ValueError("应为 [x1, y1, x2, y2] 或 [[x, y], ...] 数值坐标")
+
+    if points.shape == (4,):
+        x1, y1, x2, y2 = points
+        quad = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)
+    elif points.ndim == 2 and points.shape[1] == 2 and len(points) >= 3:
+        quad = points if len(points) == 4 else cv2.boxPoints(cv2.minAreaRect(points))
+    else:
+        raise ValueError("应为 [x1, y1, x2, y2] 或 [[x, y], ...] 数值坐标")
+
+    if not np.isfinite(quad).all():
+        raise ValueError("坐标必须为有限数值")
+    if abs(cv2.contourArea(quad)) < 1:
+        raise ValueError("区域面积为零")
+
+    # 按绕中心的角度排序（图像坐标系y轴向下，角度递增即顺时针），再从左上角开始
+    center = quad.mean(axis=0)
+    quad = quad[np.argsort(np.arctan2(quad[:, 1] - center[1], quad[:, 0] - center[0]))]
+    quad = np.roll(quad, -int(np.argmin(quad.sum(axis=1))), axis=0)
+    return (np.round(quad, 2) + 0.0).tolist()
+
+
+def crop_region(image: np.ndarray, quad: list) -> tuple[Optional[np.ndarray], Optional[np.ndarray], np.ndarray]:
+    """
+    透视矫正裁剪四边形区域（超出图片的部分先裁到边界内）
+
+    Returns:
+        (裁剪图, 裁剪图→原图的变换矩阵, 裁到边界内的四边形)；区域完全落在图片外时前两项为None
+    """
+    height, width = image.shape[:2]
+    quad = np.clip(np.asarray(quad, dtype=np.float32), 0, [width - 1, height - 1]).astype(np.float32)
+    crop_width = int(round(max(np.linalg.norm(quad[0] - quad[1]), np.linalg.norm(quad[3] - quad[2]))))
+    crop_height = int(round(max(np.linalg.norm(quad[0] - quad[3]), np.linalg.norm(quad[1] - quad[2]))))
+    if crop_width < 1 or crop_height < 1:
+        return None, None, quad
+
+    target = np.array(
+        [[0, 0], [crop_width, 0], [crop_width, crop_height], [0, crop_height]], dtype=np.float32
+    )
+    matrix = cv2.getPerspectiveTransform(quad, target)
+    crop = cv2.warpPerspective(
+        image, matrix, (crop_width, crop_height),
+        flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE
+    )
+    return crop, np.linalg.inv(matrix), quad
+
+
+def _raw_result(texts: list, scores: list, polygons: list) -> dict:
+    """按PaddleOCR原始结果结构组装区域识别结果，复用同一套格式化"""
+    if polygons:
+        boxes = np.array([
+            [poly[:, 0].min(), poly[:, 1].min(), poly[:, 0].max(), poly[:, 1].max()] for poly in polygons
+        ], dtype=np.int32)
+    else:
+        boxes = np.empty((0, 4), dtype=np.int32)
+    return {
+        "rec_texts": texts,
+        "rec_scores": scores,
+        "dt_polys": polygons,
+        "rec_boxes": boxes,
+    }
+
+
+def pack_array(array: np.ndarray, dtype: str) -> dict:
+    """
+    把数组打包为小端二进制缓冲区（base64编码）
+
+    Args:
+        array: 数值数组
+        dtype: 目标类型 (int16/float32)；坐标超出int16范围时改用int32
+
+    Returns:
+        {"dtype", "shape", "data"} 描述，客户端可直接构造TypedArray
+    """
+    array = np.asarray(array)
+    if dtype == "int16" and array.size and (array.min() < -32768 or array.max() > 32767):
+        dtype = "int32"
+    packed = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder("<"))
+    return {
+        "dtype": dtype,
+        "shape": list(packed.shape),
+        "data": base64.b64encode(packed.tobytes()).decode("ascii"),
+    }
+
+
+def pack_columnar(result: dict) -> dict:
+    """
+    把列式结果中的scores/boxes/polygons打包为float32/int16二进制缓冲区
+
+    Args:
+        result: _format_columnar生成的结果（缓存中的结果不会被修改）
+
+    Returns:
+        新的结果字典；polygons各行点数不同时保持数组列表
+    """
+    packed = dict(result)
+    packed["packed"] = True
+    packed["scores"] = pack_array(result["scores"], "float32")
+    packed["boxes"] = pack_array(result["boxes"], "int16")
+    if isinstance(result["polygons"], np.ndarray):
+        packed["polygons"] = pack_array(result["polygons"], "int16")
+    if "rois" in result:
+        packed["rois"] = pack_array(result["rois"], "int16")
+    return packed
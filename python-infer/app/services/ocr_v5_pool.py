@@ -0,0 +1,431 @@
+"""
+OCRv5多进程推理池
+每个工作进程持有独立的OCRv5Service；解码后的图像经共享内存交给工作进程，
+rows布局结果以文本表加NumPy数组的紧凑形式传回，网关按在途任务数最少的原则分派请求
+"""
+import itertools
+import logging
+import os
+import queue
+import sys
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SharedImage:
+    """位于共享内存中的图像描述（代替数组本身在进程间传递）"""
+
+    name: str
+    shape: tuple
+    dtype: str
+
+
+def _to_shared(image: np.ndarray) -> tuple[SharedImage, shared_memory.SharedMemory]:
+    """把数组拷贝到新建的共享内存块"""
+    image = np.ascontiguousarray(image)
+    shm = shared_memory.SharedMemory(create=True, size=max(image.nbytes, 1))
+    np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+    return SharedImage(shm.name, image.shape, image.dtype.str), shm
+
+
+@dataclass(frozen=True)
+class PackedRows:
+    """rows布局结果的紧凑表示：文本表 + 每个字段一个数组（代替逐行字典在进程间传递）"""
+
+    keys: tuple         # 每行字段的原始顺序
+    texts: list         # 文本表
+    columns: dict       # 其余字段 -> 数组（各行长度不同无法合并时为原列表）
+    extra: dict         # text/regions/detected_lines之外的顶层字段
+
+
+def _compact_array(values: list):
+    """把一列数值转为尽量小的数组；转换须无损，否则保留原列表"""
+    try:
+        array = np.asarray(values)
+    except ValueError:
+        return values
+    if array.dtype.kind == "i" and array.size:
+        if array.min() >= -32768 and array.max() <= 32767:
+            return array.astype(np.int16)
+        if array.min() >= -2**31 and array.max() < 2**31:
+            return array.astype(np.int32)
+        return array
+    if array.dtype.kind == "f":
+        narrowed = array.astype(np.float32)
+        return narrowed if np.array_equal(narrowed, array) else array
+    if array.dtype.kind in "iub":
+        return array
+    return values
+
+
+def _pack_rows(result: dict):
+    """把rows布局结果打包为PackedRows；结构不规整时原样返回"""
+    regions = result.get("regions")
+    if not isinstance(regions, list) or not regions or not isinstance(regions[0], dict):
+        return result
+    keys = tuple(regions[0])
+    if "text" not in keys or any(not isinstance(r, dict) or tuple(r) != keys for r in regions):
+        return result
+    texts = [region["text"] for region in regions]
+    if result.get("text") != "\n".join(texts) or result.get("detected_lines") != len(regions):
+        return result
+
+    columns = {
+        key: _compact_array([region[key] for region in regions]) for key in keys if key != "text"
+    }
+    extra = {k: v for k, v in result.items() if k not in ("text", "regions", "detected_lines")}
+    return PackedRows(keys, texts, columns, extra)
+
+
+def _unpack_rows(packed: PackedRows) -> dict:
+    """在网关侧把PackedRows还原为rows布局结果"""
+    columns = [
+        packed.texts if key == "text" else (
+            packed.columns[key].tolist() if isinstance(packed.columns[key], np.ndarray) else packed.columns[key]
+        )
+        for key in packed.keys
+    ]
+    return {
+        "text": "\n".join(packed.texts),
+        "regions": [dict(zip(packed.keys, row)) for row in zip(*columns)],
+        "detected_lines": len(packed.texts),
+        **packed.extra,
+    }
+
+
+def _pack_prediction(prediction):
+    """工作进程返回前压缩rows布局结果（columnar布局本身即为数组）"""
+    if isinstance(prediction, list):
+        return [_pack_prediction(item) for item in prediction]
+    formatted = prediction.get("result") if isinstance(prediction, dict) else None
+    if isinstance(formatted, dict) and formatted.get("layout") != "columnar":
+        return {**prediction, "result": _pack_rows(formatted)}
+    return prediction
+
+
+def _unpack_prediction(prediction):
+    if isinstance(prediction, list):
+        return [_unpack_prediction(item) for item in prediction]
+    if isinstance(prediction, dict) and isinstance(prediction.get("result"), PackedRows):
+        return {**prediction, "result": _unpack_rows(prediction["result"])}
+    return prediction
+
+
+def _open_shared(name: str) -> shared_memory.SharedMemory:
+    """
+    附加到网关创建的共享内存块，且不登记到resource_tracker
+
+    spawn出的工作进程与网关共用同一个resource_tracker，unlink由网关负责；
+    附加方若先登记再unregister，会把网关自己的登记一并撤销（网关unlink时tracker报KeyError），
+    因此直接跳过附加方的登记
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _attach(payload, handles: list):
+    """在工作进程中把共享内存描述还原为数组视图（零拷贝）"""
+    if isinstance(payload, list):
+        return [_attach(item, handles) for item in payload]
+    if isinstance(payload, SharedImage):
+        shm = _open_shared(payload.name)
+        handles.append(shm)
+        return np.ndarray(payload.shape, dtype=np.dtype(payload.dtype), buffer=shm.buf)
+    return payload
+
+
+def _release(handles: list):
+    """关闭工作进程中的共享内存映射（仍被引用时等待垃圾回收后再试）"""
+    for shm in handles:
+        try:
+            shm.close()
+        except BufferError:
+            import gc
+            gc.collect()
+            try:
+                shm.close()
+            except BufferError:
+                logger.debug(f"共享内存仍被引用，延迟释放: {shm.name}")
+
+
+def _worker_main(
+    index: int, service_kwargs: dict, task_queue, result_queue, service_factory: Optional[Callable] = None
+):
+    """工作进程入口：加载模型后循环处理任务"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - ocrv5-worker-{index} - %(levelname)s - %(message)s'
+    )
+    if service_factory is None:
+        from services.ocr_v5 import OCRv5Service
+        service_factory = OCRv5Service
+
+    try:
+        service = service_factory(**service_kwargs)
+    except Exception as e:
+        result_queue.put(("failed", None, f"{type(e).__name__}: {e}"))
+        return
+    result_queue.put(("ready", None, {"pid": os.getpid(), "options": service.options}))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        task_id, method, payload, kwargs = task
+        handles = []
+        try:
+            images = _attach(payload, handles)
+            try:
+                result = getattr(service, method)(images, **kwargs)
+            finally:
+                del images
+                _release(handles)
+            result_queue.put(("done", task_id, _pack_prediction(result)))
+        except Exception as e:
+            result_queue.put(("error", task_id, f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    """网关侧的工作进程句柄"""
+
+    def __init__(self, index: int, device: str):
+        self.index = index
+        self.device = device
+        self.process = None
+        self.task_queue = None
+        self.result_queue = None
+        self.pid: Optional[int] = None
+        self.ready = threading.Event()
+        self.error: Optional[str] = None
+        self.alive = False
+        self.restarts = 0
+        self.completed = 0
+        self.seq = 0            # 最近一次分派的序号（在途数相同时轮流分派）
+        # task_id -> (Future, 共享内存块列表)
+        self.pending: dict[int, tuple[Future, list]] = {}
+
+    @property
+    def outstanding(self) -> int:
+        return len(self.pending)
+
+
+class OCRv5ProcessPool:
+    """OCRv5多进程推理池（与OCRv5Service接口一致，可直接替换）"""
+
+    def __init__(
+        self,
+        processes: int,
+        devices: list[str],
+        start_timeout: float = 600.0,
+        service_factory: Optional[Callable] = None,
+        **service_kwargs,
+    ):
+        """
+        启动工作进程并等待模型加载完成
+
+        Args:
+            processes: 工作进程数
+            devices: 推理设备列表，按进程序号轮流分配（如 ["cpu"] 或 ["gpu:0", "gpu:1"]）
+            start_timeout: 等待所有进程加载模型的超时(秒)
+            service_factory: 在工作进程中构造服务的可pickle工厂，为空使用OCRv5Service（基准测试替换为桩服务）
+            **service_kwargs: 传给OCRv5Service的其余构造参数
+        """
+        self.service_kwargs = service_kwargs
+        self.service_factory = service_factory
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        self._task_ids = itertools.count()
+        self._assign_seq = itertools.count()
+        self._closed = False
+        self.options: Optional[dict] = None
+
+        self.workers = [
+            _Worker(i, devices[i % len(devices)]) for i in range(processes)
+        ]
+        for worker in self.workers:
+            self._spawn(worker)
+
+        for worker in self.workers:
+            worker.ready.wait(timeout=start_timeout)
+        failed = [w for w in self.workers if not w.alive]
+        if len(failed) == len(self.workers):
+            self.close()
+            errors = "; ".join(f"#{w.index}: {w.error or '启动超时'}" for w in failed)
+            raise RuntimeError(f"OCRv5工作进程全部启动失败: {errors}")
+        logger.info(
+            f"OCRv5进程池就绪: {len(self.workers) - len(failed)}/{len(self.workers)} 个进程 "
+            f"(设备: {[w.device for w in self.workers]})"
+        )
+
+    def _spawn(self, worker: _Worker):
+        worker.ready.clear()
+        worker.alive = False
+        worker.error = None
+        worker.task_queue = self._ctx.Queue()
+        worker.result_queue = self._ctx.Queue()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, {**self.service_kwargs, "device": worker.device},
+                  worker.task_queue, worker.result_queue, self.service_factory),
+            name=f"ocrv5-worker-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+        threading.Thread(
+            target=self._collect, args=(worker, worker.process, worker.result_queue),
+            name=f"ocrv5-collector-{worker.index}", daemon=True
+        ).start()
+
+    def _collect(self, worker: _Worker, process, result_queue):
+        """接收工作进程结果；进程异常退出时让在途任务失败并重启进程"""
+        while True:
+            try:
+                kind, task_id, payload = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                if worker.process is not process:
+                    return
+                self._on_worker_exit(worker, process.exitcode)
+                return
+            except (EOFError, OSError):
+                return
+
+            if kind == "ready":
+                worker.pid = payload["pid"]
+                if self.options is None:
+                    self.options = payload["options"]
+                worker.alive = True
+                worker.ready.set()
+                continue
+            if kind == "failed":
+                worker.error = payload
+                logger.error(f"OCRv5工作进程#{worker.index}加载失败: {payload}")
+                worker.ready.set()
+                return
+
+            with self._lock:
+                future, shms = worker.pending.pop(task_id, (None, []))
+                worker.completed += 1
+            self._unlink(shms)
+            if future is None:
+                continue
+            if kind == "done":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def _on_worker_exit(self, worker: _Worker, exitcode):
+        with self._lock:
+            pending = list(worker.pending.values())
+            worker.pending.clear()
+            worker.alive = False
+        for future, shms in pending:
+            self._unlink(shms)
+            future.set_exception(RuntimeError(f"OCRv5工作进程#{worker.index}异常退出 (exitcode={exitcode})"))
+        worker.ready.set()
+        if not self._closed and worker.error is None:
+            logger.warning(f"OCRv5工作进程#{worker.index}异常退出 (exitcode={exitcode})，正在重启")
+            worker.restarts += 1
+            self._spawn(worker)
+
+    @staticmethod
+    def _unlink(shms: list):
+        for shm in shms:
+            try:
+                shm.close()
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _submit(self, method: str, image: Union[str, np.ndarray, list], **kwargs) -> Any:
+        """按在途任务最少原则分派任务并阻塞等待结果"""
+        shms = []
+
+        def share(item):
+            if isinstance(item, np.ndarray):
+                descriptor, shm = _to_shared(item)
+                shms.append(shm)
+                return descriptor
+            return item
+
+        payload = [share(item) for item in image] if isinstance(image, list) else share(image)
+        future: Future = Future()
+        try:
+            with self._lock:
+                candidates = [w for w in self.workers if w.alive]
+                if not candidates:
+                    raise RuntimeError("没有可用的OCRv5工作进程")
+                # 在途任务最少者优先，相同时轮流分派
+                worker = min(candidates, key=lambda w: (w.outstanding, w.seq))
+                worker.seq = next(self._assign_seq)
+                task_id = next(self._task_ids)
+                worker.pending[task_id] = (future, shms)
+                worker.task_queue.put((task_id, method, payload, kwargs))
+        except Exception:
+            self._unlink(shms)
+            raise
+        return _unpack_prediction(future.result())
+
+    def predict(self, image_path: Union[str, np.ndarray, list], layout: str = "rows") -> dict:
+        """执行OCR推理（与OCRv5Service.predict一致）"""
+        return self._submit("predict", image_path, layout=layout)
+
+    def predict_batch(self, image_paths: list, layouts: Optional[list[str]] = None) -> list[dict]:
+        """批量执行OCR推理（整批交给同一个工作进程）"""
+        return self._submit("predict_batch", image_paths, layouts=layouts)
+
+    def predict_regions(
+        self, image: Union[str, np.ndarray], regions: list, layout: str = "rows", mode: str = "line"
+    ) -> dict:
+        """只识别指定区域（与OCRv5Service.predict_regions一致）"""
+        return self._submit("predict_regions", image, regions=regions, layout=layout, mode=mode)
+
+    def health_check(self) -> dict:
+        """健康检查"""
+        alive = sum(1 for w in self.workers if w.alive)
+        return {
+            "status": "ready" if alive else "unavailable",
+            "model_loaded": alive > 0,
+            "processes": [
+                {
+                    "index": w.index,
+                    "pid": w.pid,
+                    "device": w.device,
+                    "alive": w.alive,
+                    "outstanding": w.outstanding,
+                    "completed": w.completed,
+                    "restarts": w.restarts,
+                    "error": w.error,
+                }
+                for w in self.workers
+            ],
+        }
+
+    def close(self):
+        """停止全部工作进程（产线卸载时调用）"""
+        self._closed = True
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.task_queue.put(None)
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            worker.alive = False
@@ -0,0 +1,313 @@
+"""
+产线生命周期管理
+按需加载模型（并发的首次请求共享同一次加载），空闲超时后卸载释放内存/显存
+"""
+import asyncio
+import gc
+import os
+import time
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 产线状态
+PIPELINE_UNLOADED = "unloaded"
+PIPELINE_LOADING = "loading"
+PIPELINE_READY = "ready"
+PIPELINE_FAILED = "failed"
+
+
+class PipelineLoadError(RuntimeError):
+    """产线模型加载失败"""
+
+
+def _memory_snapshot() -> tuple[Optional[int], Optional[int]]:
+    """
+    读取当前进程内存占用
+
+    Returns:
+        (进程RSS字节数, GPU已分配字节数)，无法获取时为None
+    """
+    rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+
+    gpu = None
+    try:
+        import paddle
+        if paddle.device.is_compiled_with_cuda() and paddle.device.cuda.device_count() > 0:
+            gpu = int(paddle.device.cuda.memory_allocated())
+    except Exception:
+        pass
+    return rss, gpu
+
+
+def _release_gpu_cache():
+    """卸载后归还Paddle显存缓存"""
+    try:
+        import paddle
+        if paddle.device.is_compiled_with_cuda():
+            paddle.device.cuda.empty_cache()
+    except Exception:
+        pass
+
+
+class ManagedPipeline:
+    """单条产线的按需加载/空闲卸载封装"""
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        idle_timeout: float = 0,
+        batcher_factory: Optional[Callable[[Any], Any]] = None,
+    ):
+        """
+        Args:
+            name: 产线名称 (ocrv5/vl/structure)
+            factory: 构造Service实例的阻塞函数（在线程中调用）
+            idle_timeout: 空闲多少秒后卸载，<=0表示常驻
+            batcher_factory: 以Service实例构造微批调度器（可选）
+        """
+        self.name = name
+        self.factory = factory
+        self.idle_timeout = idle_timeout
+        self.batcher_factory = batcher_factory
+
+        self.service = None
+        self.batcher = None
+        # 最近一次加载的Service构造参数（卸载后保留，缓存键无需重新加载模型）
+        self.options: Optional[dict] = None
+        self.state = PIPELINE_UNLOADED
+        self.last_error: Optional[str] = None
+        self.last_used: Optional[float] = None
+        self.active = 0                     # 正在使用该产线的请求数
+        self.load_count = 0
+        self.unload_count = 0
+        self.load_time: Optional[float] = None
+        self.resident_memory: Optional[int] = None      # 加载前后进程RSS差值
+        self.resident_gpu_memory: Optional[int] = None  # 加载前后GPU已分配显存差值
+        self.events: deque = deque(maxlen=20)
+
+        self._lock = asyncio.Lock()
+        # 进行中的加载任务（调用方被取消时加载继续进行，后续请求等待同一任务）
+        self._loading: Optional[asyncio.Future] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.service is not None
+
+    async def load(self):
+        """
+        加载模型；并发调用只会触发一次加载
+
+        加载在独立任务中执行并以shield等待：触发加载的请求被取消（如客户端断开）时
+        加载线程仍在构造模型，后续请求等待同一任务而不会再加载一份。
+
+        Raises:
+            PipelineLoadError: 加载失败
+        """
+        if self.service is not None:
+            return
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+            self._loading.add_done_callback(self._load_done)
+        await asyncio.shield(self._loading)
+
+    def _load_done(self, future: asyncio.Future):
+        self._loading = None
+        if not future.cancelled():
+            # 所有等待方都已取消时取走异常，避免未取回异常的告警
+            future.exception()
+
+    async def _load(self):
+        async with self._lock:
+            if self.service is not None:
+                return
+
+            self.state = PIPELINE_LOADING
+            logger.info(f"正在加载 {self.name} 产线...")
+            rss_before, gpu_before = _memory_snapshot()
+            start_time = time.time()
+            try:
+                service = await asyncio.to_thread(self.factory)
+                batcher = self.batcher_factory(service) if self.batcher_factory else None
+            except Exception as e:
+                self.state = PIPELINE_FAILED
+                self.last_error = str(e)
+                self._record_event("load_failed", time.time() - start_time, error=str(e))
+                logger.error(f"✗ {self.name} 产线加载失败: {str(e)}", exc_info=True)
+                raise PipelineLoadError(f"{self.name}模型加载失败: {str(e)}") from e
+
+            if batcher is not None:
+                batcher.start()
+            rss_after, gpu_after = _memory_snapshot()
+
+            self.service = service
+            self.batcher = batcher
+            self.options = getattr(service, "options", {})
+            self.state = PIPELINE_READY
+            self.last_error = None
+            self.last_used = time.time()
+            self.load_count += 1
+            self.load_time = time.time() - start_time
+            self.resident_memory = rss_after - rss_before if rss_before is not None else None
+            self.resident_gpu_memory = gpu_after - gpu_before if gpu_before is not None else None
+            self._record_event("load", self.load_time)
+            logger.info(f"✓ {self.name} 产线就绪 ({self.load_time:.1f}s)")
+
+    async def unload(self, reason: str = "manual", force: bool = True):
+        """
+        卸载模型并释放内存
+
+        Args:
+            reason: 卸载原因（记录在事件中）
+            force: 为False时若仍有请求在使用则放弃卸载
+        """
+        async with self._lock:
+            if self.service is None or (not force and self.active > 0):
+                return
+            # 先摘除实例再释放资源：之后到达的请求会等待锁并重新加载
+            service, batcher = self.service, self.batcher
+            self.service = None
+            self.batcher = None
+            self.state = PIPELINE_UNLOADED
+
+            start_time = time.time()
+            if batcher is not None:
+                await batcher.stop()
+            close = getattr(service, "close", None)
+            if close is not None:
+                close()
+            del service, batcher
+            self.unload_count += 1
+            self.resident_memory = None
+            self.resident_gpu_memory = None
+
+            await asyncio.to_thread(gc.collect)
+            _release_gpu_cache()
+            self._record_event("unload", time.time() - start_time, reason=reason)
+            logger.info(f"{self.name} 产线已卸载 ({reason})")
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        在使用期间持有产线（期间不会被空闲卸载）
+
+        Yields:
+            Service实例
+        """
+        self.active += 1
+        try:
+            await self.load()
+            yield self.service
+        finally:
+            self.active -= 1
+            self.last_used = time.time()
+
+    async def cache_options(self) -> dict:
+        """返回参与缓存键的构造参数，从未加载过时先加载"""
+        if self.options is None:
+            await self.load()
+        return self.options
+
+    def idle_seconds(self) -> Optional[float]:
+        if self.last_used is None:
+            return None
+        return time.time() - self.last_used
+
+    def should_unload(self) -> bool:
+        """是否已空闲超时"""
+        if self.idle_timeout <= 0 or self.service is None or self.active > 0:
+            return False
+        idle = self.idle_seconds()
+        return idle is not None and idle >= self.idle_timeout
+
+    def status(self) -> dict:
+        """生命周期状态（用于/health）"""
+        idle = self.idle_seconds()
+        return {
+            "state": self.state,
+            "active_requests": self.active,
+            "idle_seconds": round(idle, 1) if idle is not None else None,
+            "idle_unload_seconds": self.idle_timeout,
+            "load_count": self.load_count,
+            "unload_count": self.unload_count,
+            "last_load_time": self.load_time,
+            "resident_memory_mb": self._to_mb(self.resident_memory),
+            "resident_gpu_memory_mb": self._to_mb(self.resident_gpu_memory),
+            "last_error": self.last_error,
+            "events": list(self.events),
+        }
+
+    def _record_event(self, event: str, duration: float, **extra):
+        self.events.append({
+            "event": event,
+            "time": datetime.now().isoformat(),
+            "duration": round(duration, 3),
+            **extra,
+        })
+
+    @staticmethod
+    def _to_mb(value: Optional[int]) -> Optional[float]:
+        return round(value / 1024 / 1024, 1) if value is not None else None
+
+
+class PipelineManager:
+    """管理全部产线的加载、卸载与空闲回收"""
+
+    def __init__(self, pipelines: list[ManagedPipeline], check_interval: float = 30.0):
+        """
+        Args:
+            pipelines: 受管产线
+            check_interval: 空闲检查间隔(秒)
+        """
+        self.pipelines = {pipeline.name: pipeline for pipeline in pipelines}
+        self.check_interval = check_interval
+        self._reaper: Optional[asyncio.Task] = None
+
+    def get(self, name: str) -> Optional[ManagedPipeline]:
+        return self.pipelines.get(name)
+
+    async def preload(self, names: list[str]):
+        """启动时加载白名单中的产线"""
+        for name in names:
+            pipeline = self.pipelines.get(name)
+            if pipeline is None:
+                logger.warning(f"预加载列表中的产线不存在: {name}")
+                continue
+            await pipeline.load()
+
+    def start(self):
+        """启动空闲回收任务（需在事件循环内调用）"""
+        if self._reaper is None and any(p.idle_timeout > 0 for p in self.pipelines.values()):
+            self._reaper = asyncio.create_task(self._reap_idle(), name="pipeline-reaper")
+
+    async def stop(self):
+        """停止回收任务并卸载全部产线"""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            try:
+                await self._reaper
+            except asyncio.CancelledError:
+                pass
+            self._reaper = None
+        for pipeline in self.pipelines.values():
+            await pipeline.unload(reason="shutdown")
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            for pipeline in self.pipelines.values():
+                if pipeline.should_unload():
+                    try:
+                        await pipeline.unload(reason="idle", force=False)
+                    except Exception as e:
+                        logger.error(f"{pipeline.name} 产线卸载失败: {str(e)}")
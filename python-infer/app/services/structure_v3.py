@@ -4,8 +4,11 @@ PP-StructureV3服务层
 """
 import time
 from paddleocr import PPStructureV3
-from typing import Literal
+from typing import Callable, Iterator, Literal, Optional, Union
 import logging
+import numpy as np
+
+from core.cache import lookup_pages, store_page
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +47,16 @@ class StructureV3Service:
             None
         """
         logger.info("初始化StructureV3模型...")
+        # 构造参数（参与结果缓存键）
+        self.options = {
+            "device": device,
+            "use_doc_orientation_classify": use_doc_orientation_classify,
+            "use_doc_unwarping": use_doc_unwarping,
+            "use_textline_orientation": use_textline_orientation,
+            "use_table_recognition": use_table_recognition,
+            "use_formula_recognition": use_formula_recognition,
+            "use_region_detection": use_region_detection,
+        }
         self.model = PPStructureV3(
             device=device,
             use_doc_orientation_classify=use_doc_orientation_classify,
@@ -57,35 +70,50 @@ class StructureV3Service:
 
     def predict(
         self,
-        input: str,
-        output_format: Literal["json", "markdown"] = "json"
+        input: Union[str, np.ndarray, list],
+        output_format: Literal["json", "markdown"] = "json",
+        progress_callback: Optional[Callable[[int], None]] = None
     ) -> dict:
         """
-        执行文档结构识别推理
+        执行文档结构识别推理（多页PDF逐页格式化后合并）
+
+        多页数组输入只推理逐页结果存储中没有的页，其余页直接拼接。
 
         Args:
-            input: 图片或PDF文件路径
+            input: 图片或PDF文件路径，或内存中的BGR数组/逐页数组列表
             output_format: 输出格式 ("json" 或 "markdown")
+            progress_callback: 每页完成后以已完成页数回调
 
         Returns:
-            包含识别结果和推理时间的字典
+            包含识别结果、推理时间与复用/重新推理页数的字典
         """
-        start_time = time.time()
-
         try:
-            # 执行Structure推理
-            result = self.model.predict(input=input)
-            inference_time = time.time() - start_time
-
-            # 根据输出格式处理结果
+            pages = []
+            pages_reused = 0
+            inference_time = 0.0
+            format_time = 0.0
+            for page in self.predict_stream(input, output_format=output_format):
+                pages.append(page["result"])
+                pages_reused += page["reused"]
+                inference_time += page["inference_time"]
+                format_time += page["format_time"]
+                if progress_callback:
+                    progress_callback(len(pages))
+
+            # 根据输出格式合并各页结果
+            format_start = time.time()
             if output_format == "markdown":
-                formatted_result = self._get_markdown_result(result)
+                formatted_result = self._merge_markdown_pages(pages)
             else:
-                formatted_result = self._format_json_result(result)
+                formatted_result = self._merge_json_pages(pages)
+            format_time += time.time() - format_start
 
             return {
                 "result": formatted_result,
                 "inference_time": inference_time,
+                "format_time": format_time,
+                "pages_reused": pages_reused,
+                "pages_recomputed": len(pages) - pages_reused,
                 "source": "local"
             }
 
@@ -93,17 +121,135 @@ class StructureV3Service:
             logger.error(f"StructureV3推理失败: {str(e)}")
             raise
 
+    def predict_stream(
+        self,
+        input: Union[str, np.ndarray, list],
+        output_format: Literal["json", "markdown"] = "json"
+    ) -> Iterator[dict]:
+        """
+        逐页执行文档结构识别，每页完成后立即产出
+
+        原始结果在格式化后即被释放，长PDF的峰值内存只与单页相关。
+        逐页数组输入先按页面像素哈希查询逐页结果存储，命中的页不再推理。
+
+        Args:
+            input: 图片或PDF文件路径，或内存中的BGR数组/逐页数组列表
+            output_format: 输出格式 ("json" 或 "markdown")
+
+        Yields:
+            {"page": 页码, "result": 单页格式化结果, "inference_time": 单页推理耗时,
+             "format_time": 单页格式化耗时, "reused": 是否复用已存储的结果, "source": "local"}
+        """
+        keys, stored = None, None
+        if isinstance(input, list):
+            keys, stored = lookup_pages(input, "structure", output_format, self.options)
+            input = [page for page, result in zip(input, stored) if result is None]
+        page_iter = self.model.predict_iter(input=input) if stored is None or input else iter(())
+        page_index = 0
+
+        while True:
+            if stored is not None:
+                if page_index >= len(stored):
+                    return
+                if stored[page_index] is not None:
+                    yield {
+                        "page": page_index,
+                        "result": stored[page_index],
+                        "inference_time": 0.0,
+                        "format_time": 0.0,
+                        "reused": True,
+                        "source": "local"
+                    }
+                    page_index += 1
+                    continue
+
+            start_time = time.time()
+            try:
+                res = next(page_iter)
+            except StopIteration:
+                return
+            inference_time = time.time() - start_time
+
+            format_start = time.time()
+            if output_format == "markdown":
+                formatted_result = self._get_markdown_result(res)
+            else:
+                formatted_result = self._format_json_result(res)
+            format_time = time.time() - format_start
+            del res
+            if keys is not None:
+                store_page(keys[page_index], formatted_result)
+
+            yield {
+                "page": page_index,
+                "result": formatted_result,
+                "inference_time": inference_time,
+                "format_time": format_time,
+                "reused": False,
+                "source": "local"
+            }
+            page_index += 1
+
+    def _merge_json_pages(self, pages: list[dict]) -> dict:
+        """
+        合并多页JSON结果，多页时为每个元素标注页码
+
+        Args:
+            pages: 逐页的_format_json_result结果
+
+        Returns:
+            合并后的结果字典（单页时与单页结果一致，仅增加pages字段）
+        """
+        if len(pages) == 1:
+            return {**pages[0], "pages": 1}
+
+        merged = {"layout": [], "tables": [], "formulas": [], "parsing_res": []}
+        for page_index, page in enumerate(pages):
+            for key in merged:
+                for item in page.get(key, []):
+                    if isinstance(item, dict):
+                        item["page"] = page_index
+                    merged[key].append(item)
+
+        merged["pages"] = len(pages)
+        merged["format"] = "json"
+        return merged
+
+    def _merge_markdown_pages(self, pages: list[dict]) -> dict:
+        """
+        合并多页Markdown结果，多页时添加页面分隔符
+
+        Args:
+            pages: 逐页的_get_markdown_result结果
+
+        Returns:
+            合并后的markdown结果字典
+        """
+        if len(pages) == 1:
+            return {**pages[0], "pages": 1}
+
+        markdown_texts = []
+        for page_index, page in enumerate(pages):
+            if page.get("markdown"):
+                markdown_texts.append(f"\n---\n## 第 {page_index + 1} 页\n\n" + page["markdown"])
+
+        return {
+            "markdown": "\n".join(markdown_texts),
+            "pages": len(pages),
+            "format": "markdown"
+        }
+
     def _get_markdown_result(self, raw_result) -> dict:
         """
-        获取Markdown格式结果
+        获取单页Markdown格式结果
 
         Args:
-            raw_result: PPStructureV3返回的原始结果
+            raw_result: PPStructureV3返回的单页结果
 
         Returns:
             包含markdown内容的字典
         """
-        # 结果是列表，取第一个
+        # 兼容传入结果列表的旧调用方式
         if isinstance(raw_result, list) and len(raw_result) > 0:
             res = raw_result[0]
         else:
@@ -151,15 +297,15 @@ class StructureV3Service:
 
     def _format_json_result(self, raw_result) -> dict:
         """
-        格式化JSON结果
+        格式化单页JSON结果
 
         Args:
-            raw_result: PPStructureV3返回的原始结果
+            raw_result: PPStructureV3返回的单页结果
 
         Returns:
             格式化后的结果字典
         """
-        # 结果是列表，取第一个
+        # 兼容传入结果列表的旧调用方式
         if isinstance(raw_result, list) and len(raw_result) > 0:
             res = raw_result[0]
         else:
@@ -0,0 +1,84 @@
+"""
+VL产线路由
+vLLM探测与熔断器判定VL是否可用，经熔断器执行VL推理；同步端点与异步任务共用
+"""
+import math
+from typing import Optional
+
+from fastapi import HTTPException
+
+from core.circuit_breaker import get_breaker, is_backend_failure
+from core.config import settings
+from core.executor import get_executor
+from services.pipeline_manager import ManagedPipeline, PipelineLoadError
+from services.vllm_prober import get_vllm_prober
+
+
+def vl_unavailable_reason() -> Optional[tuple[str, float]]:
+    """
+    VL产线当前是否不可用（vLLM探测判定不可用或熔断中）
+
+    Returns:
+        不可用时返回(原因, 建议重试秒数)，否则返回None
+    """
+    prober = get_vllm_prober()
+    if settings.VL_FAIL_FAST and prober and not prober.available:
+        return f"vLLM推理端点不可用: {prober.last_error or 'unknown'}", prober.interval
+    breaker = get_breaker("vl")
+    if breaker and not breaker.available:
+        return f"VL产线已熔断: {breaker.open_reason}", breaker.retry_after()
+    return None
+
+
+class PipelineUnavailable(HTTPException):
+    """产线暂不可用（vLLM不可用或熔断），调用方可改用降级产线"""
+
+
+def vl_unavailable_error(reason: str, retry_after: float) -> PipelineUnavailable:
+    """VL不可用时立即返回503，不等待推理超时"""
+    return PipelineUnavailable(
+        status_code=503,
+        detail=reason,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+async def predict_vl(pipeline: ManagedPipeline, data, format: str, **kwargs) -> tuple:
+    """
+    经熔断器执行VL推理：后端连接失败、超时与5xx计为失败，推理耗时超过阈值计为慢调用
+
+    kwargs原样传给VLService.predict（如异步任务的progress_callback）。
+
+    Returns:
+        (预测结果, queue_time)
+    """
+    breaker = get_breaker("vl")
+    if breaker and not breaker.allow():
+        raise vl_unavailable_error(f"VL产线已熔断: {breaker.open_reason}", breaker.retry_after())
+    try:
+        async with pipeline.lease() as service:
+            executor = get_executor("vl")
+            if executor is None:
+                raise HTTPException(status_code=503, detail="vl执行器未初始化")
+            prediction, queue_time = await executor.run(service.predict, data, format=format, **kwargs)
+    except PipelineLoadError as e:
+        # 模型加载失败不是vLLM后端的调用失败，不计入熔断统计
+        if breaker:
+            breaker.release()
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        if breaker:
+            if is_backend_failure(e):
+                breaker.record_failure()
+            else:
+                # 输入/解码等非后端错误不计入统计
+                breaker.release()
+        raise
+    except BaseException:
+        # 客户端断开等取消不计入熔断统计
+        if breaker:
+            breaker.release()
+        raise
+    if breaker:
+        breaker.record_success(prediction["inference_time"])
+    return prediction, queue_time
@@ -3,11 +3,17 @@ PaddleOCR-VL服务层
 宿主机实例化VL对象，依赖Docker vLLM推理端点
 """
 import time
-from typing import Literal
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Literal, Optional, Union
 from paddleocr import PaddleOCRVL
+from core.cache import lookup_pages, store_page
 from core.config import Settings
+from core.imaging import rasterize_pdf, is_pdf
+from services.vllm_prober import get_vllm_prober
 import logging
-import requests
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +25,8 @@ class VLService:
             self,
             vl_rec_backend: str = "vllm-server",
             vl_rec_server_url: str = "http://localhost:8118/v1",
+            concurrent_pages: bool = True,
+            max_concurrency: int = 4,
             ):
         """
         初始化VL模型
@@ -26,9 +34,20 @@ class VLService:
         Args:
             vl_rec_backend: 推理后端类型
             vl_rec_server_url: Docker vLLM推理端点URL
+            concurrent_pages: 多页PDF是否按页并发推理
+            max_concurrency: 并发推理的最大页数（同时在途的vLLM识别请求上限），
+                并发分页时加载时即创建同样数量的分页VL对象
         """
         logger.info(f"初始化VL模型，vLLM端点: {vl_rec_server_url}")
+        self.vl_rec_backend = vl_rec_backend
         self.vl_rec_server_url = vl_rec_server_url
+        self.concurrent_pages = concurrent_pages
+        self.max_concurrency = max_concurrency
+        # 构造参数（参与结果缓存键）
+        self.options = {
+            "vl_rec_backend": vl_rec_backend,
+            "vl_rec_server_url": vl_rec_server_url,
+        }
 
         try:
             # 关键：宿主机实例化VL对象，指向Docker vLLM端点
@@ -41,20 +60,42 @@ class VLService:
             logger.error(f"VL模型初始化失败: {str(e)}")
             self.vl_ocr = None
             raise
+        # 主VL对象的版面检测模型非线程安全：VL执行器有多个线程时，直接使用主对象的调用串行执行
+        self._vl_lock = threading.Lock()
+
+        # 并发分页推理线程池：每页借用一个独立的VL对象（版面检测模型非线程安全），
+        # 识别请求由各线程并发发往vLLM。分页VL对象在加载时创建，计入产线加载内存，卸载时随服务释放
+        self._page_pool: Optional[ThreadPoolExecutor] = None
+        self._page_models: list = []
+        self._free_page_models: queue.SimpleQueue = queue.SimpleQueue()
+        if concurrent_pages and max_concurrency > 1:
+            self._page_models = [
+                PaddleOCRVL(vl_rec_backend=vl_rec_backend, vl_rec_server_url=vl_rec_server_url)
+                for _ in range(max_concurrency)
+            ]
+            for model in self._page_models:
+                self._free_page_models.put(model)
+            self._page_pool = ThreadPoolExecutor(
+                max_workers=max_concurrency,
+                thread_name_prefix="vl-page"
+            )
+            logger.info(f"VL分页推理对象已创建: {max_concurrency}")
 
     def predict(
         self,
-        image_path: str,
-        format: Literal["json", "markdown"] = "json") -> dict:
+        image_path: Union[str, np.ndarray, list],
+        format: Literal["json", "markdown"] = "json",
+        progress_callback: Optional[Callable[[int], None]] = None) -> dict:
         """
         执行VL推理
 
         Args:
-            image_path: 图片或PDF文件路径
+            image_path: 图片或PDF文件路径，或内存中的BGR数组/逐页数组列表
             format: 返回格式，支持json或markdown
+            progress_callback: 页完成时以已完成页数回调（并发分页时逐页回调）
 
         Returns:
-            包含识别结果和推理时间的字典
+            包含识别结果、推理时间与复用/重新推理页数的字典
         """
         if self.vl_ocr is None:
             raise RuntimeError("VL模型未初始化")
@@ -62,11 +103,22 @@ class VLService:
         start_time = time.time()
 
         try:
-            # 调用VL对象推理（内部会调用vLLM端点）
-            result = self.vl_ocr.predict(image_path)
+            if isinstance(image_path, list):
+                # 逐页数组输入：只推理逐页结果存储中没有的页
+                return self._predict_page_list(image_path, format, progress_callback)
+
+            if self._page_pool is not None and isinstance(image_path, str) and is_pdf(image_path):
+                # 多页PDF：按页并发推理
+                result = self._predict_pages_concurrent(image_path, progress_callback)
+            else:
+                # 调用VL对象推理（内部会调用vLLM端点）
+                result = self._predict_shared(image_path)
+                if progress_callback:
+                    progress_callback(len(result))
             inference_time = time.time() - start_time
 
             # 格式化结果
+            format_start = time.time()
             if format == "markdown":
                 formatted_result = self._format_markdown_result(result)
             else:
@@ -76,6 +128,9 @@ class VLService:
             return {
                 "result": formatted_result,
                 "inference_time": inference_time,
+                "format_time": time.time() - format_start,
+                "pages_reused": 0,
+                "pages_recomputed": formatted_result["pages"],
                 "source": "docker"  # 实际推理在Docker vLLM
             }
 
@@ -83,6 +138,121 @@ class VLService:
             logger.error(f"VL推理失败: {str(e)}")
             raise
 
+    def _predict_page_list(
+        self,
+        pages: list,
+        format: Literal["json", "markdown"],
+        progress_callback: Optional[Callable[[int], None]] = None
+    ) -> dict:
+        """
+        逐页数组输入的推理：按页面像素哈希查询逐页结果存储，只推理新增或变化的页，
+        逐页格式化后按页序拼接
+
+        Args:
+            pages: 逐页BGR数组列表
+            format: 返回格式，支持json或markdown
+            progress_callback: 页完成时以已完成页数（含复用的页）回调
+
+        Returns:
+            与predict一致的结果字典
+        """
+        keys, stored = lookup_pages(pages, "vl", format, self.options)
+        missing = [index for index, result in enumerate(stored) if result is None]
+        reused = len(pages) - len(missing)
+
+        def on_progress(done: int):
+            if progress_callback:
+                progress_callback(reused + done)
+
+        start_time = time.time()
+        raw_result = []
+        if missing:
+            missing_pages = [pages[index] for index in missing]
+            if self._page_pool is not None and len(missing_pages) > 1:
+                raw_result = self._predict_pages_concurrent(missing_pages, on_progress)
+            else:
+                raw_result = [dict(page, page_index=i) for i, page in enumerate(self._predict_shared(missing_pages))]
+                on_progress(len(missing_pages))
+        else:
+            on_progress(0)
+        inference_time = time.time() - start_time
+
+        format_start = time.time()
+        # 推理结果的page_index是在待推理页中的序号，换算回输入页序
+        page_raw = {index: [] for index in missing}
+        for page_result in raw_result:
+            index = missing[page_result["page_index"]]
+            page_raw[index].append(dict(page_result, page_index=index))
+
+        formatted_pages = list(stored)
+        for index, page_result in page_raw.items():
+            if format == "markdown":
+                formatted = self._format_markdown_result(page_result)
+            else:
+                formatted = self._format_json_result(page_result)
+            store_page(keys[index], formatted)
+            formatted_pages[index] = formatted
+
+        if format == "markdown":
+            formatted_result = self._merge_markdown_pages(formatted_pages)
+        else:
+            formatted_result = self._merge_json_pages(formatted_pages)
+
+        return {
+            "result": formatted_result,
+            "inference_time": inference_time,
+            "format_time": time.time() - format_start,
+            "pages_reused": reused,
+            "pages_recomputed": len(missing),
+            "source": "docker"
+        }
+
+    def _predict_pages_concurrent(
+        self,
+        source: Union[str, list],
+        progress_callback: Optional[Callable[[int], None]] = None
+    ) -> list:
+        """
+        将PDF栅格化后按页并发推理，结果按页序重组
+
+        Args:
+            source: PDF文件路径，或已栅格化的逐页数组列表
+            progress_callback: 按页序每完成一页回调一次
+
+        Returns:
+            与PaddleOCRVL.predict一致的逐页结果列表（已补充page_index）
+        """
+        pages = source if isinstance(source, list) else rasterize_pdf(source)
+        if len(pages) <= 1:
+            return self._predict_shared(pages[0] if pages else source)
+
+        futures = [
+            self._page_pool.submit(self._predict_page, page)
+            for page in pages
+        ]
+        results = []
+        for page_index, future in enumerate(futures):
+            for page_result in future.result():
+                results.append(dict(page_result, page_index=page_index))
+            if progress_callback:
+                progress_callback(page_index + 1)
+        return results
+
+    def _predict_shared(self, input) -> list:
+        """用主VL对象推理（多个执行器线程互斥使用，分页推理另用各自借用的VL对象）"""
+        with self._vl_lock:
+            return self.vl_ocr.predict(input)
+
+    def _predict_page(self, page) -> list:
+        """在页线程中推理单页（借用一个空闲的分页VL对象，线程数与对象数相同，不会等待）"""
+        # 持有队列引用：卸载后归还到旧队列，对象随之回收
+        free_models = self._free_page_models
+        vl_ocr = free_models.get()
+        try:
+            return vl_ocr.predict(page)
+        finally:
+            free_models.put(vl_ocr)
+
     def _format_json_result(self, raw_result: list) -> dict:
         """
         格式化VL原始结果为JSON格式
@@ -234,24 +404,70 @@ class VLService:
             "pages": len(raw_result)
         }
 
+    def _merge_json_pages(self, pages: list[dict]) -> dict:
+        """
+        合并逐页JSON结果
+
+        复用的页可能来自其他文档的不同位置，页码按本次输入的页序重新标注。
+        """
+        layout_elements = []
+        element_counts = {}
+        full_text = []
+        for page_index, page in enumerate(pages):
+            for element in page["layout"]:
+                element["page"] = page_index
+                layout_elements.append(element)
+            for label, count in page["elements_count"].items():
+                element_counts[label] = element_counts.get(label, 0) + count
+            if page["text"]:
+                full_text.append(page["text"])
+
+        return {
+            "text": "\n".join(full_text),
+            "layout": layout_elements,
+            "elements_count": element_counts,
+            "pages": len(pages)
+        }
+
+    def _merge_markdown_pages(self, pages: list[dict]) -> dict:
+        """合并逐页Markdown结果，多页时按本次输入的页序添加页面分隔符"""
+        element_counts = {}
+        for page in pages:
+            for label, count in page["elements_count"].items():
+                element_counts[label] = element_counts.get(label, 0) + count
+
+        if len(pages) == 1:
+            markdown = pages[0]["markdown"]
+        else:
+            markdown = "\n".join(
+                f"\n---\n## 第 {page_index + 1} 页\n\n" + page["markdown"]
+                for page_index, page in enumerate(pages)
+                if page["markdown"]
+            )
+
+        return {
+            "markdown": markdown,
+            "elements_count": element_counts,
+            "pages": len(pages)
+        }
+
+    def close(self):
+        """释放分页推理线程池与分页VL对象（产线卸载时调用，在途的页推理结束后对象即可回收）"""
+        if self._page_pool is not None:
+            self._page_pool.shutdown(wait=False, cancel_futures=True)
+            self._page_pool = None
+        self._page_models = []
+        self._free_page_models = queue.SimpleQueue()
+
     def health_check(self) -> dict:
-        """健康检查"""
-        vllm_status = self._check_vllm_endpoint()
+        """健康检查（vLLM状态读取后台探测结果，不发起网络请求）"""
+        prober = get_vllm_prober()
+        vllm_status = prober.healthy if prober else None
 
         return {
-            "status": "ready" if self.vl_ocr and vllm_status else "unavailable",
+            "status": "ready" if self.vl_ocr and vllm_status is not False else "unavailable",
             "model_loaded": self.vl_ocr is not None,
+            "page_models": len(self._page_models),
             "vllm_endpoint": self.vl_rec_server_url,
             "vllm_health": vllm_status
         }
-
-    def _check_vllm_endpoint(self) -> bool:
-        """检查vLLM端点是否可用"""
-        try:
-            # 移除 /v1 后缀，健康检查端点不需要
-            base_url = self.vl_rec_server_url.rstrip('/v1')
-            response = requests.get(f"{base_url}/health", timeout=5)
-            return response.status_code == 200
-        except Exception as e:
-            logger.warning(f"vLLM端点检查失败: {str(e)}")
-            return False
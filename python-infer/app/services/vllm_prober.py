@@ -0,0 +1,208 @@
+"""
+vLLM端点健康探测
+后台协程按固定间隔通过复用连接的异步HTTP客户端探测vLLM，/health与VL端点直接读取缓存状态
+"""
+import asyncio
+import time
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+import httpx
+
+from core.config import settings
+from prometheus_client import Gauge, Histogram
+
+from core.metrics import REGISTRY, LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+VLLM_UP = Gauge(
+    "ocr_vllm_up", "vLLM端点最近一次探测是否可用(1/0)", registry=REGISTRY
+)
+VLLM_PROBE_DURATION = Histogram(
+    "ocr_vllm_probe_duration_seconds", "vLLM健康探测耗时", ("outcome",),
+    buckets=LATENCY_BUCKETS, registry=REGISTRY
+)
+
+
+def vllm_base_url(url: str) -> str:
+    """去掉末尾的/v1后缀得到vLLM服务根地址（/health不在/v1下）"""
+    return url.rstrip("/").removesuffix("/v1")
+
+
+class VLLMProber:
+    """vLLM端点后台探测器"""
+
+    def __init__(
+        self,
+        endpoint: str,
+        interval: float = 5.0,
+        timeout: float = 2.0,
+        failure_threshold: int = 2,
+        history_size: int = 60,
+    ):
+        """
+        Args:
+            endpoint: vLLM服务地址（可带/v1后缀）
+            interval: 探测间隔(秒)
+            timeout: 单次探测超时(秒)
+            failure_threshold: 连续失败多少次后判定为不可用
+            history_size: 保留的探测记录条数
+        """
+        self.base_url = vllm_base_url(endpoint)
+        self.interval = interval
+        self.timeout = timeout
+        self.failure_threshold = max(1, failure_threshold)
+
+        # None表示尚未完成首次探测
+        self.healthy: Optional[bool] = None
+        self.consecutive_failures = 0
+        self.last_probe: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.history: deque = deque(maxlen=history_size)
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def health_url(self) -> str:
+        return f"{self.base_url}/health"
+
+    @property
+    def available(self) -> bool:
+        """是否可以向vLLM发送请求（首次探测完成前视为可用）"""
+        return self.healthy is not False
+
+    def start(self):
+        """启动探测协程（需在事件循环内调用）"""
+        if self._task is None:
+            # 单连接长连接复用，探测不重复建连
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=1, max_keepalive_connections=1),
+            )
+            self._task = asyncio.create_task(self._run(), name="vllm-prober")
+            logger.info(f"vLLM探测已启动: {self.health_url} (间隔{self.interval}s)")
+
+    async def stop(self):
+        """停止探测并关闭连接"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def probe(self) -> bool:
+        """执行一次探测并更新状态"""
+        start_time = time.time()
+        status_code = None
+        error = None
+        try:
+            response = await self._client.get(self.health_url)
+            status_code = response.status_code
+            ok = status_code == 200
+            if not ok:
+                error = f"HTTP {status_code}"
+        except httpx.HTTPError as e:
+            ok = False
+            error = f"{type(e).__name__}: {str(e)}" if str(e) else type(e).__name__
+        latency = time.time() - start_time
+        self._record(ok, latency, status_code, error)
+        return ok
+
+    def _record(self, ok: bool, latency: float, status_code: Optional[int], error: Optional[str]):
+        now = time.time()
+        self.last_probe = now
+        self.history.append({
+            "time": datetime.fromtimestamp(now).isoformat(),
+            "ok": ok,
+            "latency": round(latency, 4),
+            "status_code": status_code,
+            "error": error,
+        })
+        VLLM_PROBE_DURATION.labels(outcome="success" if ok else "failure").observe(latency)
+
+        if ok:
+            if self.healthy is False:
+                logger.info(f"vLLM端点已恢复: {self.health_url}")
+            self.healthy = True
+            self.consecutive_failures = 0
+            self.last_success = now
+            self.last_error = None
+        else:
+            self.consecutive_failures += 1
+            self.last_error = error
+            if self.consecutive_failures >= self.failure_threshold or self.healthy is None:
+                if self.healthy is not False:
+                    logger.warning(f"vLLM端点不可用: {self.health_url} ({error})")
+                self.healthy = False
+        VLLM_UP.set(1 if self.healthy else 0)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe()
+            except Exception as e:
+                logger.error(f"vLLM探测异常: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> dict:
+        """探测状态与延迟历史（用于/health）"""
+        latencies = sorted(entry["latency"] for entry in self.history if entry["ok"])
+        return {
+            "endpoint": self.base_url,
+            "healthy": self.healthy,
+            "consecutive_failures": self.consecutive_failures,
+            "last_probe": datetime.fromtimestamp(self.last_probe).isoformat() if self.last_probe else None,
+            "last_success": datetime.fromtimestamp(self.last_success).isoformat() if self.last_success else None,
+            "last_error": self.last_error,
+            "probe_interval": self.interval,
+            "latency": {
+                "last": self.history[-1]["latency"] if self.history else None,
+                "avg": round(sum(latencies) / len(latencies), 4) if latencies else None,
+                "p50": latencies[len(latencies) // 2] if latencies else None,
+                "max": latencies[-1] if latencies else None,
+            },
+            "history": list(self.history),
+        }
+
+
+# 全局探测器实例（在main.py中初始化）
+vllm_prober: Optional[VLLMProber] = None
+
+
+def init_vllm_prober():
+    """按配置创建并启动vLLM探测器（需在事件循环内调用）"""
+    global vllm_prober
+    if not settings.VLLM_PROBE_ENABLED:
+        logger.info("vLLM后台探测未启用")
+        return
+    vllm_prober = VLLMProber(
+        settings.VLLM_ENDPOINT,
+        interval=settings.VLLM_PROBE_INTERVAL_SECONDS,
+        timeout=settings.VLLM_PROBE_TIMEOUT_SECONDS,
+        failure_threshold=settings.VLLM_PROBE_FAILURE_THRESHOLD,
+        history_size=settings.VLLM_PROBE_HISTORY,
+    )
+    vllm_prober.start()
+
+
+async def shutdown_vllm_prober():
+    """停止vLLM探测器"""
+    global vllm_prober
+    if vllm_prober is not None:
+        await vllm_prober.stop()
+        vllm_prober = None
+
+
+def get_vllm_prober() -> Optional[VLLMProber]:
+    """获取vLLM探测器，未启用时返回None"""
+    return vllm_prober
@@ -0,0 +1,148 @@
+"""
+响应编码基准
+在 python-infer/res/ 的样例文件上对比 JSON / MessagePack / CBOR 的编码耗时与体积
+
+结果来源：
+- 默认在本机加载各产线模型对样例文件推理（与 test/ 下的脚本一样需要GPU环境，VL还需要vLLM服务）
+- --cache-dir 指定结果缓存磁盘目录（CACHE_DIR）时，直接使用其中记录的推理结果
+
+用法:
+    python bench_encodings.py [--pipelines ocrv5,structure,vl] [--repeat 20] [--device gpu:0]
+    python bench_encodings.py --cache-dir ../app/cache
+"""
+import argparse
+import glob
+import gzip
+import os
+import pickle
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "app"))
+
+from core.models import OCRResponse, MetricsModel  # noqa: E402
+from core.serialization import encode, to_payload, ENCODERS, JSON_MEDIA_TYPE  # noqa: E402
+
+DEFAULT_RES_DIR = os.path.join(BENCH_DIR, "..", "res")
+SAMPLE_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".pdf")
+
+
+def find_samples(res_dir: str) -> list[str]:
+    """收集样例图片与PDF"""
+    samples = []
+    for root, _, files in os.walk(res_dir):
+        for name in sorted(files):
+            if name.lower().endswith(SAMPLE_EXTS):
+                samples.append(os.path.join(root, name))
+    return samples
+
+
+def run_pipelines(samples: list[str], pipelines: list[str], device: str, vl_server_url: str) -> list[tuple]:
+    """
+    加载模型并对样例推理
+
+    Returns:
+        [(样本名, 产线, 识别结果)]；OCRv5同时给出rows与columnar两种布局
+    """
+    results = []
+    if "ocrv5" in pipelines:
+        from services.ocr_v5 import OCRv5Service
+        service = OCRv5Service(device=device)
+        for path in samples:
+            if path.lower().endswith(".pdf"):
+                continue
+            name = os.path.basename(path)
+            results.append((name, "ocrv5", service.predict(path)["result"]))
+            results.append((name, "ocrv5-columnar", service.predict(path, layout="columnar")["result"]))
+    if "structure" in pipelines:
+        from services.structure_v3 import StructureV3Service
+        service = StructureV3Service(device=device)
+        for path in samples:
+            results.append((os.path.basename(path), "structure", service.predict(path)["result"]))
+    if "vl" in pipelines:
+        from services.vl_service import VLService
+        service = VLService(vl_rec_server_url=vl_server_url)
+        try:
+            for path in samples:
+                results.append((os.path.basename(path), "vl", service.predict(path)["result"]))
+        finally:
+            service.close()
+    return results
+
+
+def load_cached_results(cache_dir: str) -> list[tuple]:
+    """读取结果缓存磁盘层中记录的推理结果"""
+    results = []
+    for path in sorted(glob.glob(os.path.join(cache_dir, "*.pkl"))):
+        with open(path, "rb") as f:
+            prediction = pickle.load(f)
+        if isinstance(prediction, dict) and "result" in prediction:
+            results.append((os.path.basename(path), "cached", prediction["result"]))
+    return results
+
+
+def make_payload(pipeline: str, result) -> dict:
+    response = OCRResponse(
+        success=True,
+        pipeline=pipeline.split("-")[0],
+        result=result,
+        metrics=MetricsModel(
+            total_time=1.0, inference_time=0.9, image_size_kb=512.0, compressed=False, source="local"
+        ),
+    )
+    return to_payload(response)
+
+
+def bench_encode(payload: dict, media_type: str, repeat: int) -> tuple[float, bytes]:
+    body = encode(payload, media_type)  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = encode(payload, media_type)
+    return (time.perf_counter() - start) / repeat, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应编码基准（JSON/MessagePack/CBOR）")
+    parser.add_argument("--res-dir", default=DEFAULT_RES_DIR, help="样例文件目录")
+    parser.add_argument("--pipelines", default="ocrv5,structure", help="参与测试的产线，逗号分隔(ocrv5/structure/vl)")
+    parser.add_argument("--device", default="gpu:0", help="OCRv5/StructureV3推理设备")
+    parser.add_argument("--vl-server-url", default="http://localhost:8118/v1", help="VL产线的vLLM端点")
+    parser.add_argument("--cache-dir", default=None, help="使用结果缓存目录中记录的结果，不加载模型")
+    parser.add_argument("--repeat", type=int, default=20, help="每种编码重复次数")
+    args = parser.parse_args()
+
+    if args.cache_dir:
+        results = load_cached_results(args.cache_dir)
+    else:
+        samples = find_samples(args.res_dir)
+        print(f"样例文件: {[os.path.basename(p) for p in samples]}")
+        results = run_pipelines(samples, args.pipelines.split(","), args.device, args.vl_server_url)
+    if not results:
+        print("没有可用的结果")
+        sys.exit(1)
+
+    missing = [m for m in ("application/msgpack", "application/cbor") if m not in ENCODERS]
+    if missing:
+        print(f"未安装依赖，跳过: {missing}")
+
+    print(
+        f"\n{'样本':<36}{'产线':<16}{'编码':<22}{'耗时(ms)':>10}{'大小(KB)':>11}"
+        f"{'gzip(KB)':>11}{'相对JSON':>10}"
+    )
+    for name, pipeline, result in results:
+        payload = make_payload(pipeline, result)
+        json_size = None
+        for media_type in ENCODERS:
+            elapsed, body = bench_encode(payload, media_type, args.repeat)
+            if media_type == JSON_MEDIA_TYPE:
+                json_size = len(body)
+            print(
+                f"{name[:35]:<36}{pipeline:<16}{media_type:<22}{elapsed * 1000:>10.2f}"
+                f"{len(body) / 1024:>11.1f}{len(gzip.compress(body)) / 1024:>11.1f}"
+                f"{len(body) / json_size:>9.0%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
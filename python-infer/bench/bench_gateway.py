@@ -0,0 +1,471 @@
+"""
+网关负载基准
+在子进程中启动 main.py 的真实FastAPI应用，三条产线的Service替换为确定性桩服务（见 stub_services.py），
+按指定并发度压测各端点，报告吞吐与 p50/p95/p99 延迟，结果保存为JSON便于跨提交对比
+
+网关开销 = 客户端观测延迟 - Server-Timing 中的 inference 阶段耗时
+
+用法:
+    python bench_gateway.py [--endpoints text,structure,vl] [--concurrency 1,4,16] [--requests 200]
+    python bench_gateway.py --latency ocrv5=fixed:0.02 --latency vl=lognormal:-1,0.5
+    python bench_gateway.py --cache-dir ../app/cache          # 回放结果缓存中记录的真实结果
+    python bench_gateway.py --compare results/gateway-<commit>.json
+    python bench_gateway.py --compare results/gateway-<commit>.json --max-regression 0.1   # 退化超过10%时退出码为1
+    python bench_gateway.py --url http://localhost:8090        # 压测已运行的网关（不启动桩服务）
+
+多进程扩展性（OCRv5进程池，CPU忙等桩服务，关闭微批使请求分散到各工作进程）:
+    python bench_gateway.py --endpoints text --processes 0,1,2,4 --concurrency 16 \
+        --latency ocrv5=spin:0.02 --env OCRV5_BATCH_ENABLED=false
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+import types
+from datetime import datetime
+from typing import Optional
+
+import httpx
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+sys.path.insert(0, BENCH_DIR)
+
+from stub_services import (  # noqa: E402
+    DEFAULT_LATENCY, build_stub_factories, load_recorded_results, stub_ocrv5_service, synthetic_results
+)
+
+DEFAULT_SAMPLE = os.path.join(BENCH_DIR, "..", "res", "imgs", "image.png")
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+API_PREFIX = "/api/v1"
+
+# 端点: (路径, 产线, 表单字段)
+ENDPOINTS = {
+    "text": ("/text", "ocrv5", {}),
+    "structure": ("/document/structure_model", "structure", {"output_format": "json"}),
+    "vl": ("/document/vl_model", "vl", {"format": "json"}),
+}
+
+# 桩服务进程的网关配置：关闭结果缓存（否则重复上传同一样本全部命中缓存）与后台IO，预加载全部产线
+SERVER_ENV = {
+    "CACHE_ENABLED": "false",
+    "JOBS_ENABLED": "false",
+    "METRICS_EXPORT_ENABLED": "false",
+    "VLLM_PROBE_ENABLED": "false",
+    "OCRV5_PROCESSES": "0",
+    "PRELOAD_PIPELINES": '["ocrv5","structure","vl"]',
+}
+
+
+# ---------- 桩服务网关（子进程） ----------
+
+def serve(args):
+    """以桩服务启动网关（在子进程中运行）"""
+    os.environ.update(SERVER_ENV)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        os.environ[key] = value
+    sys.path.insert(0, APP_DIR)
+
+    try:
+        import paddleocr  # noqa: F401
+    except ImportError:
+        # CPU-only环境没有PaddleOCR：Service模块只在导入时引用其类名，桩服务不会实例化它们
+        placeholder = types.ModuleType("paddleocr")
+        for name in ("PaddleOCR", "PPStructureV3", "PaddleOCRVL"):
+            setattr(placeholder, name, None)
+        sys.modules["paddleocr"] = placeholder
+
+    import uvicorn
+    import main
+
+    results = synthetic_results()
+    if args.cache_dir:
+        results.update(load_recorded_results(args.cache_dir))
+    factories = build_stub_factories(parse_latency(args.latency), results, seed=args.seed)
+    # build_*_service 按名称查找Service类，替换模块属性即可
+    main.OCRv5Service = lambda *a, **kw: factories["ocrv5"]()
+    # OCRV5_PROCESSES>0 时由工作进程构造桩服务（工厂须可pickle）
+    main.OCRv5ProcessPool = functools.partial(
+        main.OCRv5ProcessPool,
+        service_factory=functools.partial(
+            stub_ocrv5_service, parse_latency(args.latency)["ocrv5"], results["ocrv5"], args.seed
+        ),
+    )
+    main.StructureV3Service = lambda *a, **kw: factories["structure"]()
+    main.VLService = lambda *a, **kw: factories["vl"]()
+
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def parse_latency(items: list[str]) -> dict:
+    """解析 --latency 产线=分布 参数"""
+    latency = dict(DEFAULT_LATENCY)
+    for item in items:
+        pipeline, _, spec = item.partition("=")
+        if pipeline not in latency:
+            raise SystemExit(f"未知产线: {pipeline}")
+        latency[pipeline] = spec
+    return latency
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, env: Optional[list[str]] = None) -> tuple[subprocess.Popen, str]:
+    """启动桩服务网关子进程，等待/health可用"""
+    port = free_port()
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port), "--seed", str(args.seed)]
+    for item in args.latency:
+        cmd += ["--latency", item]
+    for item in args.env + (env or []):
+        cmd += ["--env", item]
+    if args.cache_dir:
+        cmd += ["--cache-dir", os.path.abspath(args.cache_dir)]
+    # 在app目录外运行，避免读取本地.env
+    process = subprocess.Popen(cmd, cwd=BENCH_DIR)
+    url = f"http://127.0.0.1:{port}"
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"桩服务网关启动失败 (exit {process.returncode})")
+        try:
+            if httpx.get(f"{url}{API_PREFIX}/health", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("桩服务网关启动超时")
+
+
+# ---------- 负载生成 ----------
+
+def parse_server_timing(header: Optional[str]) -> dict:
+    """解析Server-Timing响应头，返回{阶段: 秒}"""
+    stages = {}
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.startswith("dur="):
+            stages[name] = float(params[4:]) / 1000
+    return stages
+
+
+async def run_level(
+    url: str,
+    endpoint: str,
+    concurrency: int,
+    total_requests: int,
+    sample: tuple[str, bytes],
+    warmup: int,
+    headers: dict,
+) -> dict:
+    """在指定并发度下压测一个端点"""
+    path, _, form = ENDPOINTS[endpoint]
+    filename, content = sample
+    latencies: list[float] = []
+    inference: list[float] = []
+    status_counts: dict[str, int] = {}
+    remaining = [warmup]
+    recording = [False]
+
+    async def send(client: httpx.AsyncClient, record: bool):
+        start = time.perf_counter()
+        response = await client.post(
+            f"{url}{API_PREFIX}{path}",
+            files={"file": (filename, content)},
+            data=form,
+            headers=headers,
+        )
+        elapsed = time.perf_counter() - start
+        if not record:
+            return
+        code = str(response.status_code)
+        status_counts[code] = status_counts.get(code, 0) + 1
+        if response.status_code == 200:
+            latencies.append(elapsed)
+            inference.append(parse_server_timing(response.headers.get("server-timing")).get("inference", 0.0))
+
+    async def worker(client: httpx.AsyncClient):
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            record = recording[0]
+            try:
+                await send(client, record)
+            except httpx.HTTPError as e:
+                if record:
+                    key = type(e).__name__
+                    status_counts[key] = status_counts.get(key, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        # 预热请求不计入统计
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        start = time.perf_counter()
+        remaining[0] = total_requests
+        recording[0] = True
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall_time = time.perf_counter() - start
+
+    return summarize(endpoint, concurrency, latencies, inference, status_counts, wall_time)
+
+
+def summarize(
+    endpoint: str,
+    concurrency: int,
+    latencies: list[float],
+    inference: list[float],
+    status_counts: dict,
+    wall_time: float,
+) -> dict:
+    """汇总一个并发档位的结果（耗时单位毫秒）"""
+    def ms(values, q):
+        return round(float(np.percentile(values, q)) * 1000, 2) if values else None
+
+    overhead = [total - infer for total, infer in zip(latencies, inference)]
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": sum(status_counts.values()),
+        "ok": len(latencies),
+        "status": status_counts,
+        "wall_time": round(wall_time, 3),
+        "throughput": round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+        "latency_ms": {
+            "mean": round(float(np.mean(latencies)) * 1000, 2) if latencies else None,
+            "p50": ms(latencies, 50),
+            "p95": ms(latencies, 95),
+            "p99": ms(latencies, 99),
+            "max": round(max(latencies) * 1000, 2) if latencies else None,
+        },
+        "overhead_ms": {
+            "p50": ms(overhead, 50),
+            "p95": ms(overhead, 95),
+            "p99": ms(overhead, 99),
+        },
+    }
+
+
+# ---------- 报告 ----------
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result: dict) -> tuple:
+    """结果在对比时的匹配键"""
+    return result["endpoint"], result["concurrency"], result.get("processes")
+
+
+def check_regression(
+    results: list[dict],
+    baseline: dict,
+    max_throughput_drop: float,
+    max_p95_increase: float,
+) -> list[str]:
+    """
+    与基线结果对比，找出超出阈值的性能退化（基线中没有的档位不参与对比）
+
+    Args:
+        results: 本次压测结果
+        baseline: 之前保存的结果JSON
+        max_throughput_drop: 吞吐允许下降的比例（0.1表示10%）
+        max_p95_increase: p95延迟允许上升的比例
+
+    Returns:
+        退化描述列表，为空表示未退化
+    """
+    base = {result_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        previous = base.get(result_key(r))
+        if previous is None:
+            continue
+        label = f"{r['endpoint']} x{r['concurrency']}"
+        if r.get("processes") is not None:
+            label += f" ({r['processes']}进程)"
+
+        throughput, previous_throughput = r["throughput"], previous["throughput"]
+        if previous_throughput and throughput < previous_throughput * (1 - max_throughput_drop):
+            regressions.append(
+                f"{label}: 吞吐 {previous_throughput:.2f} -> {throughput:.2f} req/s "
+                f"({(throughput - previous_throughput) / previous_throughput:+.1%})"
+            )
+
+        p95, previous_p95 = r["latency_ms"]["p95"], previous["latency_ms"]["p95"]
+        if previous_p95 is not None and p95 is None:
+            regressions.append(f"{label}: 没有成功的请求")
+        elif previous_p95 and p95 > previous_p95 * (1 + max_p95_increase):
+            regressions.append(
+                f"{label}: p95 {previous_p95:.2f} -> {p95:.2f} ms ({(p95 - previous_p95) / previous_p95:+.1%})"
+            )
+    return regressions
+
+
+def print_results(results: list[dict], baseline: Optional[dict] = None):
+    base = {result_key(r): r for r in (baseline or {}).get("results", [])}
+    header = (
+        f"{'端点':<12}{'进程':>6}{'并发':>6}{'成功/总数':>12}{'吞吐(req/s)':>13}{'p50(ms)':>10}{'p95(ms)':>10}"
+        f"{'p99(ms)':>10}{'开销p50':>10}{'开销p95':>10}"
+    )
+    if base:
+        header += f"{'吞吐变化':>10}{'p95变化':>10}"
+    print("\n" + header)
+    for r in results:
+        lat, over = r["latency_ms"], r["overhead_ms"]
+        completed = f"{r['ok']}/{r['requests']}"
+        line = (
+            f"{r['endpoint']:<12}{r.get('processes', '-'):>6}{r['concurrency']:>6}{completed:>12}{r['throughput']:>13.2f}"
+            f"{fmt(lat['p50'])}{fmt(lat['p95'])}{fmt(lat['p99'])}{fmt(over['p50'])}{fmt(over['p95'])}"
+        )
+        previous = base.get(result_key(r))
+        if previous:
+            line += f"{change(r['throughput'], previous['throughput'])}"
+            line += f"{change(lat['p95'], previous['latency_ms']['p95'])}"
+        print(line)
+        errors = {code: n for code, n in r["status"].items() if code != "200"}
+        if errors:
+            print(f"{'':<12}非200响应: {errors}")
+
+
+def fmt(value: Optional[float]) -> str:
+    return f"{value:>10.2f}" if value is not None else f"{'-':>10}"
+
+
+def change(current: Optional[float], previous: Optional[float]) -> str:
+    if not current or not previous:
+        return f"{'-':>10}"
+    return f"{(current - previous) / previous:>+10.1%}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网关负载基准（桩服务）")
+    parser.add_argument("--endpoints", default="text,structure,vl", help="压测端点，逗号分隔(text/structure/vl)")
+    parser.add_argument("--concurrency", default="1,4,16", help="并发度，逗号分隔")
+    parser.add_argument("--requests", type=int, default=200, help="每个并发档位的请求数")
+    parser.add_argument("--warmup", type=int, default=10, help="每个并发档位的预热请求数")
+    parser.add_argument("--sample", default=DEFAULT_SAMPLE, help="上传的样例文件")
+    parser.add_argument("--priority", default=None, help="X-Priority请求头(interactive/batch)")
+    parser.add_argument("--latency", action="append", default=[], help="桩服务延迟分布，如 ocrv5=fixed:0.02（可重复）")
+    parser.add_argument("--env", action="append", default=[], help="网关配置覆盖，如 OCRV5_BATCH_ENABLED=false（可重复）")
+    parser.add_argument("--cache-dir", default=None, help="回放该结果缓存目录中记录的结果（默认使用合成结果）")
+    parser.add_argument("--seed", type=int, default=0, help="延迟分布随机种子")
+    parser.add_argument("--url", default=None, help="压测已运行的网关，不启动桩服务")
+    parser.add_argument("--output", default=None, help="结果JSON路径（默认 results/gateway-<commit>-<时间>.json）")
+    parser.add_argument("--compare", default=None, help="与之前保存的结果JSON对比")
+    parser.add_argument(
+        "--max-regression", type=float, default=None,
+        help="与--compare配合：吞吐下降或p95上升超过该比例(如0.1)时以退出码1结束"
+    )
+    parser.add_argument("--processes", default=None, help="OCRv5工作进程数，逗号分隔；每档重启一次桩服务网关测扩展性")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    endpoints = args.endpoints.split(",")
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"未知端点: {unknown}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    with open(args.sample, "rb") as f:
+        sample = (os.path.basename(args.sample), f.read())
+    headers = {"X-Priority": args.priority} if args.priority else {}
+    if args.max_regression is not None and not args.compare:
+        raise SystemExit("--max-regression 需要同时指定 --compare")
+    if args.processes and args.url:
+        raise SystemExit("--processes 只能用于桩服务网关")
+    process_counts = [int(p) for p in args.processes.split(",")] if args.processes else [None]
+
+    results = []
+    for processes in process_counts:
+        process = None
+        url = args.url
+        if url is None:
+            env = [f"OCRV5_PROCESSES={processes}"] if processes is not None else []
+            process, url = start_server(args, env)
+        try:
+            for endpoint in endpoints:
+                for concurrency in levels:
+                    result = asyncio.run(
+                        run_level(url, endpoint, concurrency, args.requests, sample, args.warmup, headers)
+                    )
+                    label = f"{endpoint} x{concurrency}"
+                    if processes is not None:
+                        result["processes"] = processes
+                        label += f" ({processes}进程)"
+                    results.append(result)
+                    print(f"{label}: {result['throughput']:.2f} req/s, p95 {result['latency_ms']['p95']}ms")
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "url": args.url or "stub",
+            "latency": parse_latency(args.latency) if args.url is None else None,
+            "env": args.env,
+            "sample": os.path.basename(args.sample),
+            "sample_size_kb": round(len(sample[1]) / 1024, 1),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "priority": args.priority,
+            "payloads": "recorded" if args.cache_dir else "synthetic",
+            "processes": process_counts if args.processes else None,
+        },
+        "results": results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n对比基线: {args.compare} (commit {baseline['meta'].get('commit')})")
+    print_results(results, baseline)
+
+    output = args.output
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"gateway-{commit or 'unknown'}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {output}")
+
+    if args.max_regression is not None:
+        regressions = check_regression(results, baseline, args.max_regression, args.max_regression)
+        if regressions:
+            print(f"\n超出阈值({args.max_regression:.0%})的退化:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n未发现超出阈值({args.max_regression:.0%})的退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+响应序列化微基准
+对比旧路径（model_dump → sanitize_floats → json.dumps → json.loads → JSONResponse）
+与单次编码路径（core.serialization.dumps）在大结果上的耗时
+
+结果来源：
+- 默认生成模拟的StructureV3多页结果（大量cell_ocr_res、NaN/inf与NumPy值）
+- --cache-dir 指定结果缓存磁盘目录（CACHE_DIR）时，使用其中记录的真实推理结果
+
+用法:
+    python bench_serialization.py [--cells 5000] [--pages 10] [--repeat 20] [--cache-dir ../app/cache]
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from core.models import OCRResponse, MetricsModel  # noqa: E402
+from core.serialization import dumps, to_payload, orjson  # noqa: E402
+
+
+# ---------- 旧路径（改造前 api/v1/ocr.py 的实现） ----------
+
+def sanitize_floats(obj):
+    if isinstance(obj, dict):
+        return {k: sanitize_floats(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [sanitize_floats(item) for item in obj]
+    elif isinstance(obj, float):
+        if math.isnan(obj) or math.isinf(obj):
+            return None
+        return obj
+    return obj
+
+
+def legacy_encode(response: OCRResponse) -> bytes:
+    response_dict = response.model_dump()
+    clean_dict = sanitize_floats(response_dict)
+    json_str = json.dumps(clean_dict, ensure_ascii=False, separators=(',', ':'))
+    return JSONResponse(content=json.loads(json_str), media_type="application/json").body
+
+
+def single_pass_encode(response: OCRResponse) -> bytes:
+    return dumps(to_payload(response))
+
+
+# ---------- 测试数据 ----------
+
+def synthetic_structure_result(pages: int, cells: int) -> dict:
+    """模拟StructureV3 JSON结果：旧格式化逻辑已把NumPy转换为Python列表/浮点数"""
+    rng = np.random.default_rng(0)
+    per_page = max(cells // pages, 1)
+    layout, tables = [], []
+    for page in range(pages):
+        for _ in range(40):
+            layout.append({
+                "label": "text",
+                "bbox": rng.random(4).astype(np.float32).tolist(),
+                "score": float(rng.random()),
+                "page": page,
+            })
+        scores = rng.random(per_page)
+        scores[::50] = np.nan
+        scores[1::97] = np.inf
+        tables.append({
+            "html": "<table>" + "<tr><td>0.00</td></tr>" * 50 + "</table>",
+            "cell_ocr_res": [
+                {"text": f"{i:.2f}", "score": float(s), "box": rng.integers(0, 2000, 4).tolist()}
+                for i, s in enumerate(scores)
+            ],
+            "page": page,
+        })
+    return {"layout": layout, "tables": tables, "formulas": [], "parsing_res": [], "format": "json", "pages": pages}
+
+
+def load_cached_results(cache_dir: str) -> list[tuple[str, dict]]:
+    results = []
+    for path in sorted(glob.glob(os.path.join(cache_dir, "*.pkl"))):
+        with open(path, "rb") as f:
+            prediction = pickle.load(f)
+        if isinstance(prediction, dict) and "result" in prediction:
+            results.append((os.path.basename(path), prediction["result"]))
+    return results
+
+
+def make_response(result, pipeline: str = "structure") -> OCRResponse:
+    return OCRResponse(
+        success=True,
+        pipeline=pipeline,
+        result=result,
+        metrics=MetricsModel(
+            total_time=1.0, inference_time=0.9, image_size_kb=512.0, compressed=False, source="local"
+        ),
+    )
+
+
+def timeit(func, arg, repeat: int) -> tuple[float, bytes]:
+    output = func(arg)  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        output = func(arg)
+    return (time.perf_counter() - start) / repeat, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="响应序列化微基准")
+    parser.add_argument("--pages", type=int, default=10, help="模拟结果页数")
+    parser.add_argument("--cells", type=int, default=5000, help="模拟结果cell_ocr_res总数")
+    parser.add_argument("--repeat", type=int, default=20, help="每种路径重复次数")
+    parser.add_argument("--cache-dir", default=None, help="使用结果缓存目录中记录的真实结果")
+    args = parser.parse_args()
+
+    if args.cache_dir:
+        samples = load_cached_results(args.cache_dir)
+        if not samples:
+            print(f"缓存目录中没有结果: {args.cache_dir}")
+            sys.exit(1)
+    else:
+        samples = [(f"synthetic-{args.pages}p-{args.cells}cells", synthetic_structure_result(args.pages, args.cells))]
+
+    print(f"编码器: {'orjson ' + orjson.__version__ if orjson else 'stdlib'}")
+    print(f"{'样本':<40}{'大小(KB)':>10}{'旧路径(ms)':>12}{'单次编码(ms)':>14}{'加速':>8}")
+    for name, result in samples:
+        response = make_response(result)
+        legacy_time, legacy_bytes = timeit(legacy_encode, response, args.repeat)
+        new_time, new_bytes = timeit(single_pass_encode, response, args.repeat)
+        # 两条路径输出的JSON语义必须一致
+        assert json.loads(legacy_bytes) == json.loads(new_bytes), f"输出不一致: {name}"
+        print(
+            f"{name[:39]:<40}{len(new_bytes) / 1024:>10.1f}{legacy_time * 1000:>12.2f}"
+            f"{new_time * 1000:>14.2f}{legacy_time / new_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+网关基准用的确定性桩服务
+与 OCRv5Service / StructureV3Service / VLService 接口一致，按可配置的延迟分布休眠后回放结果，
+不加载模型、不需要GPU或vLLM
+
+延迟分布写法（单位秒）:
+    fixed:0.05            固定延迟
+    uniform:0.02,0.08     均匀分布
+    normal:0.05,0.01      正态分布（截断为非负）
+    lognormal:-3.0,0.4    对数正态分布（参数为ln延迟的均值与标准差）
+    spin:0.02             固定时长的CPU忙等（持有GIL，模拟Python侧前后处理，用于多进程扩展性测试）
+"""
+import glob
+import math
+import os
+import pickle
+import random
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+DEFAULT_LATENCY = {
+    "ocrv5": "normal:0.05,0.01",
+    "structure": "normal:0.3,0.05",
+    "vl": "lognormal:-0.8,0.3",
+}
+
+
+class LatencyModel:
+    """可复现的推理延迟分布"""
+
+    def __init__(self, spec: str, seed: int = 0):
+        """
+        Args:
+            spec: 分布描述，如 "normal:0.05,0.01"
+            seed: 随机种子（同一种子得到相同的延迟序列）
+        """
+        kind, _, params = spec.partition(":")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        samplers = {
+            "fixed": (1, lambda rng, a: a),
+            "spin": (1, lambda rng, a: a),
+            "uniform": (2, lambda rng, a, b: rng.uniform(a, b)),
+            "normal": (2, lambda rng, mu, sigma: rng.gauss(mu, sigma)),
+            "lognormal": (2, lambda rng, mu, sigma: rng.lognormvariate(mu, sigma)),
+        }
+        if kind not in samplers or len(self.params) != samplers[kind][0]:
+            raise ValueError(f"无效的延迟分布: {spec}")
+        self._sampler = samplers[kind][1]
+        self.busy = kind == "spin"
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            return max(0.0, self._sampler(self._rng, *self.params))
+
+    def mean(self) -> float:
+        """分布均值（用于报告）"""
+        if self.kind in ("fixed", "spin"):
+            return self.params[0]
+        if self.kind == "uniform":
+            return sum(self.params) / 2
+        if self.kind == "normal":
+            return self.params[0]
+        mu, sigma = self.params
+        return math.exp(mu + sigma * sigma / 2)
+
+
+def wait(latency: LatencyModel, delay: float):
+    """按延迟模型等待：spin忙等占用CPU，其余分布休眠"""
+    if not latency.busy:
+        time.sleep(delay)
+        return
+    deadline = time.perf_counter() + delay
+    while time.perf_counter() < deadline:
+        pass
+
+
+class PayloadReplay:
+    """按顺序循环回放记录的识别结果"""
+
+    def __init__(self, results: list):
+        self.results = results
+        self._index = 0
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            result = self.results[self._index % len(self.results)]
+            self._index += 1
+            return result
+
+
+def synthetic_results(lines: int = 40) -> dict:
+    """构造与真实产线结构一致的合成结果"""
+    texts = [f"第{i + 1}行 示例文本 Sample text line {i + 1}" for i in range(lines)]
+    polygons = [[[20, 30 * i + 10], [620, 30 * i + 10], [620, 30 * i + 34], [20, 30 * i + 34]] for i in range(lines)]
+    ocrv5 = {
+        "text": "\n".join(texts),
+        "regions": [
+            {"text": text, "score": 0.98, "polygon": polygon, "bbox": [polygon[0][0], polygon[0][1], polygon[2][0], polygon[2][1]]}
+            for text, polygon in zip(texts, polygons)
+        ],
+        "detected_lines": lines,
+    }
+    layout = [
+        {"label": "text", "bbox": [20, 60 * i + 10, 620, 60 * i + 60], "score": 0.95, "content": text}
+        for i, text in enumerate(texts[: lines // 2])
+    ]
+    structure = {
+        "layout": layout,
+        "tables": [{"bbox": [20, 1300, 620, 1500], "html": "<table><tr><td>1</td><td>2</td></tr></table>", "cell_ocr_res": []}],
+        "formulas": [],
+        "parsing_res": layout,
+        "format": "json",
+        "pages": 1,
+    }
+    vl = {
+        "text": "\n".join(texts[: lines // 2]),
+        "layout": [
+            {"type": "text", "content": text, "bbox": [20, 60 * i + 10, 620, 60 * i + 60]}
+            for i, text in enumerate(texts[: lines // 2])
+        ],
+        "elements_count": {"text": lines // 2},
+        "pages": 1,
+    }
+    return {"ocrv5": [ocrv5], "structure": [structure], "vl": [vl]}
+
+
+def load_recorded_results(cache_dir: str) -> dict:
+    """
+    读取结果缓存磁盘层（CACHE_DIR）中记录的推理结果
+
+    Returns:
+        {产线: [结果, ...]}，缓存文件名形如 "<pipeline>-<sha256>.pkl"
+    """
+    results: dict[str, list] = {}
+    for path in sorted(glob.glob(os.path.join(cache_dir, "*.pkl"))):
+        pipeline = os.path.basename(path).split("-", 1)[0]
+        with open(path, "rb") as f:
+            prediction = pickle.load(f)
+        if isinstance(prediction, dict) and "result" in prediction:
+            results.setdefault(pipeline, []).append(prediction["result"])
+    return results
+
+
+class _StubService:
+    """桩服务基类"""
+
+    pipeline = ""
+    source = "local"
+
+    def __init__(self, latency: LatencyModel, replay: PayloadReplay):
+        self.latency = latency
+        self.replay = replay
+        self.options = {"stub": True, "latency": latency.spec}
+
+    def _infer(self) -> tuple:
+        delay = self.latency.sample()
+        wait(self.latency, delay)
+        return self.replay.next(), delay
+
+    def predict(self, input, progress_callback: Optional[Callable[[int], None]] = None, **kwargs) -> dict:
+        result, delay = self._infer()
+        if progress_callback:
+            progress_callback(1)
+        return {"result": result, "inference_time": delay, "format_time": 0.0, "source": self.source}
+
+    def health_check(self) -> dict:
+        return {"status": "ready", "model_loaded": True, "stub": True, "latency": self.latency.spec}
+
+    def close(self):
+        pass
+
+
+class StubOCRv5Service(_StubService):
+    pipeline = "ocrv5"
+
+    def predict_batch(self, image_paths: list, layouts: Optional[list[str]] = None) -> list[dict]:
+        """整批共享一次推理延迟（与真实批量推理一致）"""
+        delay = self.latency.sample()
+        wait(self.latency, delay)
+        return [
+            {
+                "result": self.replay.next(),
+                "inference_time": delay,
+                "format_time": 0.0,
+                "batch_size": len(image_paths),
+                "source": self.source,
+            }
+            for _ in image_paths
+        ]
+
+    def predict_regions(self, image, regions: list, layout: str = "rows", mode: str = "line") -> dict:
+        return self.predict(image)
+
+
+class StubStructureV3Service(_StubService):
+    pipeline = "structure"
+
+    def predict_stream(self, input, output_format: str = "json") -> Iterator[dict]:
+        pages = input if isinstance(input, list) else [input]
+        for page_index in range(len(pages)):
+            result, delay = self._infer()
+            yield {
+                "page": page_index,
+                "result": result,
+                "inference_time": delay,
+                "format_time": 0.0,
+                "reused": False,
+                "source": self.source,
+            }
+
+
+class StubVLService(_StubService):
+    pipeline = "vl"
+    source = "docker"
+
+
+STUB_CLASSES = {
+    "ocrv5": StubOCRv5Service,
+    "structure": StubStructureV3Service,
+    "vl": StubVLService,
+}
+
+
+def stub_ocrv5_service(latency: str, results: list, seed: int = 0, **service_kwargs) -> StubOCRv5Service:
+    """
+    在OCRv5多进程池的工作进程中构造桩服务（可pickle，配合functools.partial使用）
+
+    Args:
+        latency: 延迟分布描述
+        results: 回放的识别结果
+        seed: 随机种子
+        **service_kwargs: 网关传给OCRv5Service的构造参数（忽略）
+    """
+    return StubOCRv5Service(LatencyModel(latency, seed=seed), PayloadReplay(results))
+
+
+def build_stub_factories(latency: dict, results: dict, seed: int = 0) -> dict:
+    """
+    构造各产线的桩服务工厂
+
+    Args:
+        latency: {产线: 延迟分布描述}
+        results: {产线: [回放的识别结果]}
+        seed: 随机种子
+
+    Returns:
+        {产线: 无参工厂函数}
+    """
+    factories = {}
+    for offset, (pipeline, cls) in enumerate(STUB_CLASSES.items()):
+        model = LatencyModel(latency[pipeline], seed=seed + offset)
+        replay = PayloadReplay(results[pipeline])
+        factories[pipeline] = lambda cls=cls, model=model, replay=replay: cls(model, replay)
+    return factories
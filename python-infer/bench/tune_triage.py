@@ -0,0 +1,221 @@
+"""
+自动路由阈值拟合
+在标注样本上计算分诊特征（与 /auto 端点相同的 core.triage 实现），网格搜索 AUTO_* 路由阈值，
+按准确率选优（准确率相同时取平均推理耗时更低者），输出可直接写入 .env 的配置
+
+样本目录按期望产线分子目录存放:
+    samples/ocrv5/       纯文本截图、简单文档
+    samples/structure/   表格、表单
+    samples/vl/          图文混排、复杂版面
+
+用法:
+    python tune_triage.py samples/
+    python tune_triage.py samples/ --grid 12 --cost ocrv5=0.95,structure=1.8,vl=2.2
+    python tune_triage.py samples/ --output results/triage.json
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, replace
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+sys.path.insert(0, APP_DIR)
+
+from core.config import settings  # noqa: E402
+from core.ingest import UploadedFile, sniff_file_type, MAGIC_SNIFF_BYTES  # noqa: E402
+from core.triage import TriageThresholds, decide, extract_features  # noqa: E402
+
+DEFAULT_RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+PIPELINES = ("ocrv5", "structure", "vl")
+# 各产线单页推理耗时(秒)，用于同准确率时比较路由成本
+DEFAULT_COST = "ocrv5=0.95,structure=1.8,vl=2.2"
+
+# 阈值 → 对应的分诊特征
+THRESHOLD_FEATURES = {
+    "table_min_intersections": "grid_intersections",
+    "table_min_ruling_lines": "ruling_lines",
+    "vl_min_graphic_ratio": "graphic_ratio",
+    "vl_min_text_density": "text_density",
+    "vl_max_pages": "pages",
+}
+# 阈值 → 配置项
+THRESHOLD_SETTINGS = {
+    "table_min_intersections": "AUTO_TABLE_MIN_INTERSECTIONS",
+    "table_min_ruling_lines": "AUTO_TABLE_MIN_RULING_LINES",
+    "vl_min_graphic_ratio": "AUTO_VL_MIN_GRAPHIC_RATIO",
+    "vl_min_text_density": "AUTO_VL_MIN_TEXT_DENSITY",
+    "vl_max_pages": "AUTO_VL_MAX_PAGES",
+}
+
+
+def load_samples(sample_dir: str) -> list[dict]:
+    """读取标注样本并计算分诊特征"""
+    samples = []
+    for label in PIPELINES:
+        label_dir = os.path.join(sample_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        for name in sorted(os.listdir(label_dir)):
+            path = os.path.join(label_dir, name)
+            with open(path, "rb") as f:
+                content = f.read()
+            ext = sniff_file_type(content[:MAGIC_SNIFF_BYTES])
+            if ext is None:
+                print(f"跳过不支持的文件: {path}")
+                continue
+            upload = UploadedFile(name, ext, io.BytesIO(content), len(content), "", 0.0)
+            start_time = time.time()
+            try:
+                features = extract_features(upload, settings.AUTO_TRIAGE_MAX_SIDE, settings.AUTO_TRIAGE_MAX_PAGES)
+            except Exception as e:
+                print(f"跳过无法分诊的文件: {path}: {str(e)}")
+                continue
+            samples.append({
+                "path": os.path.relpath(path, sample_dir),
+                "label": label,
+                "features": features,
+                "triage_ms": (time.time() - start_time) * 1000,
+            })
+    return samples
+
+
+def candidates(values: list, current, grid: int, integer: bool, upper: bool) -> list:
+    """
+    某个阈值的候选取值：当前配置值、观测值的分位点，以及使该规则永不触发的取值
+
+    Args:
+        values: 样本上的特征值
+        current: 当前配置值
+        grid: 分位点个数
+        integer: 是否为整数阈值
+        upper: 是否为上限型阈值（特征 > 阈值时触发，如vl_max_pages），否则为特征 >= 阈值时触发
+    """
+    top = max(values, default=0)
+    if upper:
+        never = top
+    else:
+        never = top + 1 if integer else round(top + 1e-4, 4)
+    out = {current, never}
+    for point in np.quantile(values, np.linspace(0, 1, grid)):
+        out.add(int(round(point)) if integer else round(float(point), 4))
+    # 当前配置值排在最前，样本无法区分的阈值保持不变
+    return sorted(out, key=lambda value: (value != current, value))
+
+
+def evaluate(samples: list[dict], thresholds: TriageThresholds, cost: dict) -> dict:
+    """按给定阈值路由全部样本，返回准确率、平均成本与混淆矩阵"""
+    confusion = {label: {pipeline: 0 for pipeline in PIPELINES} for label in PIPELINES}
+    correct = 0
+    total_cost = 0.0
+    for sample in samples:
+        pipeline, _ = decide(sample["features"], thresholds)
+        confusion[sample["label"]][pipeline] += 1
+        correct += pipeline == sample["label"]
+        total_cost += cost[pipeline] * sample["features"].pages
+    return {
+        "accuracy": correct / len(samples),
+        "mean_cost": total_cost / len(samples),
+        "confusion": confusion,
+    }
+
+
+def search(samples: list[dict], current: TriageThresholds, grid: int, cost: dict) -> tuple[TriageThresholds, dict]:
+    """网格搜索阈值组合（得分相同时保留当前配置）"""
+    space = {}
+    for name, feature in THRESHOLD_FEATURES.items():
+        values = [getattr(sample["features"], feature) for sample in samples]
+        integer = isinstance(getattr(current, name), int)
+        space[name] = candidates(values, getattr(current, name), grid, integer, upper=name == "vl_max_pages")
+
+    combos = 1
+    for values in space.values():
+        combos *= len(values)
+    print(f"搜索 {combos} 组阈值 ...")
+
+    best, best_score = current, evaluate(samples, current, cost)
+    for combo in itertools.product(*space.values()):
+        thresholds = replace(current, **dict(zip(space, combo)))
+        score = evaluate(samples, thresholds, cost)
+        if (score["accuracy"], -score["mean_cost"]) > (
+            best_score["accuracy"], -best_score["mean_cost"]
+        ):
+            best, best_score = thresholds, score
+    return best, best_score
+
+
+def print_report(title: str, score: dict):
+    print(f"\n{title}: 准确率 {score['accuracy'] * 100:.1f}%, 平均推理成本 {score['mean_cost']:.2f}s/样本")
+    header = "标注 \\ 路由"
+    print(f"{header:<14}" + "".join(f"{pipeline:>11}" for pipeline in PIPELINES))
+    for label in PIPELINES:
+        print(f"{label:<14}" + "".join(f"{score['confusion'][label][p]:>11}" for p in PIPELINES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动路由阈值拟合")
+    parser.add_argument("samples", help="标注样本目录（子目录 ocrv5/structure/vl）")
+    parser.add_argument("--grid", type=int, default=8, help="每个阈值的分位点个数")
+    parser.add_argument("--cost", default=DEFAULT_COST, help="各产线单页推理耗时(秒)，如 ocrv5=0.95,vl=2.2")
+    parser.add_argument("--output", default=None, help="结果JSON路径（默认 results/triage-<时间>.json）")
+    args = parser.parse_args()
+
+    cost = {pipeline: 1.0 for pipeline in PIPELINES}
+    for item in args.cost.split(","):
+        pipeline, _, seconds = item.partition("=")
+        cost[pipeline.strip()] = float(seconds)
+
+    samples = load_samples(args.samples)
+    if not samples:
+        sys.exit(f"未找到标注样本: {args.samples}")
+    counts = {label: sum(sample["label"] == label for sample in samples) for label in PIPELINES}
+    triage_ms = [sample["triage_ms"] for sample in samples]
+    print(f"样本: {len(samples)} ({', '.join(f'{k}={v}' for k, v in counts.items())}), "
+          f"分诊耗时 p50 {np.percentile(triage_ms, 50):.1f}ms / p95 {np.percentile(triage_ms, 95):.1f}ms")
+
+    current = TriageThresholds.from_settings()
+    current_score = evaluate(samples, current, cost)
+    best, best_score = search(samples, current, args.grid, cost)
+
+    print_report("当前配置", current_score)
+    print_report("拟合结果", best_score)
+
+    routes = [(sample, *decide(sample["features"], best)) for sample in samples]
+    misrouted = [(sample, pipeline, reason) for sample, pipeline, reason in routes if pipeline != sample["label"]]
+    if misrouted:
+        print("\n仍被误路由的样本:")
+        for sample, pipeline, reason in misrouted:
+            print(f"  {sample['path']}: 标注 {sample['label']}, 路由 {pipeline} ({reason})")
+
+    print("\n# 写入 .env")
+    for name, value in asdict(best).items():
+        print(f"{THRESHOLD_SETTINGS[name]}={value}")
+
+    report = {
+        "meta": {"time": datetime.now().isoformat(), "samples": args.samples, "cost": cost, "grid": args.grid},
+        "current": {"thresholds": asdict(current), **current_score},
+        "best": {"thresholds": asdict(best), **best_score},
+        "samples": [
+            {"path": sample["path"], "label": sample["label"], "triage_ms": round(sample["triage_ms"], 2),
+             **sample["features"].to_dict()}
+            for sample in samples
+        ],
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(DEFAULT_RESULTS_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_RESULTS_DIR, f"triage-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {output}")
+
+
+if __name__ == "__main__":
+    main()
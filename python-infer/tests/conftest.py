@@ -0,0 +1,40 @@
+"""
+网关单元测试公共配置
+把 app/ 与 bench/ 加入导入路径；未安装PaddleOCR时注册占位模块（同bench_gateway），以便导入路由与Service模块；
+FakeClock 替换模块内的 time，用于控制熔断、准入与缓存的时间
+"""
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+try:
+    import paddleocr  # noqa: F401
+except ImportError:
+    placeholder = types.ModuleType("paddleocr")
+    for name in ("PaddleOCR", "PPStructureV3", "PaddleOCRVL"):
+        setattr(placeholder, name, None)
+    sys.modules["paddleocr"] = placeholder
+
+import pytest  # noqa: E402
+
+
+class FakeClock:
+    """可手动推进的时钟（只提供被测模块用到的 time.time）"""
+
+    def __init__(self, start: float = 1_000_000.0):
+        self.now = start
+
+    def time(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
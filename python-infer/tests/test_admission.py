@@ -0,0 +1,171 @@
+"""准入控制：名额移交、优先级与Retry-After估算"""
+import asyncio
+
+import pytest
+
+from core import admission
+from core.admission import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, AdmissionController, AdmissionRejected
+)
+
+
+@pytest.fixture(autouse=True)
+def fake_time(clock, monkeypatch):
+    monkeypatch.setattr(admission, "time", clock)
+
+
+async def settle():
+    """让等待中的协程处理已就绪的结果"""
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_admits_up_to_max_inflight():
+    async def scenario():
+        controller = AdmissionController("test", max_inflight=2, max_queued=2)
+        await controller.acquire()
+        await controller.acquire()
+        assert controller.inflight == 2
+        waiter = asyncio.create_task(controller.acquire())
+        await settle()
+        assert not waiter.done()
+        assert controller.queued == 1
+        waiter.cancel()
+        await settle()
+        assert controller.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_release_hands_off_interactive_first():
+    async def scenario():
+        controller = AdmissionController("test", max_inflight=1, max_queued=4)
+        first = await controller.acquire()
+        order = []
+
+        async def request(name, priority):
+            acquired_at = await controller.acquire(priority)
+            order.append(name)
+            return acquired_at
+
+        batch = asyncio.create_task(request("batch", PRIORITY_BATCH))
+        await settle()
+        interactive = asyncio.create_task(request("interactive", PRIORITY_INTERACTIVE))
+        await settle()
+        assert controller.stats()["queued"] == {PRIORITY_INTERACTIVE: 1, PRIORITY_BATCH: 1}
+
+        controller.release(first)
+        await settle()
+        # 名额直接移交，在途数不变
+        assert order == ["interactive"]
+        assert controller.inflight == 1
+
+        controller.release(interactive.result())
+        await settle()
+        assert order == ["interactive", "batch"]
+
+        controller.release(batch.result())
+        assert controller.inflight == 0
+        assert controller.admitted == 3
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_after_hand_off_passes_slot_on():
+    async def scenario():
+        controller = AdmissionController("test", max_inflight=1, max_queued=4)
+        first = await controller.acquire()
+        cancelled = asyncio.create_task(controller.acquire())
+        following = asyncio.create_task(controller.acquire())
+        await settle()
+
+        # 名额移交给cancelled后、其恢复执行前被取消：名额应转交给following
+        controller.release(first)
+        cancelled.cancel()
+        await settle()
+        assert cancelled.cancelled()
+        assert following.done()
+        assert controller.inflight == 1
+
+        controller.release(following.result())
+        assert controller.inflight == 0
+        assert controller.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_without_successor_returns_slot():
+    async def scenario():
+        controller = AdmissionController("test", max_inflight=1, max_queued=4)
+        first = await controller.acquire()
+        cancelled = asyncio.create_task(controller.acquire())
+        await settle()
+        controller.release(first)
+        cancelled.cancel()
+        await settle()
+        assert controller.inflight == 0
+
+    asyncio.run(scenario())
+
+
+def test_rejects_when_queue_full():
+    async def scenario():
+        controller = AdmissionController("test", max_inflight=1, max_queued=2, batch_queue_ratio=0.5)
+        await controller.acquire()
+        waiters = [asyncio.create_task(controller.acquire(PRIORITY_BATCH))]
+        await settle()
+
+        # batch只能占用一半排队名额
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(PRIORITY_BATCH)
+        waiters.append(asyncio.create_task(controller.acquire(PRIORITY_INTERACTIVE)))
+        await settle()
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire(PRIORITY_INTERACTIVE)
+
+        assert excinfo.value.pipeline == "test"
+        assert controller.rejected == {PRIORITY_INTERACTIVE: 1, PRIORITY_BATCH: 1}
+        for waiter in waiters:
+            waiter.cancel()
+        await settle()
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_defaults_to_one_second_without_samples():
+    async def scenario():
+        controller = AdmissionController("test", max_inflight=1, max_queued=0)
+        await controller.acquire()
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire()
+        assert excinfo.value.retry_after == 1.0
+        assert "1秒后重试" in str(excinfo.value)
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_follows_service_rate(clock):
+    async def scenario():
+        controller = AdmissionController("test", max_inflight=2, max_queued=2, ewma_alpha=0.5)
+        for service_time in (4.0, 2.0):
+            acquired_at = await controller.acquire()
+            clock.advance(service_time)
+            controller.release(acquired_at)
+        # EWMA: 4 + 0.5 * (2 - 4) = 3秒；2个名额 → 2/3 请求每秒
+        assert controller.avg_service_time == pytest.approx(3.0)
+        assert controller.service_rate() == pytest.approx(2 / 3)
+
+        await controller.acquire()
+        await controller.acquire()
+        waiters = [asyncio.create_task(controller.acquire()) for _ in range(2)]
+        await settle()
+        with pytest.raises(AdmissionRejected) as excinfo:
+            await controller.acquire()
+        # 排空前面2个排队请求再加上自己：(2 + 1) / (2/3) = 4.5秒
+        assert excinfo.value.retry_after == pytest.approx(4.5)
+        assert "5秒后重试" in str(excinfo.value)
+        for waiter in waiters:
+            waiter.cancel()
+        await settle()
+
+    asyncio.run(scenario())
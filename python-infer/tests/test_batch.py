@@ -0,0 +1,214 @@
+"""
+批量接口测试：zip/tar归档流式解包、单项错误不影响其余项、项数上限与有界并发
+（推理替换为假的predict_item，只验证批量流本身）
+"""
+import asyncio
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from api.v1 import batch
+from api.v1.batch import archive_kind, iter_archive, iter_items, stream_batch
+from core.config import settings
+from core.ingest import UploadedFile
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+def zip_bytes(members: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def tar_bytes(members: dict, mode: str = "w:gz") -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def upload(content: bytes, filename: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename, size=len(content))
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 1)
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 100)
+    monkeypatch.setattr(settings, "BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "ENABLE_METRICS", False)
+
+
+def close_items(items):
+    for _, item in items:
+        if isinstance(item, UploadedFile):
+            item.close()
+
+
+@pytest.mark.parametrize("filename, head, expected", [
+    ("a.bin", b"PK\x03\x04rest", "zip"),
+    ("a.bin", b"\x1f\x8b\x08", "tar"),
+    ("a.bin", b"\x00" * 257 + b"ustar\x0000", "tar"),
+    ("scans.ZIP", b"garbage", "zip"),
+    ("scans.tgz", b"garbage", "tar"),
+    ("page.png", PNG, None),
+])
+def test_archive_kind(filename, head, expected):
+    assert archive_kind(filename, head) == expected
+
+
+def test_zip_members_in_order_with_per_member_errors():
+    content = zip_bytes({
+        "docs/": b"",
+        "docs/a.png": PNG,
+        "__MACOSX/docs/._a.png": b"meta",
+        "docs/.DS_Store": b"meta",
+        "docs/b.gif": b"GIF89a",
+        "docs/c.png": PNG + b"\x00" * (1024 * 1024),
+        "docs/d.png": PNG,
+    })
+    items = list(iter_archive(io.BytesIO(content), "zip"))
+    try:
+        assert [name for name, _ in items] == ["docs/a.png", "docs/b.gif", "docs/c.png", "docs/d.png"]
+        assert isinstance(items[0][1], UploadedFile) and items[0][1].read_bytes() == PNG
+        assert items[1][1].status_code == 400
+        assert items[2][1].status_code == 413
+        assert isinstance(items[3][1], UploadedFile)
+    finally:
+        close_items(items)
+
+
+@pytest.mark.parametrize("mode", ["w", "w:gz", "w:bz2", "w:xz"])
+def test_tar_members_streamed(mode):
+    content = tar_bytes({"a.png": PNG, "b.png": PNG + b"\x01"}, mode)
+    items = list(iter_archive(io.BytesIO(content), "tar"))
+    try:
+        assert [(name, item.size) for name, item in items] == [("a.png", len(PNG)), ("b.png", len(PNG) + 1)]
+    finally:
+        close_items(items)
+
+
+def test_iter_items_mixes_files_and_archives():
+    files = [
+        upload(PNG, "single.png"),
+        upload(zip_bytes({"x.png": PNG, "y.png": PNG}), "bundle.zip"),
+        upload(b"not an archive", "broken.zip"),
+        upload(b"GIF89a", "bad.png"),
+    ]
+
+    async def collect():
+        return [item async for item in iter_items(files)]
+
+    items = asyncio.run(collect())
+    try:
+        assert [name for name, _ in items] == ["single.png", "x.png", "y.png", "broken.zip", "bad.png"]
+        assert [type(item).__name__ for _, item in items] == [
+            "UploadedFile", "UploadedFile", "UploadedFile", "HTTPException", "HTTPException"
+        ]
+        assert items[3][1].status_code == 400
+    finally:
+        close_items(items)
+
+
+@pytest.fixture
+def spooled(monkeypatch):
+    """记录从归档中解出（写入spool缓冲区）的成员名"""
+    names = []
+    spool_member = batch.spool_member
+
+    def counting(name, reader, size):
+        names.append(name)
+        return spool_member(name, reader, size)
+
+    monkeypatch.setattr(batch, "spool_member", counting)
+    return names
+
+
+def run_batch(monkeypatch, files: list, predict) -> tuple[list[dict], list[UploadedFile]]:
+    """执行批量流，返回NDJSON事件与交给推理的全部上传文件"""
+    seen = []
+
+    async def fake_predict_item(name, upload, fmt, compress, priority):
+        seen.append(upload)
+        return await predict(upload)
+
+    async def consume():
+        response = stream_batch("ocrv5", files, "rows", False, "batch")
+        return [json.loads(line) async for chunk in response.body_iterator for line in chunk.splitlines()]
+
+    monkeypatch.setattr(batch, "predict_item", fake_predict_item)
+    return asyncio.run(consume()), seen
+
+
+async def echo(upload: UploadedFile) -> dict:
+    return {"success": True, "pipeline": "ocrv5", "result": {"size": upload.size}, "metrics": {}}
+
+
+def test_item_errors_do_not_stop_batch(monkeypatch):
+    async def predict(upload):
+        if upload.filename == "fail.png":
+            raise HTTPException(status_code=503, detail="unavailable")
+        if upload.filename == "crash.png":
+            raise RuntimeError("boom")
+        return await echo(upload)
+
+    files = [upload(PNG, "ok.png"), upload(PNG, "fail.png"), upload(PNG, "crash.png"), upload(b"x", "bad.png")]
+    events, seen = run_batch(monkeypatch, files, predict)
+
+    by_index = {e["data"]["index"]: e for e in events if e["event"] != "done"}
+    assert by_index[0]["event"] == "item" and by_index[0]["data"]["result"] == {"size": len(PNG)}
+    assert (by_index[1]["event"], by_index[1]["data"]["status_code"]) == ("error", 503)
+    assert (by_index[2]["event"], by_index[2]["data"]["status_code"]) == ("error", 500)
+    assert (by_index[3]["event"], by_index[3]["data"]["status_code"]) == ("error", 400)
+    done = events[-1]
+    assert done["event"] == "done"
+    assert (done["data"]["total"], done["data"]["succeeded"], done["data"]["failed"]) == (4, 1, 3)
+    assert all(upload.buffer.closed for upload in seen)
+
+
+def test_item_limit_stops_unpacking(monkeypatch, spooled):
+    monkeypatch.setattr(settings, "BATCH_MAX_ITEMS", 3)
+    archive = zip_bytes({f"{i}.png": PNG for i in range(10)})
+    events, seen = run_batch(monkeypatch, [upload(archive, "many.zip")], echo)
+
+    items = [e["data"] for e in events if e["event"] == "item"]
+    errors = [e["data"] for e in events if e["event"] == "error"]
+    assert sorted(item["index"] for item in items) == [0, 1, 2]
+    assert [(error["index"], error["status_code"]) for error in errors] == [(3, 413)]
+    assert events[-1]["data"]["total"] == 4
+    # 超过上限后不再解包剩余成员
+    assert len(spooled) == 4
+    assert len(seen) == 3
+
+
+def test_unpacking_bounded_by_concurrency(monkeypatch, spooled):
+    state = {"running": 0, "peak": 0, "finished": 0, "ahead": 0}
+
+    async def predict(upload):
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        # 给生产者继续解包的机会：若不受并发上限约束，此时会解出更多成员
+        await asyncio.sleep(0.05)
+        state["ahead"] = max(state["ahead"], len(spooled) - state["finished"])
+        state["running"] -= 1
+        state["finished"] += 1
+        return await echo(upload)
+
+    archive = tar_bytes({f"{i}.png": PNG for i in range(8)})
+    events, _ = run_batch(monkeypatch, [upload(archive, "many.tar.gz")], predict)
+
+    assert events[-1]["data"]["succeeded"] == 8
+    assert state["peak"] == settings.BATCH_CONCURRENCY
+    # 在途2项 + 已解出、等待名额的1项
+    assert state["ahead"] <= settings.BATCH_CONCURRENCY + 1
@@ -0,0 +1,121 @@
+"""微批调度：凑批、按大小与时间窗口派发、失败分发"""
+import asyncio
+import time
+
+import pytest
+
+from core.executor import PipelineExecutor
+from services.batcher import MicroBatcher
+from stub_services import LatencyModel, PayloadReplay, StubOCRv5Service
+
+
+@pytest.fixture
+def executor():
+    executor = PipelineExecutor("batch-test", max_workers=1)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture
+def stub():
+    return StubOCRv5Service(LatencyModel("fixed:0.01"), PayloadReplay([{"text": "a"}, {"text": "b"}]))
+
+
+def run_with_batcher(batcher: MicroBatcher, scenario):
+    async def wrapper():
+        batcher.start()
+        try:
+            return await scenario()
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(wrapper())
+
+
+def test_concurrent_requests_share_one_batch(executor, stub):
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return stub.predict_batch(items)
+
+    batcher = MicroBatcher("batch-test", batch_fn, executor, max_batch_size=8, max_wait_ms=50)
+    results = run_with_batcher(batcher, lambda: asyncio.gather(*(batcher.submit(i) for i in range(5))))
+
+    assert sizes == [5]
+    assert [r["result"]["text"] for r, _ in results] == ["a", "b", "a", "b", "a"]
+    assert all(r["batch_size"] == 5 for r, _ in results)
+    assert all(wait >= 0 for _, wait in results)
+    assert batcher.stats()["pending"] == 0
+
+
+def test_full_batch_dispatches_without_waiting(executor, stub):
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return stub.predict_batch(items)
+
+    batcher = MicroBatcher("batch-test", batch_fn, executor, max_batch_size=3, max_wait_ms=10_000)
+
+    async def scenario():
+        start = time.perf_counter()
+        await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+        return time.perf_counter() - start
+
+    elapsed = run_with_batcher(batcher, scenario)
+    assert sizes == [3]
+    assert elapsed < 5
+
+
+def test_partial_batch_flushes_after_window(executor, stub):
+    sizes = []
+
+    def batch_fn(items):
+        sizes.append(len(items))
+        return stub.predict_batch(items)
+
+    batcher = MicroBatcher("batch-test", batch_fn, executor, max_batch_size=8, max_wait_ms=20)
+
+    async def scenario():
+        first = await batcher.submit("x")
+        # 第一批派发后到达的请求进入下一批
+        second = await asyncio.gather(batcher.submit("y"), batcher.submit("z"))
+        return first, second
+
+    run_with_batcher(batcher, scenario)
+    assert sizes == [1, 2]
+
+
+def test_batch_failure_fans_out_to_every_request(executor):
+    def batch_fn(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher("batch-test", batch_fn, executor, max_batch_size=4, max_wait_ms=20)
+    results = run_with_batcher(
+        batcher, lambda: asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+    )
+    assert len(results) == 3
+    assert all(isinstance(r, ValueError) and str(r) == "boom" for r in results)
+    assert executor.stats()["failed"] == 1
+
+
+def test_result_count_mismatch_fails_batch(executor):
+    batcher = MicroBatcher("batch-test", lambda items: items[:-1], executor, max_batch_size=4, max_wait_ms=20)
+    results = run_with_batcher(
+        batcher, lambda: asyncio.gather(*(batcher.submit(i) for i in range(2)), return_exceptions=True)
+    )
+    assert all(isinstance(r, RuntimeError) and "数量不匹配" in str(r) for r in results)
+
+
+def test_stop_fails_queued_requests(executor):
+    async def scenario():
+        batcher = MicroBatcher("batch-test", lambda items: items, executor)
+        # 未启动调度循环：请求停留在队列中
+        pending = asyncio.create_task(batcher.submit("x"))
+        await asyncio.sleep(0)
+        await batcher.stop()
+        with pytest.raises(RuntimeError, match="微批调度已停止"):
+            await pending
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+"""基准结果的退化阈值检查"""
+from bench_gateway import check_regression
+
+
+def result(endpoint="text", concurrency=4, throughput=100.0, p95=50.0, processes=None) -> dict:
+    entry = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "throughput": throughput,
+        "latency_ms": {"p95": p95},
+    }
+    if processes is not None:
+        entry["processes"] = processes
+    return entry
+
+
+def baseline(*results) -> dict:
+    return {"meta": {"commit": "abc1234"}, "results": list(results)}
+
+
+def test_within_threshold_passes():
+    current = [result(throughput=91.0, p95=54.9)]
+    assert check_regression(current, baseline(result()), 0.1, 0.1) == []
+
+
+def test_improvement_passes():
+    current = [result(throughput=150.0, p95=20.0)]
+    assert check_regression(current, baseline(result()), 0.1, 0.1) == []
+
+
+def test_throughput_drop_detected():
+    regressions = check_regression([result(throughput=85.0)], baseline(result()), 0.1, 0.1)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("text x4: 吞吐 100.00 -> 85.00 req/s")
+
+
+def test_p95_increase_detected():
+    regressions = check_regression([result(p95=60.0)], baseline(result()), 0.1, 0.1)
+    assert len(regressions) == 1
+    assert "p95 50.00 -> 60.00 ms (+20.0%)" in regressions[0]
+
+
+def test_separate_thresholds():
+    current = [result(throughput=85.0, p95=60.0)]
+    assert check_regression(current, baseline(result()), 0.2, 0.5) == []
+    assert len(check_regression(current, baseline(result()), 0.1, 0.5)) == 1
+
+
+def test_no_successful_requests_is_regression():
+    current = [result(throughput=0.0, p95=None)]
+    regressions = check_regression(current, baseline(result()), 0.1, 0.1)
+    assert any("没有成功的请求" in line for line in regressions)
+
+
+def test_matches_by_endpoint_concurrency_and_processes():
+    base = baseline(
+        result(concurrency=1, throughput=20.0),
+        result(concurrency=16, throughput=200.0, processes=2),
+    )
+    current = [
+        result(concurrency=1, throughput=19.0),
+        result(concurrency=16, throughput=100.0, processes=4),   # 基线中没有4进程档位
+        result(endpoint="vl", concurrency=1, throughput=1.0),    # 基线中没有该端点
+    ]
+    assert check_regression(current, base, 0.1, 0.1) == []
+
+    current.append(result(concurrency=16, throughput=100.0, processes=2))
+    regressions = check_regression(current, base, 0.1, 0.1)
+    assert regressions == ["text x16 (2进程): 吞吐 200.00 -> 100.00 req/s (-50.0%)"]
@@ -0,0 +1,117 @@
+"""结果缓存：TTL过期与字节预算淘汰"""
+import pickle
+
+import pytest
+
+from core import cache
+from core.cache import ResultCache
+
+
+@pytest.fixture(autouse=True)
+def fake_time(clock, monkeypatch):
+    monkeypatch.setattr(cache, "time", clock)
+
+
+def value(n: int) -> dict:
+    return {"result": {"text": "x" * 100, "n": n}}
+
+
+SIZE = len(pickle.dumps(value(0), protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_make_key_depends_on_all_inputs():
+    key = ResultCache.make_key("abc", "ocrv5", "json", {"a": 1, "b": 2})
+    assert key.startswith("ocrv5-")
+    assert key == ResultCache.make_key("abc", "ocrv5", "json", {"b": 2, "a": 1})
+    assert key != ResultCache.make_key("abc", "ocrv5", "markdown", {"a": 1, "b": 2})
+    assert key != ResultCache.make_key("abd", "ocrv5", "json", {"a": 1, "b": 2})
+
+
+def test_memory_ttl(clock):
+    store = ResultCache(memory_max_bytes=10 * SIZE, disk_dir=None, disk_max_bytes=0, ttl_seconds=60)
+    store.set("k", value(1))
+    clock.advance(60)
+    assert store.get("k") == value(1)
+    clock.advance(1)
+    assert store.get("k") is None
+    stats = store.stats()
+    assert stats["memory_entries"] == 0
+    assert stats["memory_bytes"] == 0
+    assert stats["hits"]["memory"] == 1
+    assert stats["misses"] == 1
+
+
+def test_zero_ttl_never_expires(clock):
+    store = ResultCache(memory_max_bytes=10 * SIZE, disk_dir=None, disk_max_bytes=0, ttl_seconds=0)
+    store.set("k", value(1))
+    clock.advance(10 ** 9)
+    assert store.get("k") == value(1)
+
+
+def test_memory_lru_eviction():
+    store = ResultCache(memory_max_bytes=2 * SIZE, disk_dir=None, disk_max_bytes=0, ttl_seconds=0)
+    store.set("a", value(1))
+    store.set("b", value(2))
+    # 访问a后，b成为最久未使用的条目
+    assert store.get("a") == value(1)
+    store.set("c", value(3))
+    assert store.get("b") is None
+    assert store.get("a") == value(1)
+    assert store.get("c") == value(3)
+    stats = store.stats()
+    assert stats["evictions"]["memory"] == 1
+    assert stats["memory_bytes"] == 2 * SIZE
+
+
+def test_oversized_value_skips_memory():
+    store = ResultCache(memory_max_bytes=SIZE - 1, disk_dir=None, disk_max_bytes=0, ttl_seconds=0)
+    store.set("a", value(1))
+    assert store.get("a") is None
+    assert store.stats()["evictions"]["memory"] == 0
+
+
+def test_disk_hit_refills_memory(tmp_path):
+    store = ResultCache(memory_max_bytes=SIZE, disk_dir=str(tmp_path), disk_max_bytes=10 * SIZE, ttl_seconds=0)
+    store.set("a", value(1))
+    store.set("b", value(2))
+    # a已被挤出内存层，从磁盘层读回并回填内存
+    assert store.get("a") == value(1)
+    assert store.stats()["hits"] == {"memory": 0, "disk": 1}
+    assert store.get("a") == value(1)
+    assert store.stats()["hits"] == {"memory": 1, "disk": 1}
+
+
+def test_disk_ttl_removes_file(tmp_path, clock):
+    store = ResultCache(memory_max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=10 * SIZE, ttl_seconds=60)
+    store.set("a", value(1))
+    assert (tmp_path / "a.pkl").exists()
+    clock.advance(61)
+    assert store.get("a") is None
+    assert not (tmp_path / "a.pkl").exists()
+    assert store.stats()["disk_entries"] == 0
+
+
+def test_disk_eviction_oldest_first(tmp_path, clock):
+    store = ResultCache(memory_max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=2 * SIZE, ttl_seconds=0)
+    for key in ("a", "b", "c"):
+        store.set(key, value(ord(key)))
+        clock.advance(1)
+    assert store.get("a") is None
+    assert not (tmp_path / "a.pkl").exists()
+    assert store.get("b") == value(ord("b"))
+    assert store.get("c") == value(ord("c"))
+    stats = store.stats()
+    assert stats["evictions"]["disk"] == 1
+    assert stats["disk_bytes"] == 2 * SIZE
+
+
+def test_disk_index_survives_restart(tmp_path):
+    store = ResultCache(memory_max_bytes=10 * SIZE, disk_dir=str(tmp_path), disk_max_bytes=10 * SIZE, ttl_seconds=0)
+    store.set("ocrv5-a", value(1))
+    store.set("vl-b", value(2))
+
+    reopened = ResultCache(memory_max_bytes=10 * SIZE, disk_dir=str(tmp_path), disk_max_bytes=10 * SIZE, ttl_seconds=0)
+    assert reopened.stats()["disk_entries"] == 2
+    assert reopened.get("vl-b") == value(2)
+    assert reopened.purge("ocrv5") == 1
+    assert reopened.get("ocrv5-a") is None
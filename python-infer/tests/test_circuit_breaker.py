@@ -0,0 +1,149 @@
+"""熔断器状态切换"""
+import pytest
+
+from core import circuit_breaker
+from core.circuit_breaker import (
+    CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitBreaker, is_backend_failure
+)
+
+
+@pytest.fixture
+def breaker(clock, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "time", clock)
+    return CircuitBreaker(
+        "test", window_size=4, min_calls=4, failure_rate_threshold=0.5,
+        slow_call_seconds=1.0, slow_rate_threshold=0.75, open_seconds=10.0, half_open_max_calls=2,
+    )
+
+
+def trip(breaker: CircuitBreaker):
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record_failure()
+
+
+def test_stays_closed_below_min_calls(breaker):
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+
+
+def test_opens_on_failure_rate(breaker):
+    for failed in (False, True, False, True):
+        assert breaker.allow()
+        breaker.record_failure() if failed else breaker.record_success(0.1)
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.open_reason == "failure rate 50%"
+
+
+def test_opens_on_slow_call_rate(breaker):
+    for duration in (0.1, 2.0, 2.0, 2.0):
+        assert breaker.allow()
+        breaker.record_success(duration)
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.open_reason == "slow call rate 75%"
+
+
+def test_open_rejects_until_timeout(breaker, clock):
+    trip(breaker)
+    assert not breaker.allow()
+    assert not breaker.available
+    assert breaker.rejected == 1
+
+    clock.advance(4)
+    assert breaker.retry_after() == pytest.approx(6.0)
+    assert not breaker.allow()
+
+    clock.advance(6)
+    assert breaker.available
+    assert breaker.allow()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+
+
+def test_half_open_limits_probes_and_closes(breaker, clock):
+    trip(breaker)
+    clock.advance(10)
+    assert breaker.allow()
+    assert breaker.allow()
+    # 试探名额已满
+    assert not breaker.allow()
+    assert not breaker.available
+
+    breaker.record_success(0.1)
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    breaker.record_success(0.1)
+    assert breaker.state == CIRCUIT_CLOSED
+    assert [event["to"] for event in breaker.events] == [CIRCUIT_OPEN, CIRCUIT_HALF_OPEN, CIRCUIT_CLOSED]
+
+
+@pytest.mark.parametrize("record", [
+    lambda b: b.record_failure(),
+    lambda b: b.record_success(5.0),
+])
+def test_half_open_probe_failure_reopens(breaker, clock, record):
+    trip(breaker)
+    clock.advance(10)
+    assert breaker.allow()
+    record(breaker)
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.open_reason.startswith("half-open probe")
+    assert breaker.retry_after() == pytest.approx(10.0)
+
+
+def test_release_returns_half_open_slot(breaker, clock):
+    trip(breaker)
+    clock.advance(10)
+    assert breaker.allow()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+
+
+def test_results_after_open_are_ignored(breaker):
+    for _ in range(4):
+        assert breaker.allow()
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    # 熔断前放行的调用稍后才返回，不会影响熔断状态
+    breaker.record_success(0.1)
+    assert breaker.state == CIRCUIT_OPEN
+    assert breaker.stats()["window_calls"] == 0
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class ClientError(Exception):
+    status_code = 400
+
+
+@pytest.mark.parametrize("exc, expected", [
+    (ConnectionRefusedError(), True),
+    (TimeoutError(), True),
+    (APITimeoutError(), True),
+    (ServerError(), True),
+    (ClientError(), False),
+    (ValueError("bad input"), False),
+])
+def test_is_backend_failure(exc, expected):
+    assert is_backend_failure(exc) is expected
+
+
+def test_is_backend_failure_follows_cause():
+    try:
+        try:
+            raise ConnectionResetError()
+        except ConnectionResetError as e:
+            raise RuntimeError("VL推理失败") from e
+    except RuntimeError as e:
+        assert is_backend_failure(e)
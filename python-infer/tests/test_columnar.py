@@ -0,0 +1,113 @@
+"""
+列式结果测试：PaddleOCR原始结果格式化为平行数组，packed=true时打包为小端二进制缓冲区
+"""
+import base64
+import json
+
+import numpy as np
+import pytest
+
+from core.serialization import dumps
+from services.ocr_v5 import OCRv5Service, pack_array, pack_columnar
+
+
+def raw_result(lines: int = 3) -> dict:
+    polys = [np.array([[0, 10 * i], [50, 10 * i], [50, 10 * i + 8], [0, 10 * i + 8]], dtype=np.int16)
+             for i in range(lines)]
+    return {
+        "rec_texts": [f"line {i}" for i in range(lines)],
+        "rec_scores": [0.9 - i * 0.1 for i in range(lines)],
+        "dt_polys": polys,
+        "rec_boxes": np.array([[0, 10 * i, 50, 10 * i + 8] for i in range(lines)], dtype=np.int16),
+    }
+
+
+def format_columnar(raw) -> dict:
+    # 格式化不依赖模型，跳过__init__避免加载PaddleOCR
+    return OCRv5Service._format_columnar(OCRv5Service.__new__(OCRv5Service), raw)
+
+
+def unpack(packed: dict) -> np.ndarray:
+    data = base64.b64decode(packed["data"])
+    return np.frombuffer(data, dtype=np.dtype(packed["dtype"]).newbyteorder("<")).reshape(packed["shape"])
+
+
+def test_format_columnar_parallel_arrays():
+    result = format_columnar([raw_result()])
+
+    assert result["layout"] == "columnar"
+    assert result["texts"] == ["line 0", "line 1", "line 2"]
+    assert result["text"] == "line 0\nline 1\nline 2"
+    assert result["detected_lines"] == 3
+    assert result["scores"].dtype == np.float32
+    assert result["boxes"].shape == (3, 4)
+    assert result["polygons"].shape == (3, 4, 2)
+
+
+@pytest.mark.parametrize("raw", [None, [], {}, {"rec_texts": []}])
+def test_format_columnar_empty(raw):
+    result = format_columnar(raw)
+
+    assert result["texts"] == [] and result["detected_lines"] == 0
+    assert result["scores"].shape == (0,)
+    assert result["boxes"].shape == (0, 4)
+    assert result["polygons"].shape == (0, 4, 2)
+
+
+def test_format_columnar_ragged_polygons_kept_per_line():
+    raw = raw_result(2)
+    raw["dt_polys"] = [np.zeros((4, 2)), np.zeros((6, 2))]
+    result = format_columnar(raw)
+
+    assert isinstance(result["polygons"], list)
+    assert [poly.shape for poly in result["polygons"]] == [(4, 2), (6, 2)]
+
+
+def test_columnar_json_matches_rows_content():
+    raw = raw_result()
+    columnar = json.loads(dumps(format_columnar(raw)))
+    rows = OCRv5Service._format_result(OCRv5Service.__new__(OCRv5Service), raw)
+
+    assert columnar["boxes"] == [region["bbox"] for region in rows["regions"]]
+    assert columnar["polygons"] == [region["polygon"] for region in rows["regions"]]
+    assert columnar["scores"] == pytest.approx([region["score"] for region in rows["regions"]])
+
+
+def test_pack_array_little_endian_round_trip():
+    array = np.array([[1, -2], [300, 4]], dtype=">i8")
+    packed = pack_array(array, "int16")
+
+    assert packed["dtype"] == "int16"
+    assert packed["shape"] == [2, 2]
+    assert base64.b64decode(packed["data"]) == np.array([1, -2, 300, 4], dtype="<i2").tobytes()
+
+
+def test_pack_array_widens_out_of_range_coordinates():
+    packed = pack_array(np.array([0, 40000]), "int16")
+
+    assert packed["dtype"] == "int32"
+    assert unpack(packed).tolist() == [0, 40000]
+
+
+def test_pack_columnar_does_not_modify_cached_result():
+    result = format_columnar(raw_result())
+    result["rois"] = np.array([[0, 0, 10, 10]])
+    packed = pack_columnar(result)
+
+    assert packed["packed"] is True
+    assert unpack(packed["scores"]).tolist() == result["scores"].tolist()
+    assert unpack(packed["boxes"]).tolist() == result["boxes"].tolist()
+    assert unpack(packed["polygons"]).shape == (3, 4, 2)
+    assert unpack(packed["rois"]).tolist() == [[0, 0, 10, 10]]
+    assert packed["texts"] is result["texts"]
+    assert "packed" not in result
+    assert isinstance(result["boxes"], np.ndarray)
+
+
+def test_pack_columnar_leaves_ragged_polygons():
+    raw = raw_result(2)
+    raw["dt_polys"] = [np.zeros((4, 2)), np.zeros((6, 2))]
+    packed = pack_columnar(format_columnar(raw))
+
+    assert isinstance(packed["polygons"], list)
+    json.loads(dumps(packed))
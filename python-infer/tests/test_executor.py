@@ -0,0 +1,104 @@
+"""产线执行器：排队/执行计数与取消时的名额归还"""
+import asyncio
+import threading
+
+import pytest
+
+from core.executor import PipelineExecutor
+
+
+async def wait_until(predicate, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("等待超时")
+        await asyncio.sleep(0.005)
+
+
+@pytest.fixture
+def executor():
+    executor = PipelineExecutor("test", max_workers=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_run_returns_result_and_counts(executor):
+    async def scenario():
+        result, wait = await executor.run(lambda a, b=0: a + b, 1, b=2)
+        assert result == 3
+        assert wait >= 0
+        with pytest.raises(ValueError):
+            await executor.run(int, "x")
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    assert (stats["completed"], stats["failed"]) == (1, 1)
+    assert (stats["queue_depth"], stats["running"]) == (0, 0)
+
+
+def test_cancel_while_queued_returns_slot_and_skips_call(executor):
+    gate = threading.Event()
+    calls = []
+
+    async def scenario():
+        blocker = asyncio.create_task(executor.run(gate.wait, 5))
+        await wait_until(lambda: executor.running == 1)
+        queued = asyncio.create_task(executor.run(calls.append, "queued"))
+        await wait_until(lambda: executor.queued == 1)
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert executor.queued == 0
+
+        gate.set()
+        await blocker
+        # 线程池空闲后被取消的任务也不会再执行
+        await executor.run(calls.append, "after")
+
+    asyncio.run(scenario())
+    assert calls == ["after"]
+    assert executor.stats()["queue_depth"] == 0
+
+
+def test_cancel_while_running_keeps_counts_consistent(executor):
+    started = threading.Event()
+    gate = threading.Event()
+
+    def work():
+        started.set()
+        gate.wait(5)
+        return "done"
+
+    async def scenario():
+        task = asyncio.create_task(executor.run(work))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # 已开始的任务不归还排队计数，执行完毕后running归零
+        assert executor.queued == 0
+        gate.set()
+        await wait_until(lambda: executor.running == 0)
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_drops_queued_tasks_without_leaking():
+    executor = PipelineExecutor("test", max_workers=1)
+    gate = threading.Event()
+
+    async def scenario():
+        blocker = asyncio.create_task(executor.run(gate.wait, 5))
+        await wait_until(lambda: executor.running == 1)
+        queued = [asyncio.create_task(executor.run(lambda: None)) for _ in range(3)]
+        await wait_until(lambda: executor.queued == 3)
+
+        executor.shutdown()
+        results = await asyncio.gather(*queued, return_exceptions=True)
+        assert all(isinstance(r, asyncio.CancelledError) for r in results)
+        assert executor.queued == 0
+        gate.set()
+        await blocker
+
+    asyncio.run(scenario())
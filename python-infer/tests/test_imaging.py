@@ -0,0 +1,104 @@
+"""
+坐标映射测试：服务端缩小分辨率/PDF降分辨率渲染后，结果坐标按页映射回原图
+"""
+import numpy as np
+import pytest
+
+from core.imaging import rasterize_pdf_scaled, rescale_result, scale_coordinates
+from core.ingest import prepare_input
+from test_ingest import make_upload, options, pdf_bytes, png_bytes
+
+
+def test_integer_box_scaled_and_rounded():
+    assert scale_coordinates([10, 20, 30, 41], (2.0, 0.5)) == [20, 10, 60, 20]
+
+
+def test_float_points_keep_precision():
+    assert scale_coordinates([[1.5, 2.0], [3.0, 4.5]], (2.0, 3.0)) == [[3.0, 6.0], [6.0, 13.5]]
+
+
+@pytest.mark.parametrize("value", [[1, 2, 3], [True, False], "bbox", 7, []])
+def test_non_coordinates_left_alone(value):
+    assert scale_coordinates(value, (2.0, 2.0)) == value
+
+
+def test_integer_array_promoted_to_avoid_overflow():
+    boxes = np.array([[100, 200, 30000, 32000]], dtype=np.int16)
+    scaled = scale_coordinates(boxes, (2.0, 2.0))
+
+    assert scaled.dtype == np.int32
+    assert scaled.tolist() == [[200, 400, 60000, 64000]]
+    assert boxes.tolist() == [[100, 200, 30000, 32000]]
+
+
+def test_float_array_keeps_dtype():
+    polys = np.array([[[1.0, 2.0], [3.0, 4.0]]], dtype=np.float32)
+    scaled = scale_coordinates(polys, (1.5, 0.5))
+
+    assert scaled.dtype == np.float32
+    assert scaled.tolist() == [[[1.5, 1.0], [4.5, 2.0]]]
+
+
+def test_odd_width_array_left_alone():
+    scores = np.array([0.1, 0.2, 0.3])
+    assert scale_coordinates(scores, (2.0, 2.0)) is scores
+
+
+def test_rescale_only_touches_coordinate_keys():
+    result = {
+        "text": "a",
+        "score": 0.9,
+        "detected_lines": 4,
+        "regions": [{"text": "a", "bbox": [1, 2, 3, 4], "polygon": [[1, 2], [3, 4]], "size": [10, 20]}],
+    }
+    scaled = rescale_result(result, [(2.0, 2.0)])
+
+    assert scaled["regions"][0]["bbox"] == [2, 4, 6, 8]
+    assert scaled["regions"][0]["polygon"] == [[2, 4], [6, 8]]
+    assert scaled["regions"][0]["size"] == [10, 20]
+    assert scaled["detected_lines"] == 4
+    assert result["regions"][0]["bbox"] == [1, 2, 3, 4]
+
+
+def test_rescale_uses_page_scale():
+    result = {
+        "layout": [
+            {"page": 0, "bbox": [10, 10, 20, 20]},
+            {"page": 1, "bbox": [10, 10, 20, 20], "cells": [{"bbox": [1, 1, 2, 2]}]},
+            {"page": 5, "bbox": [10, 10, 20, 20]},
+            {"bbox": [10, 10, 20, 20]},
+        ]
+    }
+    scaled = rescale_result(result, [(1.0, 1.0), (3.0, 3.0)])["layout"]
+
+    assert scaled[0]["bbox"] == [10, 10, 20, 20]
+    assert scaled[1]["bbox"] == [30, 30, 60, 60]
+    # 页内嵌套元素沿用所在页的系数
+    assert scaled[1]["cells"][0]["bbox"] == [3, 3, 6, 6]
+    # 页号越界或缺失时按第一页
+    assert scaled[2]["bbox"] == [10, 10, 20, 20]
+    assert scaled[3]["bbox"] == [10, 10, 20, 20]
+
+
+@pytest.mark.parametrize("scales", [None, [], [(1.0, 1.0), (1.0, 1.0)]])
+def test_unscaled_result_returned_as_is(scales):
+    result = {"bbox": [1, 2, 3, 4]}
+    assert rescale_result(result, scales) is result
+
+
+def test_downscaled_image_maps_back_to_original():
+    prepared = prepare_input(make_upload(png_bytes(1000, 600), "png"), options(max_side=500))
+    height, width = prepared.data.shape[:2]
+
+    full = {"bbox": [0, 0, width, height]}
+    assert rescale_result(full, prepared.scales) == {"bbox": [0, 0, 1000, 600]}
+
+
+def test_pdf_render_scale_relative_to_dpi():
+    pages, scales = rasterize_pdf_scaled(pdf_bytes(1), dpi=144, max_side=100)
+
+    # 200x100pt的页面按144dpi应为400x200，受长边上限只渲染为100x50
+    assert pages[0].shape[:2] == (50, 100)
+    assert scales == [(4.0, 4.0)]
+    full = {"page": 0, "bbox": [0, 0, 100, 50]}
+    assert rescale_result(full, scales) == {"page": 0, "bbox": [0, 0, 400, 200]}
@@ -0,0 +1,118 @@
+"""
+内存摄取测试：图片内存解码、PDF栅格化、预处理缩放系数与解码失败回退临时文件
+"""
+import io
+import os
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from core import ingest
+from core.config import settings
+from core.ingest import UploadedFile, prepare_input
+from core.preprocess import PreprocessOptions
+
+
+def make_upload(content: bytes, ext: str) -> UploadedFile:
+    return UploadedFile(
+        filename=f"sample.{ext}",
+        ext=ext,
+        buffer=io.BytesIO(content),
+        size=len(content),
+        content_hash="",
+        upload_time=0.0
+    )
+
+
+def png_bytes(width: int, height: int) -> bytes:
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, :, 2] = 255
+    ok, encoded = cv2.imencode(".png", image)
+    assert ok
+    return encoded.tobytes()
+
+
+def pdf_bytes(pages: int) -> bytes:
+    buffer = io.BytesIO()
+    images = [Image.new("RGB", (200, 100), "white") for _ in range(pages)]
+    images[0].save(buffer, "PDF", resolution=72, save_all=True, append_images=images[1:])
+    return buffer.getvalue()
+
+
+def options(max_side: int = 0, grayscale: bool = False) -> PreprocessOptions:
+    return PreprocessOptions(max_side=max_side, exif_transpose=False, grayscale=grayscale, pdf_dpi=72)
+
+
+@pytest.fixture(autouse=True)
+def inmemory(monkeypatch):
+    monkeypatch.setattr(settings, "INMEMORY_INGEST", True)
+
+
+def test_image_decoded_in_memory():
+    prepared = prepare_input(make_upload(png_bytes(40, 20), "png"))
+
+    assert prepared.in_memory
+    assert isinstance(prepared.data, np.ndarray)
+    assert prepared.data.shape == (20, 40, 3)
+    assert tuple(prepared.data[0, 0]) == (0, 0, 255)  # BGR
+    assert prepared.scales is None
+    assert prepared.preprocess_time is None
+
+
+def test_image_preprocess_records_scale():
+    prepared = prepare_input(make_upload(png_bytes(400, 200), "png"), options(max_side=100))
+
+    assert prepared.data.shape[:2] == (50, 100)
+    assert prepared.scales == [(4.0, 4.0)]
+    assert prepared.preprocess_time is not None
+
+
+def test_pdf_rasterized_per_page():
+    prepared = prepare_input(make_upload(pdf_bytes(2), "pdf"), options())
+
+    assert prepared.in_memory
+    assert prepared.pages == 2
+    assert [page.shape for page in prepared.data] == [(100, 200, 3)] * 2
+    assert prepared.scales == [(1.0, 1.0)] * 2
+
+
+def test_undecodable_image_falls_back_to_temp_file():
+    upload = make_upload(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32, "png")
+    prepared = prepare_input(upload)
+    try:
+        assert not prepared.in_memory
+        assert prepared.data == prepared.temp_path
+        assert prepared.temp_path.endswith(".png")
+        with open(prepared.temp_path, "rb") as f:
+            assert f.read() == upload.read_bytes()
+    finally:
+        path = prepared.temp_path
+        prepared.cleanup()
+    assert not os.path.exists(path)
+
+
+def test_inmemory_disabled_uses_temp_file(monkeypatch):
+    monkeypatch.setattr(settings, "INMEMORY_INGEST", False)
+    prepared = prepare_input(make_upload(png_bytes(10, 10), "png"), options(max_side=5))
+    try:
+        assert prepared.temp_path is not None
+        assert prepared.preprocess is None
+        assert prepared.decode_time == 0.0
+    finally:
+        path = prepared.temp_path
+        prepared.cleanup()
+    assert not os.path.exists(path)
+
+
+def test_pdf_rasterize_failure_falls_back(monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("bad pdf")
+
+    monkeypatch.setattr(ingest, "rasterize_pdf_scaled", broken)
+    prepared = prepare_input(make_upload(pdf_bytes(1), "pdf"))
+    try:
+        assert prepared.temp_path is not None and prepared.temp_path.endswith(".pdf")
+    finally:
+        prepared.cleanup()
@@ -0,0 +1,161 @@
+"""
+任务存储测试：按创建顺序认领、多实例并发认领不重复、结果过期与重启后重新排队
+"""
+import os
+import threading
+
+import pytest
+
+from core import jobs
+from core.jobs import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobStore
+
+
+@pytest.fixture
+def store(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(jobs, "time", clock)
+    store = JobStore(str(tmp_path), result_ttl_seconds=60)
+    yield store
+    store.close()
+
+
+def create_job(store: JobStore, clock, pipeline: str = "ocrv5") -> str:
+    job_id = os.urandom(8).hex()
+    input_path = store.input_path(job_id, "png")
+    with open(input_path, "wb") as f:
+        f.write(b"\x89PNG")
+    store.create(pipeline, {"layout": "rows"}, "a.png", input_path, 4, "hash", job_id=job_id)
+    clock.advance(1)
+    return job_id
+
+
+def test_claim_in_creation_order(store, clock):
+    first = create_job(store, clock)
+    second = create_job(store, clock)
+
+    claimed = store.claim_next()
+    assert claimed["id"] == first
+    assert claimed["status"] == JOB_RUNNING
+    assert claimed["options"] == {"layout": "rows"}
+    assert store.claim_next()["id"] == second
+    assert store.claim_next() is None
+    assert store.stats()[JOB_RUNNING] == 2
+
+
+def test_concurrent_claims_never_share_a_job(tmp_path):
+    stores = [JobStore(str(tmp_path), result_ttl_seconds=60) for _ in range(4)]
+    try:
+        created = {
+            stores[0].create("ocrv5", {}, f"{i}.png", None, 1, "hash") for i in range(40)
+        }
+        claimed = []
+        lock = threading.Lock()
+
+        def worker(store):
+            while True:
+                job = store.claim_next()
+                if job is None:
+                    return
+                with lock:
+                    claimed.append(job["id"])
+
+        threads = [threading.Thread(target=worker, args=(s,)) for s in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(claimed) == sorted(created)
+    finally:
+        for store in stores:
+            store.close()
+
+
+def test_complete_stores_result_and_removes_input(store, clock):
+    job_id = create_job(store, clock)
+    input_path = store.input_path(job_id, "png")
+    store.claim_next()
+    store.update_progress(job_id, 1, 3)
+
+    job = store.get(job_id)
+    assert (job["pages_done"], job["pages_total"]) == (1, 3)
+
+    store.complete(job_id, {"text": "ok"})
+    job = store.get(job_id)
+    assert job["status"] == JOB_SUCCEEDED
+    assert job["input_path"] is None
+    assert job["expires_at"] == clock.time() + 60
+    assert not os.path.exists(input_path)
+    assert store.get_result(job_id) == {"text": "ok"}
+
+
+def test_failed_job_has_no_result(store, clock):
+    job_id = create_job(store, clock)
+    store.claim_next()
+    store.fail(job_id, "boom")
+
+    job = store.get(job_id)
+    assert job["status"] == JOB_FAILED
+    assert job["error"] == "boom"
+    assert store.get_result(job_id) is None
+
+
+def test_expired_jobs_hidden_then_purged(store, clock):
+    done = create_job(store, clock)
+    pending = create_job(store, clock)
+    store.claim_next()
+    store.complete(done, "result")
+
+    clock.advance(59)
+    assert store.get(done) is not None
+    assert store.purge_expired() == 0
+
+    clock.advance(1)
+    assert store.get(done) is None
+    assert store.purge_expired() == 1
+    assert store.get_result(done) is None
+    # 未结束的任务没有过期时间
+    assert store.get(pending)["status"] == JOB_QUEUED
+    assert os.path.exists(store.input_path(pending, "png"))
+
+
+def test_zero_ttl_keeps_results(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(jobs, "time", clock)
+    store = JobStore(str(tmp_path), result_ttl_seconds=0)
+    try:
+        job_id = create_job(store, clock)
+        store.claim_next()
+        store.complete(job_id, "result")
+        clock.advance(10 ** 6)
+        assert store.purge_expired() == 0
+        assert store.get_result(job_id) == "result"
+    finally:
+        store.close()
+
+
+def test_restart_requeues_running_jobs(tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(jobs, "time", clock)
+    store = JobStore(str(tmp_path), result_ttl_seconds=60)
+    running = create_job(store, clock)
+    finished = create_job(store, clock)
+    queued = create_job(store, clock)
+    store.claim_next()
+    store.update_progress(running, 2, 5)
+    store.claim_next()
+    store.complete(finished, "result")
+    store.close()
+
+    # 模拟网关重启：重新打开同一数据库
+    store = JobStore(str(tmp_path), result_ttl_seconds=60)
+    try:
+        assert store.requeue_interrupted() == 1
+        job = store.get(running)
+        assert job["status"] == JOB_QUEUED
+        assert job["pages_done"] == 0
+        assert job["started_at"] is None
+        assert os.path.exists(job["input_path"])
+
+        assert store.get(finished)["status"] == JOB_SUCCEEDED
+        assert store.claim_next()["id"] == running
+        assert store.claim_next()["id"] == queued
+    finally:
+        store.close()
@@ -0,0 +1,174 @@
+"""
+OCRv5多进程池测试：rows结果紧凑打包、共享内存交接与回收、工作进程异常退出后的重启
+（工作进程为spawn启动的真实子进程，服务由可pickle的工厂在子进程中构造）
+"""
+import functools
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from services import ocr_v5_pool
+from services.ocr_v5_pool import OCRv5ProcessPool, PackedRows, _pack_prediction, _pack_rows, _unpack_rows
+from stub_services import StubOCRv5Service, stub_ocrv5_service, synthetic_results
+
+
+class EchoService(StubOCRv5Service):
+    """把收到的数组摘要作为识别结果返回，用于核对共享内存交接的内容"""
+
+    def __init__(self, **service_kwargs):
+        self.options = {"echo": True, "device": service_kwargs.get("device")}
+
+    def predict(self, input, layout: str = "rows", **kwargs) -> dict:
+        images = input if isinstance(input, list) else [input]
+        if any(not isinstance(image, np.ndarray) for image in images):
+            raise TypeError(f"expected ndarray, got {type(input).__name__}")
+        texts = [f"{image.shape}:{image.dtype}:{int(image.sum())}" for image in images]
+        return {
+            "result": {
+                "text": "\n".join(texts),
+                "regions": [
+                    {"text": text, "score": 0.5, "bbox": [0, i, image.shape[1], i + 1]}
+                    for i, (text, image) in enumerate(zip(texts, images))
+                ],
+                "detected_lines": len(texts),
+                "pid": os.getpid(),
+            },
+            "inference_time": 0.0,
+        }
+
+    def predict_regions(self, image, regions: list, layout: str = "rows", mode: str = "line") -> dict:
+        if mode == "crash":
+            os._exit(3)
+        raise ValueError(f"bad regions: {regions}")
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = OCRv5ProcessPool(processes=1, devices=["cpu"], start_timeout=60, service_factory=EchoService)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def shared_names(monkeypatch):
+    """记录网关侧创建的共享内存块名称"""
+    names = []
+    to_shared = ocr_v5_pool._to_shared
+
+    def recording(image):
+        descriptor, shm = to_shared(image)
+        names.append(shm.name)
+        return descriptor, shm
+
+    monkeypatch.setattr(ocr_v5_pool, "_to_shared", recording)
+    return names
+
+
+def assert_unlinked(names: list):
+    assert names
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_pack_rows_round_trip():
+    result = synthetic_results(lines=5)["ocrv5"][0]
+    result = {**result, "model": "PP-OCRv5"}
+    packed = _pack_rows(result)
+
+    assert isinstance(packed, PackedRows)
+    assert packed.columns["bbox"].dtype == np.int16
+    assert packed.columns["polygon"].shape == (5, 4, 2)
+    # 0.98无法无损转为float32，保留float64
+    assert packed.columns["score"].dtype == np.float64
+    assert packed.extra == {"model": "PP-OCRv5"}
+    assert _unpack_rows(packed) == result
+
+
+def test_compact_array_keeps_lossy_and_ragged_values():
+    result = {
+        "text": "a\nb",
+        "regions": [
+            {"text": "a", "score": 0.5, "bbox": [0, 0, 70000, 1], "polygon": [[0, 0]]},
+            {"text": "b", "score": 0.25, "bbox": [0, 0, 1, 1], "polygon": [[0, 0], [1, 1]]},
+        ],
+        "detected_lines": 2,
+    }
+    packed = _pack_rows(result)
+
+    assert packed.columns["score"].dtype == np.float32
+    assert packed.columns["bbox"].dtype == np.int32
+    assert packed.columns["polygon"] == [[[0, 0]], [[0, 0], [1, 1]]]
+    assert _unpack_rows(packed) == result
+
+
+@pytest.mark.parametrize("result", [
+    {"text": "", "regions": [], "detected_lines": 0},
+    {"text": "a\nb", "regions": [{"text": "a"}, {"text": "b", "score": 1.0}], "detected_lines": 2},
+    {"text": "a", "regions": [{"text": "a"}], "detected_lines": 2},
+    {"layout": "columnar", "texts": ["a"]},
+])
+def test_irregular_results_left_as_is(result):
+    assert _pack_prediction({"result": result}) == {"result": result}
+
+
+def test_predict_hands_array_over_shared_memory(pool, shared_names):
+    image = np.arange(6 * 8 * 3, dtype=np.uint8).reshape(6, 8, 3)
+    prediction = pool.predict(image)
+
+    result = prediction["result"]
+    assert result["text"] == f"(6, 8, 3):uint8:{int(image.sum())}"
+    assert result["regions"] == [{"text": result["text"], "score": 0.5, "bbox": [0, 0, 8, 1]}]
+    assert result["pid"] != os.getpid()
+    assert_unlinked(shared_names)
+
+
+def test_predict_batch_shares_every_page(pool, shared_names):
+    pages = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(3)]
+    prediction = pool.predict(pages)
+
+    assert prediction["result"]["text"].splitlines() == [
+        f"(4, 4, 3):uint8:{i * 48}" for i in range(3)
+    ]
+    assert len(shared_names) == 3
+    assert_unlinked(shared_names)
+
+
+def test_worker_error_propagates_and_releases_memory(pool, shared_names):
+    with pytest.raises(RuntimeError, match="ValueError: bad regions"):
+        pool.predict_regions(np.zeros((2, 2, 3), dtype=np.uint8), [[0, 0, 1, 1]])
+    assert_unlinked(shared_names)
+    assert pool.workers[0].outstanding == 0
+
+
+def test_worker_crash_fails_request_and_restarts(shared_names):
+    pool = OCRv5ProcessPool(processes=1, devices=["cpu"], start_timeout=60, service_factory=EchoService)
+    try:
+        worker = pool.workers[0]
+        first_pid = worker.pid
+        with pytest.raises(RuntimeError, match="exitcode=3"):
+            pool.predict_regions(np.zeros((2, 2, 3), dtype=np.uint8), [], mode="crash")
+        assert_unlinked(shared_names)
+
+        deadline = time.time() + 60
+        while not (worker.alive and worker.pid != first_pid) and time.time() < deadline:
+            time.sleep(0.05)
+        assert worker.alive and worker.restarts == 1
+        assert worker.pid != first_pid
+        assert pool.predict(np.ones((1, 1, 3), dtype=np.uint8))["result"]["text"] == "(1, 1, 3):uint8:3"
+    finally:
+        pool.close()
+
+
+def test_stub_factory_results_round_trip():
+    results = synthetic_results(lines=3)["ocrv5"]
+    factory = functools.partial(stub_ocrv5_service, "fixed:0", results)
+    pool = OCRv5ProcessPool(processes=1, devices=["cpu"], start_timeout=60, service_factory=factory)
+    try:
+        assert pool.options["stub"] is True
+        assert pool.predict(np.zeros((2, 2, 3), dtype=np.uint8))["result"] == results[0]
+    finally:
+        pool.close()
@@ -0,0 +1,157 @@
+"""
+逐页结果复用测试：页面像素哈希、逐页存储查询/写入，StructureV3与VL只推理新增或变化的页
+（模型替换为按页面像素返回结果的假模型）
+"""
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from core import cache
+from core.cache import ResultCache, hash_page, lookup_pages, store_page
+from services.structure_v3 import StructureV3Service
+from services.vl_service import VLService
+
+
+def page(value: int, shape=(8, 6, 3)) -> np.ndarray:
+    return np.full(shape, value, dtype=np.uint8)
+
+
+@pytest.fixture
+def page_store(monkeypatch):
+    store = ResultCache(memory_max_bytes=1024 * 1024, disk_dir=None, disk_max_bytes=0, ttl_seconds=0)
+    monkeypatch.setattr(cache, "page_cache", store)
+    return store
+
+
+def test_hash_page_covers_pixels_shape_and_dtype():
+    base = page(1)
+    assert hash_page(base) == hash_page(page(1))
+    assert hash_page(base) != hash_page(page(2))
+    assert hash_page(base) != hash_page(page(1, shape=(6, 8, 3)))
+    assert hash_page(base) != hash_page(base.astype(np.uint16))
+    # 非连续视图按像素内容计算
+    wide = np.full((8, 12, 3), 1, dtype=np.uint8)
+    assert hash_page(wide[:, ::2]) == hash_page(base)
+
+
+def test_lookup_without_store_returns_placeholders(monkeypatch):
+    monkeypatch.setattr(cache, "page_cache", None)
+    assert lookup_pages([page(1), page(2)], "vl", "json", {}) == ([None, None], [None, None])
+    store_page("key", {"text": "ignored"})
+
+
+def test_lookup_after_store(page_store):
+    keys, stored = lookup_pages([page(1), page(2)], "vl", "json", {"device": "cpu"})
+    assert stored == [None, None]
+    store_page(keys[1], {"text": "two"})
+
+    again, stored = lookup_pages([page(9), page(2)], "vl", "json", {"device": "cpu"})
+    assert again[1] == keys[1]
+    assert stored == [None, {"text": "two"}]
+    # 产线、输出格式与服务参数不同不复用
+    assert lookup_pages([page(2)], "structure", "json", {"device": "cpu"})[1] == [None]
+    assert lookup_pages([page(2)], "vl", "markdown", {"device": "cpu"})[1] == [None]
+    assert lookup_pages([page(2)], "vl", "json", {"device": "gpu:0"})[1] == [None]
+
+
+class FakeStructureModel:
+    def __init__(self):
+        self.calls = []
+
+    def predict_iter(self, input):
+        pages = input if isinstance(input, list) else [input]
+        self.calls.append([int(p[0, 0, 0]) for p in pages])
+        for p in pages:
+            yield {"value": int(p[0, 0, 0])}
+
+
+def structure_service() -> StructureV3Service:
+    service = StructureV3Service.__new__(StructureV3Service)
+    service.options = {"device": "cpu"}
+    service.model = FakeStructureModel()
+    service._format_json_result = lambda res: {
+        "layout": [{"label": "text", "content": str(res["value"])}], "tables": [], "formulas": [], "parsing_res": []
+    }
+    return service
+
+
+def layout_contents(result: dict) -> list:
+    return [(item["content"], item["page"]) for item in result["layout"]]
+
+
+def test_structure_recomputes_only_changed_pages(page_store):
+    service = structure_service()
+    first = service.predict([page(1), page(2), page(3)])
+    assert service.model.calls == [[1, 2, 3]]
+    assert (first["pages_reused"], first["pages_recomputed"]) == (0, 3)
+
+    second = service.predict([page(1), page(5), page(3), page(2)])
+    assert service.model.calls[-1] == [5]
+    assert (second["pages_reused"], second["pages_recomputed"]) == (3, 1)
+    assert layout_contents(second["result"]) == [("1", 0), ("5", 1), ("3", 2), ("2", 3)]
+
+
+def test_structure_stream_marks_reused_pages(page_store):
+    service = structure_service()
+    service.predict([page(1)])
+    events = list(service.predict_stream([page(1), page(4)]))
+
+    assert [(e["page"], e["reused"]) for e in events] == [(0, True), (1, False)]
+    assert events[0]["result"]["layout"][0]["content"] == "1"
+
+
+def test_structure_all_pages_reused_skips_model(page_store):
+    service = structure_service()
+    service.predict([page(1), page(2)])
+    result = service.predict([page(2), page(1)])
+
+    assert service.model.calls == [[1, 2]]
+    assert result["pages_recomputed"] == 0
+    assert layout_contents(result["result"]) == [("2", 0), ("1", 1)]
+
+
+class FakeVLModel:
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, input):
+        pages = input if isinstance(input, list) else [input]
+        self.calls.append([int(p[0, 0, 0]) for p in pages])
+        return [
+            {"parsing_res_list": [SimpleNamespace(label="text", content=str(int(p[0, 0, 0])), bbox=None)],
+             "layout_det_res": {}}
+            for p in pages
+        ]
+
+
+def vl_service() -> VLService:
+    service = VLService.__new__(VLService)
+    service.options = {"device": "cpu"}
+    service.vl_ocr = FakeVLModel()
+    service._vl_lock = threading.Lock()
+    service._page_pool = None
+    return service
+
+
+def test_vl_reuses_pages_and_restamps_page_numbers(page_store):
+    service = vl_service()
+    service._predict_page_list([page(1), page(2), page(3)], "json")
+
+    progress = []
+    result = service._predict_page_list([page(7), page(3), page(1)], "json", progress.append)
+    assert service.vl_ocr.calls[-1] == [7]
+    assert (result["pages_reused"], result["pages_recomputed"]) == (2, 1)
+    assert layout_contents(result["result"]) == [("7", 0), ("3", 1), ("1", 2)]
+    assert result["result"]["text"] == "7\n3\n1"
+    assert progress[-1] == 3
+
+
+def test_vl_reuse_matches_fresh_result(page_store):
+    pages = [page(4), page(5)]
+    fresh = vl_service()._predict_page_list(pages, "json")["result"]
+    reused = vl_service()._predict_page_list(pages, "json")
+
+    assert reused["pages_reused"] == 2
+    assert reused["result"] == fresh
@@ -0,0 +1,158 @@
+"""
+区域识别测试：regions参数解析与规整、透视裁剪，line/detect模式的结果坐标映射回原图
+（识别与检测模型替换为假模型）
+"""
+import threading
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from api.v1.ocr import parse_regions
+from core.config import settings
+from services.ocr_v5 import OCRv5Service, crop_region, normalize_region
+
+
+@pytest.mark.parametrize("region, expected", [
+    ([10, 20, 110, 60], [[10, 20], [110, 20], [110, 60], [10, 60]]),
+    # 反向给出的矩形同样规整为从左上角起顺时针
+    ([110, 60, 10, 20], [[10, 20], [110, 20], [110, 60], [10, 60]]),
+    # 逆时针给出的多边形
+    ([[110, 60], [110, 20], [10, 20], [10, 60]], [[10, 20], [110, 20], [110, 60], [10, 60]]),
+    ([[0, 0], [10, 0], [10, 5], [0, 5], [0, 2.5]], [[0, 0], [10, 0], [10, 5], [0, 5]]),
+])
+def test_normalize_region(region, expected):
+    assert normalize_region(region) == expected
+
+
+def test_normalize_rotated_quad_keeps_points():
+    quad = [[50, 0], [100, 50], [50, 100], [0, 50]]
+    normalized = normalize_region(quad)
+    assert sorted(map(tuple, normalized)) == sorted(map(tuple, quad))
+    # 顺时针：从左上角（x+y最小）出发，下一个点在其右侧
+    assert normalized[1][0] > normalized[0][0]
+
+
+@pytest.mark.parametrize("region, message", [
+    ([1, 2, 3], "应为"),
+    ([[1, 2], [3, 4]], "应为"),
+    (["a", "b", "c", "d"], "应为"),
+    ([[1, 2], [3, 4], [5]], "应为"),
+    ([0, 0, float("nan"), 10], "有限数值"),
+    ([5, 5, 5, 20], "面积为零"),
+    ([[0, 0], [5, 5], [10, 10]], "面积为零"),
+])
+def test_normalize_region_rejects(region, message):
+    with pytest.raises(ValueError, match=message):
+        normalize_region(region)
+
+
+@pytest.mark.parametrize("value", [None, "", "   "])
+def test_parse_regions_absent(value):
+    assert parse_regions(value) is None
+
+
+@pytest.mark.parametrize("value, detail", [
+    ("[1, 2", "JSON数组"),
+    ("{}", "非空JSON数组"),
+    ("[]", "非空JSON数组"),
+    ("[[0, 0, 10, 10], [1, 1, 1, 1]]", "regions[1]"),
+])
+def test_parse_regions_errors(value, detail):
+    with pytest.raises(HTTPException) as excinfo:
+        parse_regions(value)
+    assert excinfo.value.status_code == 400
+    assert detail in excinfo.value.detail
+
+
+def test_parse_regions_limit(monkeypatch):
+    monkeypatch.setattr(settings, "OCRV5_MAX_REGIONS", 2)
+    assert len(parse_regions("[[0, 0, 10, 10], [0, 0, 5, 5]]")) == 2
+    with pytest.raises(HTTPException) as excinfo:
+        parse_regions("[[0, 0, 10, 10], [0, 0, 5, 5], [0, 0, 2, 2]]")
+    assert "超过上限" in excinfo.value.detail
+
+
+def test_crop_region_inverse_maps_back():
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    image[20:60, 30:130] = 255
+    crop, inverse, quad = crop_region(image, normalize_region([30, 20, 130, 60]))
+
+    assert crop.shape == (40, 100, 3)
+    assert crop[5:-5, 5:-5].min() == 255
+    corners = np.array([[0, 0, 1], [100, 40, 1]], dtype=np.float64) @ inverse.T
+    np.testing.assert_allclose(corners[:, :2] / corners[:, 2:], [[30, 20], [130, 60]], atol=1e-6)
+
+
+def test_crop_region_clipped_to_image():
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    crop, inverse, quad = crop_region(image, normalize_region([150, 50, 400, 300]))
+    assert quad.max(axis=0).tolist() == [199, 99]
+    assert crop.shape[:2] == (49, 49)
+
+    crop, inverse, quad = crop_region(image, normalize_region([300, 300, 400, 400]))
+    assert crop is None and inverse is None
+
+
+class FakeRecognizer:
+    def __init__(self):
+        self.inputs = []
+
+    def predict(self, input, batch_size):
+        self.inputs = input
+        return [{"rec_text": f"{crop.shape[1]}x{crop.shape[0]}", "rec_score": 0.9} for crop in input]
+
+
+class FakeDetector:
+    """在每个裁剪图的(2, 3)-(12, 8)处返回一行文本"""
+
+    def predict(self, crops):
+        return [
+            {"rec_texts": [f"crop{i}"], "rec_scores": [0.8],
+             "dt_polys": [np.array([[2, 3], [12, 3], [12, 8], [2, 8]])]}
+            for i, _ in enumerate(crops)
+        ]
+
+
+def service() -> OCRv5Service:
+    service = OCRv5Service.__new__(OCRv5Service)
+    service.options = {"device": "cpu"}
+    service._recognizer = FakeRecognizer()
+    service._recognizer_lock = threading.Lock()
+    service.ocr = FakeDetector()
+    return service
+
+
+IMAGE = np.zeros((200, 300, 3), dtype=np.uint8)
+
+
+def test_line_mode_one_line_per_region():
+    ocr = service()
+    regions = [normalize_region([10, 10, 110, 40]), normalize_region([200, 20, 220, 120]),
+               normalize_region([500, 500, 600, 600])]
+    result = ocr.predict_regions(IMAGE, regions)["result"]
+
+    # 竖排区域旋转为横排后识别；完全在图片外的区域返回空文本
+    assert [crop.shape[:2] for crop in ocr._recognizer.inputs] == [(30, 100), (20, 100)]
+    assert [r["text"] for r in result["regions"]] == ["100x30", "100x20", ""]
+    assert [r["roi"] for r in result["regions"]] == [0, 1, 2]
+    assert result["regions"][0]["bbox"] == [10, 10, 110, 40]
+    assert result["regions"][0]["polygon"] == [[10, 10], [110, 10], [110, 40], [10, 40]]
+
+
+def test_detect_mode_maps_boxes_to_original():
+    regions = [normalize_region([100, 50, 200, 100]), normalize_region([0, 0, 50, 50])]
+    result = service().predict_regions(IMAGE, regions, mode="detect")["result"]
+
+    assert [r["roi"] for r in result["regions"]] == [0, 1]
+    assert result["regions"][0]["bbox"] == [102, 53, 112, 58]
+    assert result["regions"][1]["bbox"] == [2, 3, 12, 8]
+
+
+def test_columnar_layout_has_rois_array():
+    regions = [normalize_region([10, 10, 110, 40]), normalize_region([10, 50, 110, 80])]
+    result = service().predict_regions(IMAGE, regions, layout="columnar", mode="detect")["result"]
+
+    assert result["layout"] == "columnar"
+    assert result["rois"].tolist() == [0, 1]
+    assert result["boxes"].tolist() == [[12, 13, 22, 18], [12, 53, 22, 58]]
@@ -0,0 +1,164 @@
+"""
+响应序列化测试：NaN/inf输出null、NumPy与Pydantic对象单次编码，orjson与标准库回退结果一致；
+按Accept协商编码，二进制编码中数组以原始小端缓冲区传输
+"""
+import json
+import math
+
+import numpy as np
+import pytest
+from pydantic import BaseModel
+
+from core.serialization import (
+    CBOR_MEDIA_TYPE, ENCODERS, JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE,
+    _dumps_stdlib, dumps, encode, negotiate_media_type, to_payload
+)
+
+
+class Inner(BaseModel):
+    score: float
+
+
+class Outer(BaseModel):
+    name: str
+    inner: Inner
+    result: dict
+
+
+DUMPERS = [pytest.param(dumps, id="dumps"), pytest.param(_dumps_stdlib, id="stdlib")]
+
+
+@pytest.mark.parametrize("dump", DUMPERS)
+def test_non_finite_floats_become_null(dump):
+    obj = {"a": math.nan, "b": [math.inf, -math.inf, 1.5], "c": np.float32("nan")}
+    assert json.loads(dump(obj)) == {"a": None, "b": [None, None, 1.5], "c": None}
+
+
+@pytest.mark.parametrize("dump", DUMPERS)
+def test_numpy_values_encoded_directly(dump):
+    obj = {
+        "boxes": np.array([[1, 2], [3, 4]], dtype=np.int16),
+        "scores": np.array([0.5, 0.25], dtype=np.float32),
+        "count": np.int64(7),
+        "flag": np.bool_(True),
+    }
+    assert json.loads(dump(obj)) == {
+        "boxes": [[1, 2], [3, 4]], "scores": [0.5, 0.25], "count": 7, "flag": True
+    }
+
+
+@pytest.mark.parametrize("dump", DUMPERS)
+def test_models_tuples_and_text(dump):
+    obj = Outer(name="页面", inner=Inner(score=0.5), result={"pt": (1, 2), "tags": {"x"}})
+    assert json.loads(dump(obj)) == {
+        "name": "页面", "inner": {"score": 0.5}, "result": {"pt": [1, 2], "tags": ["x"]}
+    }
+    # 非ASCII字符按UTF-8原样输出，不转义
+    assert "页面".encode("utf-8") in dump(obj)
+
+
+@pytest.mark.parametrize("dump", DUMPERS)
+def test_unsupported_type_raises(dump):
+    with pytest.raises(TypeError):
+        dump({"x": object()})
+
+
+def test_stdlib_matches_default_encoder():
+    obj = {
+        "text": "a\n\"b\"",
+        "regions": [{"bbox": np.arange(4), "score": np.float64(0.98)}, {"score": math.nan}],
+        "nested": [[1.0, 2], None, True],
+    }
+    assert json.loads(_dumps_stdlib(obj)) == json.loads(dumps(obj))
+
+
+def test_to_payload_is_shallow():
+    result = {"boxes": np.zeros(2)}
+    model = Outer(name="n", inner=Inner(score=1.0), result=result)
+    payload = to_payload(model)
+
+    assert set(payload) == {"name", "inner", "result"}
+    assert payload["inner"] is model.inner
+    assert payload["result"] is model.result
+
+
+# ---------- 编码协商 ----------
+
+@pytest.fixture
+def binary_encoders(monkeypatch):
+    """让协商结果不依赖部署环境是否安装msgpack/cbor2"""
+    monkeypatch.setitem(ENCODERS, MSGPACK_MEDIA_TYPE, lambda obj: b"msgpack")
+    monkeypatch.setitem(ENCODERS, CBOR_MEDIA_TYPE, lambda obj: b"cbor")
+
+
+@pytest.mark.parametrize("accept, expected", [
+    (None, JSON_MEDIA_TYPE),
+    ("", JSON_MEDIA_TYPE),
+    ("application/json", JSON_MEDIA_TYPE),
+    ("application/msgpack", MSGPACK_MEDIA_TYPE),
+    ("application/x-msgpack", MSGPACK_MEDIA_TYPE),
+    ("Application/CBOR", CBOR_MEDIA_TYPE),
+    ("application/json;q=0.5, application/cbor", CBOR_MEDIA_TYPE),
+    ("application/cbor;q=0.8, application/msgpack;q=0.8", CBOR_MEDIA_TYPE),
+    ("application/msgpack;q=0.3, */*;q=0.5", JSON_MEDIA_TYPE),
+    ("application/msgpack;q=0, application/json;q=0.1", JSON_MEDIA_TYPE),
+    ("application/msgpack;q=oops, application/cbor;q=0.1", CBOR_MEDIA_TYPE),
+    ("text/html,application/xhtml+xml", JSON_MEDIA_TYPE),
+    ("application/json;q=0, application/cbor", CBOR_MEDIA_TYPE),
+    ("application/json;q=0", None),
+    ("*/*;q=0, text/html", None),
+])
+def test_negotiate_media_type(binary_encoders, accept, expected):
+    assert negotiate_media_type(accept) == expected
+
+
+def test_uninstalled_encoder_not_negotiated(monkeypatch):
+    monkeypatch.delitem(ENCODERS, MSGPACK_MEDIA_TYPE, raising=False)
+    assert negotiate_media_type("application/msgpack") == JSON_MEDIA_TYPE
+    assert negotiate_media_type("application/msgpack, application/json;q=0") is None
+
+
+def test_refused_json_is_406(binary_encoders):
+    from fastapi import HTTPException
+    from api.v1.ocr import negotiate_response_type
+
+    assert negotiate_response_type("application/cbor") == CBOR_MEDIA_TYPE
+    with pytest.raises(HTTPException) as excinfo:
+        negotiate_response_type("application/json;q=0")
+    assert excinfo.value.status_code == 406
+
+
+# ---------- 二进制编码 ----------
+
+def test_msgpack_arrays_as_raw_buffers():
+    msgpack = pytest.importorskip("msgpack")
+    boxes = np.array([[1, 2], [3, 4]], dtype=">i4")
+    obj = {"boxes": boxes, "score": np.float32(0.5), "names": np.array(["a"]), "text": "页"}
+    decoded = msgpack.unpackb(encode(obj, MSGPACK_MEDIA_TYPE), raw=False)
+
+    raw = decoded["boxes"]
+    assert (raw["dtype"], raw["shape"]) == ("int32", [2, 2])
+    assert np.frombuffer(raw["data"], dtype="<i4").reshape(raw["shape"]).tolist() == boxes.tolist()
+    assert decoded["score"] == 0.5
+    assert decoded["names"] == ["a"]
+    assert decoded["text"] == "页"
+
+
+def test_cbor_typed_arrays():
+    cbor2 = pytest.importorskip("cbor2")
+    obj = {
+        "scores": np.array([0.5, 0.25], dtype=np.float32),
+        "polys": np.arange(8, dtype=np.int16).reshape(2, 2, 2),
+        "count": np.int64(3),
+    }
+    decoded = cbor2.loads(encode(obj, CBOR_MEDIA_TYPE))
+
+    scores = decoded["scores"]
+    assert scores.tag == 85
+    assert np.frombuffer(scores.value, dtype="<f4").tolist() == [0.5, 0.25]
+    polys = decoded["polys"]
+    assert polys.tag == 40
+    shape, typed = polys.value
+    assert list(shape) == [2, 2, 2] and typed.tag == 77
+    assert np.frombuffer(typed.value, dtype="<i2").reshape(shape).tolist() == obj["polys"].tolist()
+    assert decoded["count"] == 3
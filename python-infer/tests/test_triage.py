@@ -0,0 +1,145 @@
+"""
+自动路由分诊测试：decide阈值边界与判定优先级，合成页面上的特征提取
+"""
+import io
+
+import cv2
+import numpy as np
+import pytest
+
+from core.config import settings
+from core.ingest import UploadedFile
+from core.triage import TriageFeatures, TriageThresholds, decide, page_features, triage
+
+THRESHOLDS = TriageThresholds(
+    table_min_intersections=12,
+    table_min_ruling_lines=8,
+    vl_min_graphic_ratio=0.2,
+    vl_min_text_density=0.15,
+    vl_max_pages=10,
+)
+
+
+def features(**overrides) -> TriageFeatures:
+    values = dict(pages=1, text_density=0.05, ruling_lines=0, grid_intersections=0, graphic_ratio=0.0)
+    values.update(overrides)
+    return TriageFeatures(**values)
+
+
+@pytest.mark.parametrize("overrides, expected", [
+    ({}, ("ocrv5", "plain_text")),
+    ({"grid_intersections": 11}, ("ocrv5", "plain_text")),
+    ({"grid_intersections": 12}, ("structure", "table_grid")),
+    ({"ruling_lines": 7}, ("ocrv5", "plain_text")),
+    ({"ruling_lines": 8}, ("structure", "ruling_lines")),
+    ({"graphic_ratio": 0.19}, ("ocrv5", "plain_text")),
+    ({"graphic_ratio": 0.2}, ("vl", "graphics")),
+    ({"text_density": 0.15}, ("vl", "dense_layout")),
+    ({"text_density": 0.15, "pages": 10}, ("vl", "dense_layout")),
+    ({"text_density": 0.15, "pages": 11}, ("structure", "long_document")),
+    ({"graphic_ratio": 0.5, "pages": 11}, ("structure", "long_document")),
+    ({"ruling_lines": 20, "pages": 50}, ("structure", "ruling_lines")),
+])
+def test_decide_thresholds(overrides, expected):
+    assert decide(features(**overrides), THRESHOLDS) == expected
+
+
+def test_decide_priority():
+    # 表格网格优先于图形与密集版面
+    assert decide(features(grid_intersections=40, graphic_ratio=0.9, text_density=0.9), THRESHOLDS)[0] == "structure"
+    # 插图边框形成的线条不抢占图形判定
+    assert decide(features(graphic_ratio=0.3, ruling_lines=30), THRESHOLDS) == ("vl", "graphics")
+    # 图形判定优先于密集版面
+    assert decide(features(graphic_ratio=0.3, text_density=0.3), THRESHOLDS) == ("vl", "graphics")
+
+
+def test_thresholds_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "AUTO_VL_MAX_PAGES", 3)
+    thresholds = TriageThresholds.from_settings()
+    assert thresholds.vl_max_pages == 3
+    assert thresholds.table_min_intersections == settings.AUTO_TABLE_MIN_INTERSECTIONS
+
+
+def blank(height: int = 600, width: int = 800) -> np.ndarray:
+    return np.full((height, width), 255, dtype=np.uint8)
+
+
+def grid_page() -> np.ndarray:
+    image = blank()
+    for y in range(100, 501, 80):
+        cv2.line(image, (100, y), (700, y), 0, 2)
+    for x in range(100, 701, 150):
+        cv2.line(image, (x, 100), (x, 500), 0, 2)
+    return image
+
+
+def text_page(lines: int = 20) -> np.ndarray:
+    image = blank()
+    for i in range(lines):
+        cv2.putText(image, "Sample text line for triage", (40, 30 + 28 * i), cv2.FONT_HERSHEY_SIMPLEX, 0.8, 0, 2)
+    return image
+
+
+def photo_page() -> np.ndarray:
+    image = blank()
+    rng = np.random.default_rng(0)
+    image[100:500, 100:700] = rng.integers(60, 200, size=(400, 600), dtype=np.uint8)
+    return image
+
+
+def test_blank_page_has_no_features():
+    assert page_features(blank(), 1024) == {
+        "text_density": 0.0, "ruling_lines": 0, "grid_intersections": 0, "graphic_ratio": 0.0
+    }
+
+
+def test_grid_page_detected_as_table():
+    result = page_features(grid_page(), 1024)
+    assert result["grid_intersections"] == 6 * 5
+    assert result["ruling_lines"] == 6 + 5
+    assert result["graphic_ratio"] == 0.0
+
+
+def test_text_page_density_without_lines():
+    result = page_features(text_page(), 1024)
+    assert result["text_density"] > 0.01
+    assert result["ruling_lines"] == 0
+    assert result["grid_intersections"] == 0
+
+
+def test_photo_region_detected_as_graphic():
+    result = page_features(photo_page(), 1024)
+    assert result["graphic_ratio"] == pytest.approx(400 * 600 / (600 * 800), abs=0.1)
+    # 图形区域不计入文字与线条
+    assert result["text_density"] < 0.01
+
+
+def test_dark_background_inverted():
+    light = page_features(grid_page(), 1024)
+    dark = page_features(255 - grid_page(), 1024)
+    assert dark["grid_intersections"] == light["grid_intersections"]
+
+
+def test_features_independent_of_resolution():
+    small = page_features(grid_page(), 1024)
+    large = page_features(cv2.resize(grid_page(), (1600, 1200), interpolation=cv2.INTER_NEAREST), 800)
+    assert large["grid_intersections"] == small["grid_intersections"]
+
+
+def make_upload(content: bytes, ext: str) -> UploadedFile:
+    return UploadedFile(f"page.{ext}", ext, io.BytesIO(content), len(content), "", 0.0)
+
+
+def test_triage_routes_encoded_image():
+    ok, encoded = cv2.imencode(".png", grid_page())
+    decision = triage(make_upload(encoded.tobytes(), "png"), THRESHOLDS)
+
+    assert (decision.pipeline, decision.reason) == ("structure", "table_grid")
+    assert decision.features.pages == 1
+    assert decision.triage_time >= 0
+
+
+def test_undecodable_upload_goes_to_vl():
+    decision = triage(make_upload(b"\x89PNG\r\n\x1a\n" + b"\x00" * 16, "png"), THRESHOLDS)
+    assert (decision.pipeline, decision.reason) == ("vl", "triage_failed")
+    assert decision.features is None
@@ -0,0 +1,150 @@
+"""
+上传校验测试：分块读取时的大小上限(413)、扩展名与文件头魔数校验(400)
+"""
+import asyncio
+import io
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import UploadFile
+
+from api.v1.ocr import UploadSpooler, process_upload_file
+from core.config import settings
+from core.ingest import MAGIC_SNIFF_BYTES, normalize_ext, sniff_file_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+JPG = b"\xff\xd8\xff\xe0" + b"\x00" * 64
+PDF = b"%PDF-1.7\n" + b"\x00" * 64
+
+
+@pytest.fixture(autouse=True)
+def limits(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 1)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE_KB", 64)
+
+
+def upload(content: bytes, filename: str, declared: bool = True) -> UploadFile:
+    return UploadFile(
+        file=io.BytesIO(content),
+        filename=filename,
+        size=len(content) if declared else None
+    )
+
+
+def status_of(excinfo) -> int:
+    return excinfo.value.status_code
+
+
+@pytest.mark.parametrize("head, expected", [
+    (PNG, "png"),
+    (JPG, "jpg"),
+    (b"BM" + b"\x00" * 16, "bmp"),
+    (PDF, "pdf"),
+    (b"\x00" * 100 + b"%PDF-1.4", "pdf"),
+    (b"\x00" * MAGIC_SNIFF_BYTES + b"%PDF-1.4", None),
+    (b"GIF89a", None),
+    (b"", None),
+])
+def test_sniff_file_type(head, expected):
+    assert sniff_file_type(head) == expected
+
+
+def test_normalize_ext():
+    assert normalize_ext("JPEG") == "jpg"
+    assert normalize_ext("Png") == "png"
+
+
+def test_disallowed_extension_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        UploadSpooler("notes.gif")
+    assert status_of(excinfo) == 400
+
+
+def test_declared_size_rejected_before_reading():
+    spooler = UploadSpooler("big.png")
+    try:
+        spooler.check_declared_size(1024 * 1024)
+        with pytest.raises(HTTPException) as excinfo:
+            spooler.check_declared_size(1024 * 1024 + 1)
+        assert status_of(excinfo) == 413
+        assert spooler.size == 0
+    finally:
+        spooler.close()
+
+
+def test_size_limit_enforced_mid_stream():
+    spooler = UploadSpooler("big.png")
+    try:
+        spooler.write(PNG)
+        chunk = b"\x00" * (512 * 1024)
+        spooler.write(chunk)
+        with pytest.raises(HTTPException) as excinfo:
+            spooler.write(chunk)
+        assert status_of(excinfo) == 413
+    finally:
+        spooler.close()
+
+
+def test_head_accumulated_across_small_chunks():
+    spooler = UploadSpooler("split.png")
+    try:
+        for i in range(0, len(PNG), 3):
+            spooler.write(PNG[i:i + 3])
+        uploaded = spooler.finish(0.0)
+        assert uploaded.ext == "png"
+        assert uploaded.size == len(PNG)
+        assert uploaded.read_bytes() == PNG
+        assert len(spooler.head) <= MAGIC_SNIFF_BYTES
+    finally:
+        spooler.close()
+
+
+def test_empty_file_rejected():
+    spooler = UploadSpooler("empty.png")
+    try:
+        with pytest.raises(HTTPException) as excinfo:
+            spooler.finish(0.0)
+        assert status_of(excinfo) == 400
+    finally:
+        spooler.close()
+
+
+def test_unknown_content_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(process_upload_file(upload(b"GIF89a" + b"\x00" * 32, "fake.png")))
+    assert status_of(excinfo) == 400
+
+
+def test_disallowed_content_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "ALLOWED_EXTENSIONS", {"png", "jpg"})
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(process_upload_file(upload(PDF, "scan.png")))
+    assert status_of(excinfo) == 400
+
+
+def test_extension_mismatch_uses_sniffed_type():
+    uploaded = asyncio.run(process_upload_file(upload(JPG, "photo.png")))
+    try:
+        assert uploaded.ext == "jpg"
+        assert uploaded.filename == "photo.png"
+    finally:
+        uploaded.close()
+
+
+def test_process_upload_file_reads_in_chunks():
+    content = PDF + b"\x01" * (200 * 1024)
+    uploaded = asyncio.run(process_upload_file(upload(content, "doc.pdf", declared=False)))
+    try:
+        assert uploaded.is_pdf
+        assert uploaded.size == len(content)
+        assert uploaded.read_bytes() == content
+        assert len(uploaded.content_hash) == 64
+    finally:
+        uploaded.close()
+
+
+def test_process_upload_file_undeclared_oversize_rejected():
+    content = PNG + b"\x00" * (1024 * 1024)
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(process_upload_file(upload(content, "big.png", declared=False)))
+    assert status_of(excinfo) == 413